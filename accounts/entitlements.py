@@ -0,0 +1,59 @@
+"""
+Per-user entitlements, computed once and cached.
+
+The cached entry lives for ENTITLEMENTS_CACHE_TTL seconds but never past the
+end of the current subscription period, so access lapses on time even without
+an explicit invalidation. Writers (checkout fulfilment, Stripe event handlers,
+subscription admin, expiry sweeper) call invalidate_entitlements().
+
+Invalidation reaches other processes only through a shared cache backend
+(see CACHE_URL); with the default local-memory cache, the TTL bounds staleness.
+"""
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+CACHE_KEY = "entitlements:v1:{}"
+
+
+class Entitlements:
+    def __init__(self, has_api_access: bool = False, access_until: Optional[datetime] = None):
+        self.has_api_access = has_api_access
+        self.access_until = access_until
+
+    def __bool__(self):
+        return self.has_api_access
+
+    def __repr__(self):
+        return f"Entitlements(has_api_access={self.has_api_access}, access_until={self.access_until})"
+
+
+def _compute(user) -> Entitlements:
+    from subscriptions.services import active_subscriptions
+    until = active_subscriptions().filter(user=user).aggregate(until=Max("current_period_end"))["until"]
+    return Entitlements(has_api_access=until is not None, access_until=until)
+
+
+def get_entitlements(user) -> Entitlements:
+    if not getattr(user, "is_authenticated", False):
+        return Entitlements()
+    key = CACHE_KEY.format(user.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        return Entitlements(*cached)
+
+    ent = _compute(user)
+    ttl = getattr(settings, "ENTITLEMENTS_CACHE_TTL", 300)
+    if ent.access_until:
+        ttl = min(ttl, int((ent.access_until - timezone.now()).total_seconds()))
+    if ttl > 0:
+        cache.set(key, (ent.has_api_access, ent.access_until), ttl)
+    return ent
+
+
+def invalidate_entitlements(*user_ids):
+    cache.delete_many([CACHE_KEY.format(pk) for pk in user_ids if pk is not None])
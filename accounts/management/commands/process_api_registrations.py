@@ -0,0 +1,107 @@
+import random
+import time
+from datetime import timedelta
+
+from cryptography.fernet import InvalidToken
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import ApiRegistration
+from api_integration import utils as api
+
+
+class Command(BaseCommand):
+    help = "Deliver queued BlueWave API user registrations (outbox) in batches, with retry/backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--max-attempts", type=int, default=8)
+        parser.add_argument("--backoff", type=float, default=30.0, help="Base retry delay in seconds (doubles per attempt).")
+        parser.add_argument("--max-backoff", type=float, default=3600.0)
+        parser.add_argument("--lease", type=int, default=300, help="Seconds a claimed row is hidden from other workers.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when the queue is empty.")
+        parser.add_argument("--sleep", type=float, default=5.0, help="Poll interval with --loop.")
+
+    def handle(self, *args, **opts):
+        while True:
+            processed = self.drain(opts)
+            if not opts["loop"]:
+                break
+            if not processed:
+                time.sleep(opts["sleep"])
+
+    def drain(self, opts) -> int:
+        total = 0
+        while True:
+            batch = self.claim(opts["batch_size"], opts["lease"])
+            if not batch:
+                break
+            counts = {ApiRegistration.DONE: 0, ApiRegistration.SKIPPED: 0, "retry": 0, ApiRegistration.FAILED: 0}
+            for reg in batch:
+                counts[self.deliver(reg, opts)] += 1
+            total += len(batch)
+            self.stdout.write(
+                f"Batch of {len(batch)}: done={counts['done']} skipped={counts['skipped']} "
+                f"retry={counts['retry']} failed={counts['failed']}"
+            )
+        if total:
+            self.stdout.write(self.style.SUCCESS(f"Processed {total} registration(s)."))
+        return total
+
+    def claim(self, batch_size: int, lease: int):
+        """
+        Lease a batch of due rows by pushing their next_attempt_at forward, so
+        parallel workers don't pick them up while the API calls are running.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                ApiRegistration.objects.select_for_update(skip_locked=True)
+                .filter(status=ApiRegistration.PENDING, next_attempt_at__lte=now)
+                .order_by("next_attempt_at", "id")[:batch_size]
+            )
+            if rows:
+                ApiRegistration.objects.filter(pk__in=[r.pk for r in rows]).update(
+                    next_attempt_at=now + timedelta(seconds=lease)
+                )
+        return rows
+
+    def deliver(self, reg: ApiRegistration, opts) -> str:
+        try:
+            password = reg.api_password()
+        except InvalidToken:
+            password = None
+            err = "cannot decrypt the queued password (API_REGISTRATION_KEY or SECRET_KEY changed)"
+        else:
+            err = api.register_api_user(
+                email=reg.email,
+                password=password,
+                role=reg.role or None,
+                tier=reg.tier or None,
+                buoy_id=reg.buoy_id or None,
+            )
+        now = timezone.now()
+        reg.attempts += 1
+        reg.last_error = err or ""
+        if password is None:
+            reg.status = ApiRegistration.FAILED  # retrying can't help
+            outcome = reg.status
+        elif not err or err.startswith("(skip)"):
+            reg.status = ApiRegistration.SKIPPED if err else ApiRegistration.DONE
+            outcome = reg.status
+        elif reg.attempts >= opts["max_attempts"]:
+            reg.status = ApiRegistration.FAILED
+            outcome = reg.status
+        else:
+            delay = min(opts["backoff"] * (2 ** (reg.attempts - 1)), opts["max_backoff"])
+            reg.next_attempt_at = now + timedelta(seconds=random.uniform(delay / 2, delay))
+            outcome = "retry"
+
+        if reg.status != ApiRegistration.PENDING:
+            reg.completed_at = now
+            reg.password_encrypted = ""  # no longer needed once the row is settled
+        reg.save(update_fields=[
+            "status", "attempts", "last_error", "next_attempt_at", "completed_at", "password_encrypted", "updated_at",
+        ])
+        return outcome
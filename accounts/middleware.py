@@ -0,0 +1,14 @@
+from django.utils.functional import SimpleLazyObject
+
+from .entitlements import get_entitlements
+
+
+class EntitlementsMiddleware:
+    """Expose `request.entitlements`, looked up at most once per request (and only if used)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.entitlements = SimpleLazyObject(lambda: get_entitlements(request.user))
+        return self.get_response(request)
@@ -1,3 +1,7 @@
+import base64
+import hashlib
+
+from cryptography.fernet import Fernet
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
@@ -21,17 +25,70 @@ class UserProfile(models.Model):
     @property
     def has_active_subscription(self) -> bool:
         """
-        True if the user has an active (or trialing/past_due) subscription whose period hasn't ended.
+        True if the user has an active, trialing or past_due (grace period) subscription
+        whose period hasn't ended.
+        Served from the per-user entitlement cache.
         """
-        try:
-            from subscriptions.models import UserSubscription
-            return UserSubscription.objects.filter(
-                user=self.user,
-                status__in=["active", "trialing", "past_due"],
-                current_period_end__gt=timezone.now(),
-            ).exists()
-        except Exception:
-            return False
+        from .entitlements import get_entitlements
+        return get_entitlements(self.user).has_api_access
 
     def __str__(self):
         return f"Profile<{self.user.username}>"
+
+
+def _registration_fernet() -> Fernet:
+    material = settings.API_REGISTRATION_KEY or settings.SECRET_KEY
+    digest = hashlib.sha256(f"accounts.ApiRegistration:{material}".encode()).digest()
+    return Fernet(base64.urlsafe_b64encode(digest))
+
+
+def encrypt_api_password(raw: str) -> str:
+    return _registration_fernet().encrypt(raw.encode()).decode() if raw else ""
+
+
+def decrypt_api_password(token: str) -> str:
+    """Raises cryptography.fernet.InvalidToken if the key changed since the row was written."""
+    return _registration_fernet().decrypt(token.encode()).decode() if token else ""
+
+
+class ApiRegistration(models.Model):
+    """
+    Outbox row for creating the user on the BlueWave API.
+    Written in the signup transaction and delivered later by
+    `manage.py process_api_registrations`, so signup never waits on the API.
+    The password is needed by /auth/register, so it is kept Fernet-encrypted
+    (API_REGISTRATION_KEY, else SECRET_KEY) and blanked once the row is settled.
+    """
+    PENDING = "pending"
+    DONE = "done"
+    SKIPPED = "skipped"  # API admin credentials not configured
+    FAILED = "failed"    # gave up after max attempts
+    STATUS_CHOICES = [(PENDING, "Pending"), (DONE, "Done"), (SKIPPED, "Skipped"), (FAILED, "Failed")]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="api_registrations")
+    email = models.EmailField()
+    password_encrypted = models.TextField(blank=True, default="")
+    role = models.CharField(max_length=50, blank=True, default="")
+    tier = models.CharField(max_length=50, blank=True, default="")
+    buoy_id = models.CharField(max_length=100, blank=True, default="")
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="apireg_status_due_idx")]
+
+    def set_api_password(self, raw: str):
+        self.password_encrypted = encrypt_api_password(raw)
+
+    def api_password(self) -> str:
+        return decrypt_api_password(self.password_encrypted)
+
+    def __str__(self):
+        return f"ApiRegistration<{self.email} · {self.status}>"
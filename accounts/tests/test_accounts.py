@@ -30,3 +30,130 @@ class AccountsTests(TestCase):
         self.assertEqual(res.status_code, 302)
         prof.refresh_from_db()
         self.assertEqual(prof.api_jwt, "token123")
+
+
+class ApiRegistrationOutboxTests(TestCase):
+    @patch("api_integration.utils.register_api_user")
+    def test_register_queues_api_user_without_calling_api(self, mock_register):
+        from accounts.models import ApiRegistration
+        res = Client().post(reverse("register"), {"username": "u3", "email": "u3@ex.com", "password": "Pass123!"})
+        self.assertEqual(res.status_code, 302)
+        mock_register.assert_not_called()
+        reg = ApiRegistration.objects.get(email="u3@ex.com")
+        self.assertEqual(reg.status, ApiRegistration.PENDING)
+        self.assertNotIn("Pass123!", reg.password_encrypted)
+        self.assertEqual(reg.api_password(), "Pass123!")
+
+    def test_worker_delivers_and_retries(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from accounts.models import ApiRegistration, encrypt_api_password
+        user = User.objects.create_user("u4", "u4@ex.com", "Pass123!")
+        ok = ApiRegistration.objects.create(user=user, email="ok@ex.com", password_encrypted=encrypt_api_password("pw"))
+        flaky = ApiRegistration.objects.create(user=user, email="flaky@ex.com", password_encrypted=encrypt_api_password("pw"))
+
+        def fake_register(email, password, **kw):
+            self.assertEqual(password, "pw")
+            return None if email == "ok@ex.com" else "API register failed 503: busy"
+
+        with patch("api_integration.utils.register_api_user", side_effect=fake_register):
+            call_command("process_api_registrations", stdout=StringIO())
+
+        ok.refresh_from_db()
+        flaky.refresh_from_db()
+        self.assertEqual((ok.status, ok.password_encrypted), (ApiRegistration.DONE, ""))
+        self.assertEqual((flaky.status, flaky.attempts), (ApiRegistration.PENDING, 1))
+        self.assertGreater(flaky.next_attempt_at, ok.completed_at)
+        self.assertIn("503", flaky.last_error)
+        self.assertNotEqual(flaky.password_encrypted, "")  # still needed for the retry
+
+    def test_worker_blanks_password_on_failure(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from accounts.models import ApiRegistration, encrypt_api_password
+        user = User.objects.create_user("u5", "u5@ex.com", "Pass123!")
+        down = ApiRegistration.objects.create(user=user, email="down@ex.com", password_encrypted=encrypt_api_password("pw"))
+        with self.settings(API_REGISTRATION_KEY="old-key"):
+            stale = ApiRegistration.objects.create(user=user, email="stale@ex.com", password_encrypted=encrypt_api_password("pw"))
+
+        with patch("api_integration.utils.register_api_user", return_value="API register failed 503: busy") as register:
+            call_command("process_api_registrations", "--max-attempts", "1", stdout=StringIO())
+
+        self.assertEqual(register.call_count, 1)  # the undecryptable row never reaches the API
+        for reg in (down, stale):
+            reg.refresh_from_db()
+            self.assertEqual((reg.status, reg.password_encrypted), (ApiRegistration.FAILED, ""))
+        self.assertIn("decrypt", stale.last_error)
+
+
+class EntitlementsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user("e1", "e1@example.com", "Pass123!")
+        self.client.login(username="e1", password="Pass123!")
+
+    def _subscribe(self, days=30, status="active"):
+        from django.utils import timezone
+        from datetime import timedelta
+        from subscriptions.models import UserSubscription
+        return UserSubscription.objects.create(
+            user=self.user, stripe_subscription_id="sub_e1", status=status,
+            current_period_end=timezone.now() + timedelta(days=days),
+        )
+
+    def test_cached_after_first_lookup(self):
+        from accounts.entitlements import get_entitlements
+        sub = self._subscribe()
+        self.assertTrue(get_entitlements(self.user).has_api_access)
+        with self.assertNumQueries(0):
+            ent = get_entitlements(self.user)
+        self.assertTrue(ent.has_api_access)
+        self.assertEqual(ent.access_until, sub.current_period_end)
+
+    def test_ttl_capped_at_period_end(self):
+        from accounts.entitlements import get_entitlements
+        self._subscribe(days=1)
+        with patch("accounts.entitlements.cache.set") as cache_set:
+            get_entitlements(self.user)
+        self.assertLessEqual(cache_set.call_args.args[2], 86400)
+        with self.settings(ENTITLEMENTS_CACHE_TTL=60), patch("accounts.entitlements.cache.set") as cache_set:
+            from accounts.entitlements import invalidate_entitlements
+            invalidate_entitlements(self.user.pk)
+            get_entitlements(self.user)
+        self.assertEqual(cache_set.call_args.args[2], 60)
+
+    def test_subscription_event_invalidates(self):
+        from accounts.entitlements import get_entitlements
+        from payments.handlers import handle_subscription_changed
+        self._subscribe()
+        self.assertTrue(get_entitlements(self.user).has_api_access)
+        with self.captureOnCommitCallbacks(execute=True):
+            handle_subscription_changed({"id": "sub_e1", "status": "canceled"})
+        self.assertFalse(get_entitlements(self.user).has_api_access)
+
+    def test_past_due_is_a_grace_period_until_period_end(self):
+        from django.utils import timezone
+        from accounts.entitlements import get_entitlements, invalidate_entitlements
+        from accounts.models import UserProfile
+        from subscriptions.services import sweep
+        sub = self._subscribe(days=1, status="past_due")
+        self.assertTrue(get_entitlements(self.user).has_api_access)
+        self.assertTrue(UserProfile.objects.create(user=self.user).has_active_subscription)
+
+        sub.current_period_end = timezone.now() - timezone.timedelta(seconds=1)
+        sub.save()
+        sweep()
+        sub.refresh_from_db()
+        self.assertEqual(sub.status, "unpaid")
+        invalidate_entitlements(self.user.pk)
+        self.assertFalse(get_entitlements(self.user).has_api_access)
+
+    def test_api_access_page_uses_one_lookup(self):
+        from accounts import entitlements
+        self._subscribe()
+        with patch("accounts.entitlements._compute", wraps=entitlements._compute) as compute:
+            res = self.client.get(reverse("api_access"))
+            self.assertEqual(res.status_code, 200)
+            self.client.get(reverse("api_access"))
+        self.assertEqual(compute.call_count, 1)
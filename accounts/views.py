@@ -6,46 +6,17 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 from django.shortcuts import redirect, render
 from django.conf import settings
-from django.utils import timezone
+from django.db import transaction
 
 from .forms import RegistrationForm, LoginForm, TOTPVerifyForm, TOTPSetupForm, APITokenRequestForm
-from .models import UserProfile
-from api_integration.utils import register_api_user  # (login token issuance is imported lazily below)
+from .models import ApiRegistration, UserProfile, encrypt_api_password
 import pyotp, qrcode
 from io import BytesIO
 import base64
 
-# Robust import for subscription model (supports either the simple or robust schema)
-try:
-    # simple schema (boolean `active`)
-    from subscriptions.models import Subscription as SubModel
-except Exception:
-    # robust schema (status/current_period_end)
-    from subscriptions.models import UserSubscription as SubModel
-
 User = get_user_model()
 
 
-def _has_active_subscription(user) -> bool:
-    """
-    Returns True if the user has an active subscription.
-    Works for:
-      - simple schema: SubModel has boolean 'active'
-      - robust schema: SubModel has 'status', 'current_period_end', 'cancel_at_period_end'
-    """
-    field_names = {f.name for f in SubModel._meta.get_fields()}
-    qs = SubModel.objects.filter(user=user)
-
-    if "active" in field_names:
-        # Simple model with boolean
-        return qs.filter(active=True).exists()
-
-    # Robust model: active if status in ('active','trialing') and period not expired
-    allowed_status = ("active", "trialing")
-    now = timezone.now()
-    return qs.filter(status__in=allowed_status, current_period_end__gt=now).exists()
-
-
 def get_or_create_profile(user):
     profile, _ = UserProfile.objects.get_or_create(user=user)
     return profile
@@ -59,22 +30,19 @@ def register_view(request):
             email = form.cleaned_data["email"]
             password = form.cleaned_data["password"]
 
-            user = User.objects.create_user(username=username, email=email, password=password)
-            get_or_create_profile(user)
-
-            # Auto-register on BlueWave API (gracefully skipped if admin creds not set)
-            default_role = getattr(settings, "BLUEWAVE_API_DEFAULT_ROLE", None)
-            default_tier = getattr(settings, "BLUEWAVE_API_DEFAULT_TIER", None)
-            default_buoy = getattr(settings, "BLUEWAVE_API_DEFAULT_BUOY", None)
-            err = register_api_user(
-                email=email,
-                password=password,
-                role=default_role,
-                tier=default_tier,
-                buoy_id=default_buoy,
-            )
-            if err and not err.startswith("(skip)"):
-                messages.warning(request, f"Registered locally, but API user creation noted: {err}")
+            with transaction.atomic():
+                user = User.objects.create_user(username=username, email=email, password=password)
+                get_or_create_profile(user)
+
+                # Queue the BlueWave API user; `process_api_registrations` delivers it
+                ApiRegistration.objects.create(
+                    user=user,
+                    email=email,
+                    password_encrypted=encrypt_api_password(password),
+                    role=getattr(settings, "BLUEWAVE_API_DEFAULT_ROLE", "") or "",
+                    tier=getattr(settings, "BLUEWAVE_API_DEFAULT_TIER", "") or "",
+                    buoy_id=getattr(settings, "BLUEWAVE_API_DEFAULT_BUOY", "") or "",
+                )
 
             messages.success(request, "Registration successful. Please log in.")
             return redirect("login")
@@ -169,8 +137,8 @@ def dashboard(request):
 @login_required
 def api_access(request):
     profile = get_or_create_profile(request.user)
-    # ✅ Authoritative check: only live subscriptions grant access
-    has_researcher_access = _has_active_subscription(request.user)
+    # ✅ Authoritative check: only live subscriptions grant access (cached, see accounts.entitlements)
+    has_researcher_access = request.entitlements.has_api_access
 
     form = APITokenRequestForm(initial={"email": request.user.email})
     return render(
@@ -190,7 +158,7 @@ def api_access(request):
 def request_api_token(request):
     profile = get_or_create_profile(request.user)
     # ✅ Enforce live subscription for token requests
-    has_researcher_access = _has_active_subscription(request.user)
+    has_researcher_access = request.entitlements.has_api_access
     if not has_researcher_access:
         return HttpResponseForbidden("Subscription required to obtain API token.")
 
@@ -0,0 +1,179 @@
+"""
+Shared HTTP client for the BlueWave API.
+
+One BlueWaveClient is kept per process (see get_client) so every helper in
+utils.py reuses the same pooled keep-alive Session. On top of that it adds:
+  - per-endpoint (connect, read) timeouts,
+  - bounded retries with jittered exponential backoff for idempotent calls,
+  - a circuit breaker that fails fast while upstream keeps failing.
+
+Errors are raised as requests exceptions, so callers keep their existing
+`except requests.RequestException` handling.
+"""
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {502, 503, 504}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without touching the network while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `threshold` consecutive failures; after `cooldown`
+    seconds one trial call is let through (half-open) and its outcome decides.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.cooldown - (self._clock() - self._opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(
+                    f"BlueWave API unavailable (circuit open, retry in {max(remaining, 0):.0f}s)"
+                )
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = self._clock()
+
+    def release_trial(self):
+        """End a half-open trial without an outcome (the call failed before reaching upstream)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class BlueWaveClient:
+    def __init__(self, base_url: str, *, timeout: Tuple[float, float] = (3.05, 10),
+                 endpoint_timeouts: Optional[Dict[str, Tuple[float, float]]] = None,
+                 retries: int = 2, backoff: float = 0.25, pool_size: int = 10,
+                 breaker: Optional[CircuitBreaker] = None, session: Optional[requests.Session] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = tuple(timeout)
+        self.endpoint_timeouts = {k: tuple(v) for k, v in (endpoint_timeouts or {}).items()}
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def timeout_for(self, path: str) -> Tuple[float, float]:
+        return self.endpoint_timeouts.get(path, self.timeout)
+
+    def request(self, method: str, path: str, *, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session. Idempotent calls are retried on
+        connection errors, timeouts and 502/503/504; other calls are tried once.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        kwargs.setdefault("timeout", self.timeout_for(path))
+        attempts = 1 + (self.retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            self.breaker.before_call()
+            try:
+                resp = self.session.request(method, self.url(path), **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise
+            except requests.RequestException:
+                # TooManyRedirects, ChunkedEncodingError, ...: a failure, but not worth retrying
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Not an upstream failure, but a half-open trial must not stay claimed forever
+                self.breaker.release_trial()
+                raise
+            else:
+                if resp.status_code < 500:
+                    self.breaker.record_success()
+                    return resp
+                self.breaker.record_failure()
+                if resp.status_code not in RETRY_STATUSES or attempt + 1 >= attempts:
+                    return resp
+                resp.close()
+            # Full jitter keeps a burst of workers from retrying in lockstep
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+
+_client: Optional[BlueWaveClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> BlueWaveClient:
+    """Process-wide client built from the BLUEWAVE_API_* settings."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = BlueWaveClient(
+                    settings.BLUEWAVE_API_BASE,
+                    timeout=(getattr(settings, "BLUEWAVE_API_CONNECT_TIMEOUT", 3.05),
+                             settings.BLUEWAVE_API_TIMEOUT),
+                    endpoint_timeouts=getattr(settings, "BLUEWAVE_API_ENDPOINT_TIMEOUTS", None),
+                    retries=getattr(settings, "BLUEWAVE_API_RETRIES", 2),
+                    backoff=getattr(settings, "BLUEWAVE_API_RETRY_BACKOFF", 0.25),
+                    pool_size=getattr(settings, "BLUEWAVE_API_POOL_SIZE", 10),
+                    breaker=CircuitBreaker(
+                        threshold=getattr(settings, "BLUEWAVE_API_BREAKER_THRESHOLD", 5),
+                        cooldown=getattr(settings, "BLUEWAVE_API_BREAKER_COOLDOWN", 30),
+                    ),
+                )
+    return _client
+
+
+def reset_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = None
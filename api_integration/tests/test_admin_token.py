@@ -0,0 +1,53 @@
+from django.test import SimpleTestCase, override_settings
+from unittest.mock import MagicMock, patch
+import time
+import jwt
+
+from api_integration import utils
+
+
+def response(status, body=None, text=""):
+    r = MagicMock(status_code=status, text=text)
+    r.json.return_value = body or {}
+    return r
+
+
+def admin_jwt(ttl=3600):
+    return jwt.encode({"exp": int(time.time()) + ttl}, "k", algorithm="HS256")
+
+
+@override_settings(BLUEWAVE_API_ADMIN_EMAIL="admin@ex.com", BLUEWAVE_API_ADMIN_PASSWORD="pw")
+class AdminTokenCacheTests(SimpleTestCase):
+    def setUp(self):
+        utils._admin_tokens.invalidate()
+        self.client = MagicMock()
+        patcher = patch("api_integration.utils.get_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def logins(self):
+        return [c for c in self.client.post.call_args_list if c.args[0] == "/auth/login"]
+
+    def test_token_is_reused_across_registrations(self):
+        token = admin_jwt()
+        self.client.post.side_effect = [response(200, {"access_token": token}), response(201), response(201)]
+        self.assertIsNone(utils.register_api_user("a@ex.com", "pw1"))
+        self.assertIsNone(utils.register_api_user("b@ex.com", "pw2"))
+        self.assertEqual(len(self.logins()), 1)
+
+    def test_token_near_expiry_is_refreshed(self):
+        self.client.post.side_effect = [
+            response(200, {"access_token": admin_jwt(ttl=30)}), response(201),
+            response(200, {"access_token": admin_jwt()}), response(201),
+        ]
+        utils.register_api_user("a@ex.com", "pw1")
+        utils.register_api_user("b@ex.com", "pw2")
+        self.assertEqual(len(self.logins()), 2)
+
+    def test_401_invalidates_and_retries_once(self):
+        self.client.post.side_effect = [
+            response(200, {"access_token": admin_jwt()}), response(401, text="expired"),
+            response(200, {"access_token": admin_jwt()}), response(201),
+        ]
+        self.assertIsNone(utils.register_api_user("a@ex.com", "pw1"))
+        self.assertEqual(len(self.logins()), 2)
@@ -0,0 +1,72 @@
+from django.test import SimpleTestCase
+from unittest.mock import MagicMock, patch
+import requests
+
+from api_integration.client import BlueWaveClient, CircuitBreaker, CircuitOpenError
+
+
+def response(status):
+    r = MagicMock(spec=requests.Response)
+    r.status_code = status
+    return r
+
+
+class BlueWaveClientTests(SimpleTestCase):
+    def make_client(self, *outcomes, threshold=5):
+        session = MagicMock()
+        session.request.side_effect = list(outcomes)
+        return BlueWaveClient("http://api", retries=2, backoff=0, session=session,
+                              breaker=CircuitBreaker(threshold=threshold, cooldown=60)), session
+
+    def test_get_retries_transient_errors(self):
+        client, session = self.make_client(requests.ConnectionError(), response(503), response(200))
+        self.assertEqual(client.get("/observations").status_code, 200)
+        self.assertEqual(session.request.call_count, 3)
+
+    def test_post_is_not_retried(self):
+        client, session = self.make_client(requests.ConnectionError(), response(200))
+        with self.assertRaises(requests.ConnectionError):
+            client.post("/auth/register", json={})
+        self.assertEqual(session.request.call_count, 1)
+
+    def test_per_endpoint_timeout(self):
+        client, session = self.make_client(response(200))
+        client.endpoint_timeouts = {"/auth/login": (1, 2)}
+        client.post("/auth/login", json={})
+        self.assertEqual(session.request.call_args.kwargs["timeout"], (1, 2))
+
+    def test_breaker_fails_fast_when_open(self):
+        client, session = self.make_client(*[requests.Timeout()] * 3, threshold=2)
+        with self.assertRaises(requests.RequestException):
+            client.get("/observations")  # opens after the second failure, third try is skipped
+        self.assertEqual(session.request.call_count, 2)
+        with self.assertRaises(CircuitOpenError):
+            client.get("/observations")
+        self.assertEqual(session.request.call_count, 2)
+
+    def test_helpers_report_open_circuit_as_error(self):
+        from api_integration import utils
+        client, _ = self.make_client(threshold=1)
+        client.breaker.record_failure()
+        with patch("api_integration.utils.get_client", return_value=client):
+            data, err = utils.fetch_metrics("2025-01-01T00:00:00", "2025-01-02T00:00:00")
+        self.assertIsNone(data)
+        self.assertIn("circuit open", err)
+
+    def test_half_open_trial_is_released_on_any_error(self):
+        clock = MagicMock(return_value=0.0)
+        for error, opens in ((requests.TooManyRedirects(), True), (ValueError("bad kwargs"), False)):
+            breaker = CircuitBreaker(threshold=1, cooldown=60, clock=clock)
+            session = MagicMock()
+            session.request.side_effect = [error, response(200)]
+            client = BlueWaveClient("http://api", retries=0, backoff=0, session=session, breaker=breaker)
+            breaker.record_failure()
+            clock.return_value += 61  # cooldown over: the next call is the trial
+            with self.assertRaises(type(error)):
+                client.get("/observations")
+            if opens:
+                with self.assertRaises(CircuitOpenError):  # failed trial re-opens the breaker
+                    client.get("/observations")
+                clock.return_value += 61
+            self.assertEqual(client.get("/observations").status_code, 200)
+            self.assertFalse(breaker.is_open)
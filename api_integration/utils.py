@@ -1,9 +1,12 @@
 from django.conf import settings
 from django.utils import timezone
 import requests
+import threading
 from datetime import datetime, timedelta, timezone as dt_tz
 from typing import Tuple, Optional
 
+from .client import get_client
+
 # PyJWT is optional (used only to parse exp); fall back gracefully if absent.
 try:
     import jwt  # PyJWT
@@ -34,11 +37,10 @@ def issue_jwt_for_user(user, *, email: Optional[str], password: str) -> Tuple[Op
     Returns (token, expires_at, error).
     """
     jwt_path = getattr(settings, "BLUEWAVE_API_JWT_ENDPOINT", "/auth/login")
-    url = settings.BLUEWAVE_API_BASE.rstrip('/') + jwt_path
     payload = {"email": email or (user.email or user.username), "password": password}
 
     try:
-        resp = requests.post(url, json=payload, timeout=settings.BLUEWAVE_API_TIMEOUT)
+        resp = get_client().post(jwt_path, json=payload)
         if resp.status_code >= 400:
             return None, None, f"API error {resp.status_code}: {resp.text}"
         data = resp.json()
@@ -51,42 +53,61 @@ def issue_jwt_for_user(user, *, email: Optional[str], password: str) -> Tuple[Op
         return None, None, str(e)
 
 
+def _metrics_request(start_iso: str, end_iso: str, token: Optional[str] = None, *, stream: bool = False):
+    metrics_path = getattr(settings, "BLUEWAVE_API_METRICS_ENDPOINT", "/observations")
+    params = {"start": start_iso, "end": end_iso}
+    headers = {}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    resp = get_client().get(metrics_path, params=params, headers=headers, stream=stream)
+    if resp.status_code == 401:
+        resp.close()
+        return None, "API error 401: Unauthorized (token missing/expired/invalid)"
+    if resp.status_code >= 400:
+        error = f"API error {resp.status_code}: {resp.text}"
+        resp.close()
+        return None, error
+    return resp, None
+
+
 def fetch_metrics(start_iso: str, end_iso: str, token: Optional[str] = None):
     """
     Proxy call to the BlueWave metrics endpoint (/observations).
     If `token` is provided, send it in Authorization header.
     Returns (data, error).
     """
-    metrics_path = getattr(settings, "BLUEWAVE_API_METRICS_ENDPOINT", "/observations")
-    url = settings.BLUEWAVE_API_BASE.rstrip('/') + metrics_path
-    params = {"start": start_iso, "end": end_iso}
-    headers = {}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=settings.BLUEWAVE_API_TIMEOUT)
-        if resp.status_code == 401:
-            return None, "API error 401: Unauthorized (token missing/expired/invalid)"
-        if resp.status_code >= 400:
-            return None, f"API error {resp.status_code}: {resp.text}"
+        resp, error = _metrics_request(start_iso, end_iso, token)
+        if error:
+            return None, error
         return resp.json(), None
     except requests.RequestException as e:
         return None, str(e)
 
 
+def open_metrics_stream(start_iso: str, end_iso: str, token: Optional[str] = None):
+    """
+    Like fetch_metrics, but leaves the body unread (stream=True) so it can be
+    piped to the client chunk by chunk. The caller must close the response.
+    Returns (response, error).
+    """
+    try:
+        return _metrics_request(start_iso, end_iso, token, stream=True)
+    except requests.RequestException as e:
+        return None, str(e)
+
+
 # ---------- Auto-register helpers ----------
 
-def _admin_login_token() -> Tuple[Optional[str], Optional[str]]:
+def _fetch_admin_token() -> Tuple[Optional[str], Optional[str]]:
     admin_email = getattr(settings, "BLUEWAVE_API_ADMIN_EMAIL", None)
     admin_password = getattr(settings, "BLUEWAVE_API_ADMIN_PASSWORD", None)
     if not admin_email or not admin_password:
         return None, "Missing BLUEWAVE_API_ADMIN_EMAIL / BLUEWAVE_API_ADMIN_PASSWORD"
 
     jwt_path = getattr(settings, "BLUEWAVE_API_JWT_ENDPOINT", "/auth/login")
-    url = settings.BLUEWAVE_API_BASE.rstrip('/') + jwt_path
     try:
-        resp = requests.post(url, json={"email": admin_email, "password": admin_password},
-                             timeout=settings.BLUEWAVE_API_TIMEOUT)
+        resp = get_client().post(jwt_path, json={"email": admin_email, "password": admin_password})
         if resp.status_code >= 400:
             return None, f"Admin login failed {resp.status_code}: {resp.text}"
         token = resp.json().get("access_token")
@@ -97,36 +118,84 @@ def _admin_login_token() -> Tuple[Optional[str], Optional[str]]:
         return None, str(e)
 
 
+class _AdminTokenCache:
+    """
+    Process-wide admin service token. Reused until shortly before its `exp`
+    (BLUEWAVE_API_ADMIN_TOKEN_REFRESH_MARGIN seconds); tokens without a
+    readable `exp` are kept for BLUEWAVE_API_ADMIN_TOKEN_TTL seconds.
+    The lock is held while logging in, so concurrent callers share one login.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._refresh_at: Optional[datetime] = None
+
+    def get(self) -> Tuple[Optional[str], Optional[str]]:
+        with self._lock:
+            if self._token and timezone.now() < self._refresh_at:
+                return self._token, None
+            token, err = _fetch_admin_token()
+            if err:
+                return None, err
+            margin = timedelta(seconds=getattr(settings, "BLUEWAVE_API_ADMIN_TOKEN_REFRESH_MARGIN", 60))
+            exp = _decode_exp_noverify(token)
+            if exp:
+                self._refresh_at = exp - margin
+            else:
+                self._refresh_at = timezone.now() + timedelta(seconds=getattr(settings, "BLUEWAVE_API_ADMIN_TOKEN_TTL", 300))
+            self._token = token
+            return token, None
+
+    def invalidate(self, token: Optional[str] = None):
+        """Drop the cached token (only if it is still `token`, when given)."""
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._refresh_at = None
+
+
+_admin_tokens = _AdminTokenCache()
+
+
+def _admin_login_token() -> Tuple[Optional[str], Optional[str]]:
+    return _admin_tokens.get()
+
+
 def register_api_user(email: str, password: str, *, role: Optional[str] = None,
                       tier: Optional[str] = None, buoy_id: Optional[str] = None) -> Optional[str]:
     """
     Creates a user in the BlueWave API via /auth/register (admin-protected).
     Returns None on success, or an error string on failure.
     If the user already exists, returns None (treated as success).
+    A 401 with the cached admin token drops it and retries once with a fresh login.
     """
-    admin_token, err = _admin_login_token()
-    if err:
-        return f"(skip) {err}"
-
     register_path = getattr(settings, "BLUEWAVE_API_REGISTER_ENDPOINT", "/auth/register")
-    url = settings.BLUEWAVE_API_BASE.rstrip('/') + register_path
 
     payload = {"email": email, "password": password}
     if role: payload["role"] = role
     if tier: payload["tier"] = tier
     if buoy_id: payload["buoy_id"] = buoy_id
 
-    headers = {"Authorization": f"Bearer {admin_token}", "Content-Type": "application/json"}
-    try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=settings.BLUEWAVE_API_TIMEOUT)
-        if resp.status_code in (200, 201):
-            return None
-        # treat "already exists" as success
-        if resp.status_code in (400, 409) and "exists" in (resp.text or "").lower():
-            return None
-        return f"API register failed {resp.status_code}: {resp.text}"
-    except requests.RequestException as e:
-        return str(e)
+    for attempt in range(2):
+        admin_token, err = _admin_login_token()
+        if err:
+            return f"(skip) {err}"
+
+        headers = {"Authorization": f"Bearer {admin_token}", "Content-Type": "application/json"}
+        try:
+            resp = get_client().post(register_path, json=payload, headers=headers)
+            if resp.status_code == 401 and attempt == 0:
+                _admin_tokens.invalidate(admin_token)
+                continue
+            if resp.status_code in (200, 201):
+                return None
+            # treat "already exists" as success
+            if resp.status_code in (400, 409) and "exists" in (resp.text or "").lower():
+                return None
+            return f"API register failed {resp.status_code}: {resp.text}"
+        except requests.RequestException as e:
+            return str(e)
 
 
 def issue_jwt_with_autoreg(user, *, email: Optional[str], password: str) -> Tuple[Optional[str], Optional[datetime], Optional[str]]:
@@ -1,7 +1,9 @@
 from django.urls import path
-from shop.views import pending_orders, approve_order
+from shop.views import pending_orders, approve_order, bulk_approve_orders, export_orders_csv
 
 urlpatterns = [
     path('pending-orders/', pending_orders, name='pending_orders'),
     path('approve-order/<int:order_id>/', approve_order, name='approve_order'),
+    path('approve-orders/', bulk_approve_orders, name='bulk_approve_orders'),
+    path('orders/export.csv', export_orders_csv, name='export_orders_csv'),
 ]
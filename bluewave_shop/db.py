@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+def upsert_options(unique_fields, update_fields, using=DEFAULT_DB_ALIAS) -> dict:
+    """
+    bulk_create() kwargs for an upsert that works on SQLite/PostgreSQL and MySQL.
+    MySQL's ON DUPLICATE KEY UPDATE can't name the conflict target, so
+    unique_fields is only passed where the backend supports it.
+    """
+    opts = {"update_conflicts": True, "update_fields": list(update_fields)}
+    if connections[using].features.supports_update_conflicts_with_target:
+        opts["unique_fields"] = list(unique_fields)
+    return opts
+
+
+def estimated_row_count(model, using=DEFAULT_DB_ALIAS):
+    """
+    The planner's row estimate for `model`'s table, read from the catalog
+    instead of scanning it. None where the backend keeps no estimate (SQLite).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large tables: an unfiltered queryset is counted from the
+    table statistics when they claim more than ESTIMATED_COUNT_THRESHOLD rows,
+    so the admin changelist doesn't run COUNT(*) over millions of rows per page.
+    Filtered querysets and small tables are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and not qs.query.where:
+            estimate = estimated_row_count(qs.model, qs.db)
+            if estimate is not None and estimate > getattr(settings, "ESTIMATED_COUNT_THRESHOLD", 100_000):
+                return estimate
+        return super().count
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     "subscriptions",
     "metrics",
     "payments",
+    "reporting",
 ]
 
 MIDDLEWARE = [
@@ -37,6 +38,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "accounts.middleware.EntitlementsMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -84,6 +86,11 @@ else:
         }
     }
 
+# Cache (local memory by default; point CACHE_URL at Redis/Memcached to share it between processes)
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+# Upper bound on how long a user's entitlements are cached (also capped at current_period_end)
+ENTITLEMENTS_CACHE_TTL = env.int("ENTITLEMENTS_CACHE_TTL", default=300)
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator", "OPTIONS": {"min_length": 8}},
@@ -127,14 +134,45 @@ BLUEWAVE_API_METRICS_ENDPOINT = env("BLUEWAVE_API_METRICS_ENDPOINT", default="/o
 # Admin service account (used to auto-register website users in the API)
 BLUEWAVE_API_ADMIN_EMAIL = env("BLUEWAVE_API_ADMIN_EMAIL", default="")
 BLUEWAVE_API_ADMIN_PASSWORD = env("BLUEWAVE_API_ADMIN_PASSWORD", default="")
+# The admin token is cached per process and refreshed this many seconds before `exp`
+BLUEWAVE_API_ADMIN_TOKEN_REFRESH_MARGIN = env.int("BLUEWAVE_API_ADMIN_TOKEN_REFRESH_MARGIN", default=60)
+BLUEWAVE_API_ADMIN_TOKEN_TTL = env.int("BLUEWAVE_API_ADMIN_TOKEN_TTL", default=300)  # when exp is unreadable
+
+# Fernet key material for API passwords queued in the registration outbox (SECRET_KEY when empty)
+API_REGISTRATION_KEY = env("API_REGISTRATION_KEY", default="")
 
 # Auto-registration defaults (must match API schema)
 BLUEWAVE_API_DEFAULT_ROLE = env("BLUEWAVE_API_DEFAULT_ROLE", default="researcher")
 BLUEWAVE_API_DEFAULT_TIER = env("BLUEWAVE_API_DEFAULT_TIER", default="processed")
 BLUEWAVE_API_DEFAULT_BUOY = env("BLUEWAVE_API_DEFAULT_BUOY", default="")  # only for device accounts
 
-# Requests timeout to API
+# Requests timeout to API (read timeout; connect timeout is kept short)
 BLUEWAVE_API_TIMEOUT = env.int("BLUEWAVE_API_TIMEOUT", default=10)
+BLUEWAVE_API_CONNECT_TIMEOUT = env.float("BLUEWAVE_API_CONNECT_TIMEOUT", default=3.05)
+# Per-endpoint (connect, read) overrides; logins should answer quickly, observations may take longer
+BLUEWAVE_API_ENDPOINT_TIMEOUTS = {
+    BLUEWAVE_API_JWT_ENDPOINT: (BLUEWAVE_API_CONNECT_TIMEOUT, 5),
+    BLUEWAVE_API_REGISTER_ENDPOINT: (BLUEWAVE_API_CONNECT_TIMEOUT, 5),
+}
+
+# Shared API client: connection pool, retries for idempotent calls, circuit breaker
+BLUEWAVE_API_POOL_SIZE = env.int("BLUEWAVE_API_POOL_SIZE", default=10)
+BLUEWAVE_API_RETRIES = env.int("BLUEWAVE_API_RETRIES", default=2)
+BLUEWAVE_API_RETRY_BACKOFF = env.float("BLUEWAVE_API_RETRY_BACKOFF", default=0.25)
+BLUEWAVE_API_BREAKER_THRESHOLD = env.int("BLUEWAVE_API_BREAKER_THRESHOLD", default=5)
+BLUEWAVE_API_BREAKER_COOLDOWN = env.int("BLUEWAVE_API_BREAKER_COOLDOWN", default=30)
+
+# Metrics proxy cache (per process): aligned bucket size and LRU byte budget
+METRICS_CACHE_BUCKET_SECONDS = env.int("METRICS_CACHE_BUCKET_SECONDS", default=3600)
+METRICS_CACHE_MAX_BYTES = env.int("METRICS_CACHE_MAX_BYTES", default=32 * 1024 * 1024)
+# Async proxy: long windows are fetched as chunks of this size, this many at a time
+METRICS_PROXY_CHUNK_SECONDS = env.int("METRICS_PROXY_CHUNK_SECONDS", default=86400)
+METRICS_PROXY_MAX_PARALLEL = env.int("METRICS_PROXY_MAX_PARALLEL", default=4)
+
+# Orders per page on "My Orders" and the pending-approval queue
+ORDERS_PAGE_SIZE = env.int("ORDERS_PAGE_SIZE", default=25)
+# Admin changelists use the table's row estimate instead of COUNT(*) above this size (MySQL/PostgreSQL)
+ESTIMATED_COUNT_THRESHOLD = env.int("ESTIMATED_COUNT_THRESHOLD", default=100_000)
 
 # Site
 SITE_NAME = env("SITE_NAME", default="BlueWave Solutions")
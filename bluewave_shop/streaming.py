@@ -0,0 +1,31 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+
+async def async_iter(iterator, *, thread_sensitive=False):
+    """
+    Drive a blocking iterator from a worker thread, one item at a time.
+    Use thread_sensitive=True for iterators that query the database, so every
+    step runs on the same thread (and connection).
+    """
+    done = object()
+    step = sync_to_async(next, thread_sensitive=thread_sensitive)
+    try:
+        while True:
+            part = await step(iterator, done)
+            if part is done:
+                return
+            yield part
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            await sync_to_async(close, thread_sensitive=thread_sensitive)()
+
+
+def stream(request, iterator, content_type, *, thread_sensitive=False, **kwargs):
+    # Django buffers iterators of the "wrong" kind into a list, so hand ASGI an
+    # async iterator and WSGI a plain one.
+    if isinstance(request, ASGIRequest):
+        iterator = async_iter(iterator, thread_sensitive=thread_sensitive)
+    return StreamingHttpResponse(iterator, content_type=content_type, **kwargs)
@@ -0,0 +1,31 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from bluewave_shop.db import EstimatedCountPaginator
+from shop.models import Order
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=1000)
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("p")
+        for i in range(3):
+            Order.objects.create(user=user, stripe_session_id=f"cs_{i}", paid=bool(i))
+
+    @patch("bluewave_shop.db.estimated_row_count", return_value=2_000_000)
+    def test_unfiltered_uses_estimate(self, _):
+        with self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator(Order.objects.order_by("pk"), 100).count, 2_000_000)
+
+    @patch("bluewave_shop.db.estimated_row_count", return_value=2_000_000)
+    def test_filtered_counts_exactly(self, _):
+        self.assertEqual(EstimatedCountPaginator(Order.objects.filter(paid=True).order_by("pk"), 100).count, 2)
+
+    @patch("bluewave_shop.db.estimated_row_count", return_value=50)
+    def test_small_table_counts_exactly(self, _):
+        self.assertEqual(EstimatedCountPaginator(Order.objects.order_by("pk"), 100).count, 3)
+
+    def test_sqlite_has_no_estimate(self):
+        self.assertEqual(EstimatedCountPaginator(Order.objects.order_by("pk"), 100).count, 3)
@@ -0,0 +1,347 @@
+"""
+Query-count and latency budgets for every page.
+
+Each named route is requested against seeded data at several sizes. Its query
+count must stay within the budget below and be the same at every size (no N+1);
+test_every_route_has_a_budget fails when a new route has no entry.
+Wall-clock times are checked against PERF_LATENCY_BUDGET_MS and, when
+PERF_REPORT is set, written to that path as JSON.
+"""
+import json
+import os
+import statistics
+import time
+from datetime import timedelta
+from itertools import count
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from metrics.cache import reset_observation_cache
+from metrics.tests.test_metrics import fake_upstream
+from shop.models import Order, OrderItem, Product
+from subscriptions.models import UserSubscription
+
+SIZES = (1, 10, 40)
+RUNS = 3
+LATENCY_BUDGET_MS = float(os.environ.get("PERF_LATENCY_BUDGET_MS", 1000))
+TIMINGS = {}
+
+# name: maximum queries per request (session + user lookups included)
+BUDGETS = {
+    "home": 1,
+    "product_list": 1,
+    "product_detail": 1,
+    "subscriptions_home": 1,
+    "login": 0,
+    "register": 0,
+    "logout": 4,
+    "verify_totp": 3,
+    "dashboard": 4,
+    "api_access": 4,
+    "request_api_token": 5,
+    "setup_totp": 3,
+    "orders": 4,
+    "cart_detail": 3,
+    "cart_add": 6,
+    "cart_update": 6,
+    "cart_checkout": 6,
+    "create_checkout_session": 3,
+    "checkout_success": 3,
+    "checkout_cancel": 2,
+    "pending_orders": 4,
+    "approve_order": 12,
+    "bulk_approve_orders": 9,
+    "export_orders_csv": 4,
+    "sales_dashboard": 7,
+    "admin_orders": 6,
+    "admin_subscriptions": 6,
+    "metrics_dashboard": 2,
+    "metrics_proxy": 2,
+    "metrics_proxy_stats": 2,
+    "stripe_webhook": 5,
+}
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user("perf_customer", "c@example.com", "Pass123!")
+        cls.staff = User.objects.create_user("perf_staff", "s@example.com", "Pass123!", is_staff=True)
+        cls.admin = User.objects.create_superuser("perf_admin", "a@example.com", "Pass123!")
+        UserProfile.objects.create(user=cls.customer, totp_secret="JBSWY3DPEHPK3PXP")
+        UserProfile.objects.create(user=cls.staff)
+        UserSubscription.objects.create(
+            user=cls.customer, stripe_subscription_id="sub_perf", status="active",
+            current_period_end=timezone.now() + timedelta(days=30),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        path = os.environ.get("PERF_REPORT")
+        if path:
+            with open(path, "w") as fh:
+                json.dump(TIMINGS, fh, indent=2, sort_keys=True)
+
+    def setUp(self):
+        self.seq = count()
+        self.seeded = 0
+        reset_observation_cache()
+
+    def seed(self, n):
+        """
+        Grow the data set to n products, n orders for the customer and n pending
+        orders and n subscriptions from n buyers.
+        """
+        from subscriptions.admin import SubModel
+        for i in range(self.seeded, n):
+            product = Product.objects.create(
+                name=f"Product {i}", slug=f"product-{i}", price_cents=1000 + i,
+                product_type=Product.SUBSCRIPTION if i % 3 == 0 else Product.ONE_TIME,
+            )
+            order = Order.objects.create(user=self.customer, stripe_session_id=f"cs_own_{i}", paid=True, total_cents=1000)
+            OrderItem.objects.create(order=order, product=product, price_cents=1000)
+            buyer = User.objects.create_user(f"perf_buyer_{i}")
+            Order.objects.create(user=buyer, stripe_session_id=f"cs_pending_{i}", paid=True, total_cents=2000)
+            SubModel.objects.create(user=buyer, stripe_subscription_id=f"sub_perf_{i}", status="active",
+                                    current_period_end=timezone.now() + timedelta(days=i))
+        self.seeded = n
+
+    def measure(self, name, request, prepare=lambda: None):
+        """
+        Run `request` at every size and check its budget. `prepare` runs before
+        each request, outside the query capture and the timer.
+        """
+        counts, timings = {}, {}
+        for size in SIZES:
+            self.seed(size)
+            prepare()
+            self.assertLess(request().status_code, 400)  # warm-up: lazy profile rows, template cache
+            cache.clear()
+            prepare()
+            with CaptureQueriesContext(connection) as ctx:
+                res = request()
+            self.assertLess(res.status_code, 400, name)
+            counts[size] = len(ctx.captured_queries)
+            runs = []
+            for _ in range(RUNS):
+                prepare()
+                t = time.perf_counter()
+                request()
+                runs.append((time.perf_counter() - t) * 1000)
+            timings[size] = statistics.median(runs)
+        TIMINGS[name] = {"queries": counts, "ms": timings}
+
+        queries = [q["sql"] for q in ctx.captured_queries]
+        self.assertEqual(len(set(counts.values())), 1, f"{name}: query count grows with data {counts}")
+        self.assertLessEqual(counts[SIZES[-1]], BUDGETS[name], f"{name}: {counts[SIZES[-1]]} queries\n" + "\n".join(queries))
+        for size, ms in timings.items():
+            self.assertLess(ms, LATENCY_BUDGET_MS, f"{name}: {ms:.0f}ms at size {size}")
+
+    def login(self, user):
+        self.client.force_login(user)
+
+    # ---------- public pages ----------
+
+    def test_home(self):
+        self.measure("home", lambda: self.client.get(reverse("home")))
+
+    def test_product_list(self):
+        self.measure("product_list", lambda: self.client.get(reverse("product_list")))
+
+    def test_product_detail(self):
+        self.measure("product_detail", lambda: self.client.get(reverse("product_detail", args=["product-0"])))
+
+    def test_subscriptions_home(self):
+        self.measure("subscriptions_home", lambda: self.client.get(reverse("subscriptions_home")))
+
+    def test_login_page(self):
+        self.measure("login", lambda: self.client.get(reverse("login")))
+
+    def test_register_page(self):
+        self.measure("register", lambda: self.client.get(reverse("register")))
+
+    def test_every_route_has_a_budget(self):
+        from django.urls import URLResolver, get_resolver
+
+        def names(patterns):
+            for p in patterns:
+                if isinstance(p, URLResolver):
+                    if p.namespace != "admin":  # the admin is covered by the admin_* budgets
+                        yield from names(p.url_patterns)
+                elif p.name:
+                    yield p.name
+
+        self.assertEqual(sorted(set(names(get_resolver().url_patterns)) - set(BUDGETS)), [])
+
+    # ---------- accounts ----------
+
+    def test_dashboard(self):
+        self.login(self.customer)
+        self.measure("dashboard", lambda: self.client.get(reverse("dashboard")))
+
+    def test_api_access(self):
+        self.login(self.customer)
+        self.measure("api_access", lambda: self.client.get(reverse("api_access")))
+
+    def test_setup_totp(self):
+        self.login(self.customer)
+        self.measure("setup_totp", lambda: self.client.get(reverse("setup_totp")))
+
+    def test_logout(self):
+        self.measure("logout", lambda: self.client.get(reverse("logout")), lambda: self.login(self.customer))
+
+    def test_verify_totp(self):
+        def pending_2fa():
+            session = self.client.session
+            session["pre_2fa_user_id"] = self.customer.pk
+            session.save()
+
+        self.measure("verify_totp", lambda: self.client.get(reverse("verify_totp")), pending_2fa)
+
+    def test_request_api_token(self):
+        self.login(self.customer)
+        issued = ("jwt", timezone.now() + timedelta(hours=1), None)
+        with patch("api_integration.utils.issue_jwt_with_autoreg", return_value=issued):
+            self.measure("request_api_token",
+                         lambda: self.client.post(reverse("request_api_token"), {"email": "c@example.com", "password": "pw"}))
+
+    # ---------- shop / admin panel ----------
+
+    def test_orders(self):
+        self.login(self.customer)
+        self.measure("orders", lambda: self.client.get(reverse("orders")))
+
+    def test_cart_detail(self):
+        self.login(self.customer)
+
+        def fill():
+            for product in Product.objects.all():
+                self.client.post(reverse("cart_add", args=[product.slug]))
+
+        self.measure("cart_detail", lambda: self.client.get(reverse("cart_detail")), fill)
+
+    def test_cart_add(self):
+        self.measure("cart_add", lambda: self.client.post(reverse("cart_add", args=["product-0"])))
+
+    def test_cart_update(self):
+        self.measure("cart_update", lambda: self.client.post(reverse("cart_update", args=["product-0"]), {"quantity": 2}))
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test")
+    def test_cart_checkout(self):
+        self.login(self.customer)
+
+        def fill():
+            Product.objects.update(stripe_price_id="price_perf")
+            for product in Product.objects.all():
+                self.client.post(reverse("cart_add", args=[product.slug]))
+
+        with patch("stripe.checkout.Session.create") as create:
+            create.return_value.id, create.return_value.url = "cs_perf", "https://checkout.stripe.test/"
+            self.measure("cart_checkout", lambda: self.client.post(reverse("cart_checkout")), fill)
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test")
+    def test_create_checkout_session(self):
+        self.login(self.customer)
+        with patch("stripe.checkout.Session.create") as create:
+            create.return_value.url = "https://checkout.stripe.test/"
+            self.measure("create_checkout_session",
+                         lambda: self.client.get(reverse("create_checkout_session", args=["product-0"])),
+                         lambda: Product.objects.update(stripe_price_id="price_perf"))
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test")
+    def test_checkout_success(self):
+        # Usually the webhook worker got there first: one lookup, no Stripe call
+        self.login(self.customer)
+        with patch("stripe.checkout.Session.retrieve") as retrieve:
+            self.measure("checkout_success", lambda: self.client.get(reverse("checkout_success") + "?session_id=cs_own_0"))
+        retrieve.assert_not_called()
+
+    def test_checkout_cancel(self):
+        self.login(self.customer)
+        self.measure("checkout_cancel", lambda: self.client.get(reverse("checkout_cancel")))
+
+    def test_pending_orders(self):
+        self.login(self.staff)
+        self.measure("pending_orders", lambda: self.client.get(reverse("pending_orders")))
+
+    def test_approve_order(self):
+        self.login(self.staff)
+
+        def new_order():
+            self.order = Order.objects.create(user=self.customer, stripe_session_id=f"cs_approve_{next(self.seq)}", paid=True)
+
+        self.measure("approve_order", lambda: self.client.get(reverse("approve_order", args=[self.order.id])), new_order)
+
+    def test_bulk_approve_orders(self):
+        self.login(self.staff)
+
+        def reopen():
+            Order.objects.update(approved=False)
+
+        self.measure("bulk_approve_orders", lambda: self.client.post(reverse("bulk_approve_orders"), {"all": "1"}), reopen)
+
+    def test_export_orders_csv(self):
+        self.login(self.staff)
+
+        def export():
+            res = self.client.get(reverse("export_orders_csv"))
+            b"".join(res.streaming_content)  # the queries run while streaming
+            return res
+
+        self.measure("export_orders_csv", export)
+
+    def test_sales_dashboard(self):
+        from reporting.rebuild import rebuild_all
+        self.login(self.staff)
+        self.measure("sales_dashboard", lambda: self.client.get(reverse("sales_dashboard")), rebuild_all)
+
+    # ---------- django admin ----------
+
+    def test_admin_orders(self):
+        self.login(self.admin)
+        self.measure("admin_orders", lambda: self.client.get(reverse("admin:shop_order_changelist")))
+
+    def test_admin_subscriptions(self):
+        from subscriptions.admin import SubModel
+        self.login(self.admin)
+        url = reverse(f"admin:subscriptions_{SubModel._meta.model_name}_changelist")
+        self.measure("admin_subscriptions", lambda: self.client.get(url))
+
+    # ---------- metrics ----------
+
+    def test_metrics_dashboard(self):
+        self.login(self.customer)
+        self.measure("metrics_dashboard", lambda: self.client.get(reverse("metrics_dashboard")))
+
+    def test_metrics_proxy(self):
+        self.login(self.customer)
+        url = reverse("metrics_proxy") + "?start=2024-01-01T00:00:00Z&end=2024-01-03T00:00:00Z&points=100"
+        with patch("api_integration.utils.fetch_metrics", side_effect=fake_upstream([])):
+            self.measure("metrics_proxy", lambda: self.client.get(url))
+
+    def test_metrics_proxy_stats(self):
+        self.login(self.staff)
+        self.measure("metrics_proxy_stats", lambda: self.client.get(reverse("metrics_proxy_stats")))
+
+    # ---------- payments ----------
+
+    @override_settings(STRIPE_WEBHOOK_SECRET="whsec_test")
+    def test_stripe_webhook(self):
+        def post():
+            n = next(self.seq)
+            event = {"id": f"evt_perf_{n}", "type": "customer.subscription.updated", "created": 1700000000,
+                     "data": {"object": {"id": "sub_perf", "status": "active"}}}
+            with patch("stripe.Webhook.construct_event", return_value=event):
+                return self.client.post(reverse("stripe_webhook"), data=json.dumps(event),
+                                        content_type="application/json", HTTP_STRIPE_SIGNATURE="sig")
+
+        self.measure("stripe_webhook", post)
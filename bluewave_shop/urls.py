@@ -11,5 +11,6 @@ urlpatterns = [
     path('subscriptions/', include('subscriptions.urls')),
     path('metrics/', include('metrics.urls')),
     path('payments/', include('payments.urls')),
+    path('reports/', include('reporting.urls')),
     path('admin-panel/', include('bluewave_shop.admin_panel_urls')),
 ]
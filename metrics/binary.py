@@ -0,0 +1,69 @@
+"""
+Compact columnar encoding for dashboard series ("BWS1").
+
+All values are little-endian:
+
+    0   4 bytes   magic b"BWS1"
+    4   uint32    row count n
+    8   uint32    length L of the column-name list
+    12  L bytes   UTF-8 column names, comma separated; zero-padded to a multiple of 8
+    ..  n int64   timestamps, epoch milliseconds
+    ..  n float32 per named column, in order (NaN where a value is missing)
+
+The timestamp block starts on an 8-byte boundary so the browser can view it
+directly as a BigInt64Array and each value column as a Float32Array.
+"""
+import struct
+import sys
+from array import array
+
+from .series import parse_timestamp, series_columns
+
+CONTENT_TYPE = "application/vnd.bluewave.series"
+MAGIC = b"BWS1"
+
+
+def _numeric(values) -> bool:
+    return all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values)
+
+
+def _le_bytes(arr: array) -> bytes:
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def encode_series(data: dict) -> bytes:
+    """Encode a columnar payload; rows with unparseable timestamps and non-numeric columns are dropped."""
+    rows, millis = [], array("q")
+    for i, ts in enumerate(data["timestamps"]):
+        dt = parse_timestamp(ts)
+        if dt is not None:
+            rows.append(i)
+            millis.append(int(dt.timestamp() * 1000))
+
+    names = [c for c in series_columns(data)[1:] if _numeric(data[c])]
+    name_bytes = ",".join(names).encode("utf-8")
+    pad = (-(12 + len(name_bytes))) % 8
+
+    parts = [MAGIC, struct.pack("<II", len(rows), len(name_bytes)), name_bytes, b"\0" * pad, _le_bytes(millis)]
+    nan = float("nan")
+    for name in names:
+        col = data[name]
+        parts.append(_le_bytes(array("f", (nan if col[i] is None else col[i] for i in rows))))
+    return b"".join(parts)
+
+
+def decode_series(blob: bytes) -> dict:
+    """Inverse of encode_series (timestamps come back as epoch milliseconds)."""
+    if blob[:4] != MAGIC:
+        raise ValueError("not a BWS1 payload")
+    n, name_len = struct.unpack_from("<II", blob, 4)
+    names = [s for s in blob[12:12 + name_len].decode("utf-8").split(",") if s]
+    offset = 12 + name_len + (-(12 + name_len)) % 8
+    out = {"timestamps": list(struct.unpack_from(f"<{n}q", blob, offset))}
+    offset += 8 * n
+    for name in names:
+        out[name] = list(struct.unpack_from(f"<{n}f", blob, offset))
+        offset += 4 * n
+    return out
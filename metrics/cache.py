@@ -0,0 +1,166 @@
+"""
+In-process, range-aware cache for /observations.
+
+Time is cut into aligned buckets (METRICS_CACHE_BUCKET_SECONDS). A request is
+answered from the buckets already held; only the missing runs of buckets are
+fetched from upstream, then everything is stitched and trimmed to [start, end).
+Buckets that are still open (end in the future) are never stored.
+Least-recently-used buckets are evicted once METRICS_CACHE_MAX_BYTES is reached.
+Concurrent misses for the same aligned run share one upstream call (SingleFlight).
+
+The cache lives per worker process; it is not shared between gunicorn workers.
+"""
+import json
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_tz
+from typing import Callable, Optional, Tuple
+
+from django.conf import settings
+
+from api_integration import utils as api
+from api_integration.singleflight import SingleFlight
+from .series import concat_series, is_columnar, slice_series
+
+
+def _upstream_fetch(start_iso: str, end_iso: str):
+    # Looked up at call time so tests can patch api_integration.utils.fetch_metrics
+    return api.fetch_metrics(start_iso, end_iso)
+
+
+class ObservationCache:
+    def __init__(self, bucket_seconds: int = 3600, max_bytes: int = 32 * 1024 * 1024,
+                 fetch: Optional[Callable] = None, clock: Optional[Callable[[], datetime]] = None):
+        self.bucket_seconds = int(bucket_seconds)
+        self.max_bytes = int(max_bytes)
+        self._fetch = fetch or _upstream_fetch
+        self._clock = clock or (lambda: datetime.now(tz=dt_tz.utc))
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # bucket index -> (columnar chunk, size in bytes)
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "upstream_calls": 0, "evictions": 0}
+        self.flights = SingleFlight()
+        self.endpoint = getattr(settings, "BLUEWAVE_API_METRICS_ENDPOINT", "/observations")
+
+    # ---------- bucket arithmetic ----------
+
+    def _bucket_of(self, dt: datetime) -> int:
+        return math.floor(dt.timestamp() / self.bucket_seconds)
+
+    def _bucket_bounds(self, b: int) -> Tuple[datetime, datetime]:
+        start = datetime.fromtimestamp(b * self.bucket_seconds, tz=dt_tz.utc)
+        end = datetime.fromtimestamp((b + 1) * self.bucket_seconds, tz=dt_tz.utc)
+        return start, end
+
+    # ---------- public API ----------
+
+    def get_range(self, start: datetime, end: datetime):
+        """
+        Return (data, error) for [start, end), fetching only the uncached buckets.
+        """
+        first = self._bucket_of(start)
+        last = math.ceil(end.timestamp() / self.bucket_seconds) - 1  # end is exclusive
+        open_from = self._bucket_of(self._clock())
+
+        parts = {}
+        missing = []
+        with self._lock:
+            for b in range(first, last + 1):
+                entry = self._buckets.get(b)
+                if entry is not None:
+                    self._buckets.move_to_end(b)
+                    parts[b] = entry[0]
+                    self.stats["hits"] += 1
+                else:
+                    missing.append(b)
+                    self.stats["misses"] += 1
+
+        for run_start, run_end in _runs(missing):
+            lo, _ = self._bucket_bounds(run_start)
+            _, hi = self._bucket_bounds(run_end)
+            # Keyed on the aligned run, so dashboards opened together share one call
+            key = (lo.isoformat(), hi.isoformat(), self.endpoint)
+            data, error = self.flights.do(key, self._fetch_upstream, *key[:2])
+            if error:
+                return None, error
+            if not is_columnar(data):
+                # Unknown shape: can't split it into buckets, so serve it uncached.
+                return self._fetch(start.isoformat(), end.isoformat())
+            for b in range(run_start, run_end + 1):
+                b_lo, b_hi = self._bucket_bounds(b)
+                chunk = slice_series(data, b_lo, b_hi)
+                parts[b] = chunk
+                if b < open_from:
+                    self._store(b, chunk)
+
+        stitched = concat_series(parts[b] for b in range(first, last + 1))
+        return slice_series(stitched, start, end), None
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    # ---------- internals ----------
+
+    def _fetch_upstream(self, start_iso: str, end_iso: str):
+        with self._lock:
+            self.stats["upstream_calls"] += 1
+        return self._fetch(start_iso, end_iso)
+
+    def _store(self, b: int, chunk: dict):
+        size = len(json.dumps(chunk, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._buckets.pop(b, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._buckets[b] = (chunk, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._buckets:
+                _, (_, evicted) = self._buckets.popitem(last=False)
+                self._bytes -= evicted
+                self.stats["evictions"] += 1
+
+
+def _runs(indices):
+    """Group sorted ints into contiguous (first, last) runs."""
+    run = None
+    for i in indices:
+        if run and i == run[1] + 1:
+            run[1] = i
+        else:
+            if run:
+                yield tuple(run)
+            run = [i, i]
+    if run:
+        yield tuple(run)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_observation_cache() -> ObservationCache:
+    """Process-wide cache, built lazily from settings."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ObservationCache(
+                    bucket_seconds=getattr(settings, "METRICS_CACHE_BUCKET_SECONDS", 3600),
+                    max_bytes=getattr(settings, "METRICS_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+                )
+    return _cache
+
+
+def reset_observation_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
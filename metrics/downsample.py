@@ -0,0 +1,117 @@
+"""
+Server-side downsampling for the columnar /observations payload.
+
+All series share one `timestamps` column, so every method picks a single set of
+row indices that is applied to every column:
+
+- "lttb":   Largest-Triangle-Three-Buckets, scoring each candidate by the sum of
+            its (range-normalised) triangle areas across the charted series.
+- "minmax": per bucket keep the rows holding each series' min and max, which
+            preserves spikes; buckets are sized so the result stays within
+            `points` (fewer, wider buckets when many series are charted).
+"""
+import math
+from typing import List
+
+from .series import SERIES_FIELDS, parse_timestamp, take
+
+METHODS = ("lttb", "minmax")
+
+
+def _x_values(timestamps) -> List[float]:
+    xs = []
+    for i, ts in enumerate(timestamps):
+        dt = parse_timestamp(ts)
+        xs.append(dt.timestamp() if dt else float(i))
+    return xs
+
+
+def _normalised(values) -> List[float]:
+    """Scale a series to [0, 1] so no single series dominates the area score; None stays None."""
+    nums = [v for v in values if isinstance(v, (int, float))]
+    if not nums:
+        return [None] * len(values)
+    lo, hi = min(nums), max(nums)
+    span = (hi - lo) or 1.0
+    return [(v - lo) / span if isinstance(v, (int, float)) else None for v in values]
+
+
+def _mean(values) -> float:
+    nums = [v for v in values if v is not None]
+    return sum(nums) / len(nums) if nums else None
+
+
+def lttb_indices(xs, series, points: int) -> List[int]:
+    n = len(xs)
+    if points >= n:
+        return list(range(n))
+    if points < 3:
+        # No room for buckets between the end points
+        return [0, n - 1][:max(points, 1)]
+
+    every = (n - 2) / (points - 2)
+    selected = [0]
+    a = 0
+    for i in range(points - 2):
+        avg_start = int(math.floor((i + 1) * every)) + 1
+        avg_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        avg_x = sum(xs[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_ys = [_mean(ys[avg_start:avg_end]) for ys in series]
+
+        best, best_area = None, -1.0
+        for j in range(int(math.floor(i * every)) + 1, int(math.floor((i + 1) * every)) + 1):
+            area = 0.0
+            for ys, avg_y in zip(series, avg_ys):
+                ya, yj = ys[a], ys[j]
+                if ya is None or yj is None or avg_y is None:
+                    continue
+                area += abs((xs[a] - avg_x) * (yj - ya) - (xs[a] - xs[j]) * (avg_y - ya))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def _evenly(indices: List[int], points: int) -> List[int]:
+    """`points` of the sorted `indices`, evenly spread, always keeping the first and last."""
+    if points >= len(indices):
+        return indices
+    if points < 2:
+        return indices[:points]
+    step = (len(indices) - 1) / (points - 1)
+    return [indices[round(i * step)] for i in range(points)]
+
+
+def minmax_indices(n: int, series, points: int) -> List[int]:
+    if n <= points:
+        return list(range(n))
+
+    # First and last row, plus up to 2 rows (min, max) per series per bucket
+    buckets = max(1, (points - 2) // (2 * max(len(series), 1)))
+    keep = {0, n - 1}
+    size = n / buckets
+    for b in range(buckets):
+        lo, hi = int(b * size), min(int((b + 1) * size), n)
+        for ys in series:
+            window = [(ys[i], i) for i in range(lo, hi) if ys[i] is not None]
+            if window:
+                keep.add(min(window)[1])
+                keep.add(max(window)[1])
+    # Only when `points` is too small for even one bucket of every series
+    return _evenly(sorted(keep), points)
+
+
+def downsample(data: dict, points: int, method: str = "lttb") -> dict:
+    """Reduce a columnar payload to roughly `points` rows."""
+    n = len(data["timestamps"])
+    if n <= points:
+        return data
+    fields = [f for f in SERIES_FIELDS if isinstance(data.get(f), list) and len(data[f]) == n]
+    series = [_normalised(data[f]) for f in fields]
+    if method == "minmax":
+        indices = minmax_indices(n, series, points)
+    else:
+        indices = lttb_indices(_x_values(data["timestamps"]), series, points)
+    return take(data, indices)
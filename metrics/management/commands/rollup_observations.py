@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from metrics.models import ObservationRollup
+from metrics.rollups import floor_to, rollup_window
+from metrics.series import parse_timestamp
+
+
+class Command(BaseCommand):
+    help = "Incrementally roll /observations up into hourly and daily ObservationRollup rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="ISO timestamp to (re)build from. Default: after the last hourly row.")
+        parser.add_argument("--until", help="ISO timestamp to stop at. Default: start of the current hour.")
+        parser.add_argument("--backfill-days", type=int, default=30, help="History to pull when no rollups exist yet.")
+        parser.add_argument("--chunk-hours", type=int, default=24, help="Hours fetched from upstream per call.")
+
+    def handle(self, *args, **opts):
+        HOUR = ObservationRollup.HOUR
+        until = parse_timestamp(opts["until"]) if opts["until"] else timezone.now()
+        if until is None:
+            raise CommandError("--until must be an ISO-8601 timestamp")
+        until = floor_to(until, HOUR)  # only closed hours are rolled up
+
+        if opts["since"]:
+            since = parse_timestamp(opts["since"])
+            if since is None:
+                raise CommandError("--since must be an ISO-8601 timestamp")
+            since = floor_to(since, HOUR)
+        else:
+            last = ObservationRollup.objects.filter(resolution=HOUR).order_by("-bucket_start").first()
+            since = last.bucket_start + timedelta(hours=1) if last else until - timedelta(days=opts["backfill_days"])
+
+        if since >= until:
+            self.stdout.write("Rollups are up to date.")
+            return
+
+        step = timedelta(hours=opts["chunk_hours"])
+        hours = days = 0
+        lo = since
+        while lo < until:
+            hi = min(lo + step, until)
+            h, d, error = rollup_window(lo, hi)
+            if error:
+                raise CommandError(f"Stopped at {lo.isoformat()}: {error}")
+            hours += h
+            days += d
+            lo = hi
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {since.isoformat()} → {until.isoformat()}: {hours} hourly, {days} daily row writes."
+        ))
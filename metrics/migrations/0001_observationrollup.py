@@ -0,0 +1,40 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObservationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('salinity_min', models.FloatField(null=True)),
+                ('salinity_max', models.FloatField(null=True)),
+                ('salinity_sum', models.FloatField(default=0)),
+                ('salinity_count', models.PositiveIntegerField(default=0)),
+                ('ph_min', models.FloatField(null=True)),
+                ('ph_max', models.FloatField(null=True)),
+                ('ph_sum', models.FloatField(default=0)),
+                ('ph_count', models.PositiveIntegerField(default=0)),
+                ('pollutant_index_min', models.FloatField(null=True)),
+                ('pollutant_index_max', models.FloatField(null=True)),
+                ('pollutant_index_sum', models.FloatField(default=0)),
+                ('pollutant_index_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='observationrollup',
+            constraint=models.UniqueConstraint(fields=('resolution', 'bucket_start'), name='uniq_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import models
+
+# Rolled-up series, in the order they appear on the dashboard
+ROLLUP_FIELDS = ("salinity", "ph", "pollutant_index")
+
+
+class ObservationRollup(models.Model):
+    """
+    Hourly / daily aggregates of upstream observations, filled incrementally by
+    `manage.py rollup_observations`. Sums and counts are stored (not means) so
+    daily rows can be rebuilt exactly from hourly ones.
+    """
+    HOUR = "hour"
+    DAY = "day"
+    RESOLUTIONS = [(HOUR, "Hourly"), (DAY, "Daily")]
+
+    resolution = models.CharField(max_length=8, choices=RESOLUTIONS)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    salinity_min = models.FloatField(null=True)
+    salinity_max = models.FloatField(null=True)
+    salinity_sum = models.FloatField(default=0)
+    salinity_count = models.PositiveIntegerField(default=0)
+
+    ph_min = models.FloatField(null=True)
+    ph_max = models.FloatField(null=True)
+    ph_sum = models.FloatField(default=0)
+    ph_count = models.PositiveIntegerField(default=0)
+
+    pollutant_index_min = models.FloatField(null=True)
+    pollutant_index_max = models.FloatField(null=True)
+    pollutant_index_sum = models.FloatField(default=0)
+    pollutant_index_count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["resolution", "bucket_start"], name="uniq_rollup_bucket"),
+        ]
+
+    def mean(self, field):
+        n = getattr(self, f"{field}_count")
+        return getattr(self, f"{field}_sum") / n if n else None
+
+    def __str__(self):
+        return f"{self.resolution} · {self.bucket_start:%Y-%m-%d %H:%M}"
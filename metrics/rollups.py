@@ -0,0 +1,122 @@
+"""
+Incremental hourly/daily rollups of /observations into ObservationRollup.
+
+Hourly rows are computed from raw upstream points; daily rows are rebuilt
+from the hourly rows of the days that were touched. Both are upserted, so
+re-running a window simply replaces its rows.
+"""
+from datetime import datetime, timedelta, timezone as dt_tz
+from typing import Dict, Iterable, List
+
+from api_integration import utils as api
+from bluewave_shop.db import upsert_options
+from .models import ROLLUP_FIELDS, ObservationRollup
+from .series import is_columnar, parse_timestamp
+
+RESOLUTION_SECONDS = {ObservationRollup.HOUR: 3600, ObservationRollup.DAY: 86400}
+STAT_FIELDS = ["count"] + [f"{f}_{s}" for f in ROLLUP_FIELDS for s in ("min", "max", "sum", "count")]
+
+
+def floor_to(dt: datetime, resolution: str) -> datetime:
+    step = RESOLUTION_SECONDS[resolution]
+    return datetime.fromtimestamp(int(dt.timestamp()) // step * step, tz=dt_tz.utc)
+
+
+def _empty_stats() -> dict:
+    stats = {"count": 0}
+    for f in ROLLUP_FIELDS:
+        stats.update({f"{f}_min": None, f"{f}_max": None, f"{f}_sum": 0.0, f"{f}_count": 0})
+    return stats
+
+
+def _merge(stats: dict, other: dict):
+    """Fold one set of stats into another (used for hour -> day)."""
+    stats["count"] += other["count"]
+    for f in ROLLUP_FIELDS:
+        for agg, pick in (("min", min), ("max", max)):
+            a, b = stats[f"{f}_{agg}"], other[f"{f}_{agg}"]
+            stats[f"{f}_{agg}"] = b if a is None else a if b is None else pick(a, b)
+        stats[f"{f}_sum"] += other[f"{f}_sum"]
+        stats[f"{f}_count"] += other[f"{f}_count"]
+
+
+def aggregate_hours(data: dict) -> Dict[datetime, dict]:
+    """Hourly stats from a columnar payload."""
+    buckets: Dict[datetime, dict] = {}
+    columns = {f: data.get(f) or [] for f in ROLLUP_FIELDS}
+    for i, ts in enumerate(data["timestamps"]):
+        dt = parse_timestamp(ts)
+        if dt is None:
+            continue
+        stats = buckets.setdefault(floor_to(dt, ObservationRollup.HOUR), _empty_stats())
+        stats["count"] += 1
+        for f, values in columns.items():
+            v = values[i] if i < len(values) else None
+            if not isinstance(v, (int, float)):
+                continue
+            stats[f"{f}_min"] = v if stats[f"{f}_min"] is None else min(stats[f"{f}_min"], v)
+            stats[f"{f}_max"] = v if stats[f"{f}_max"] is None else max(stats[f"{f}_max"], v)
+            stats[f"{f}_sum"] += v
+            stats[f"{f}_count"] += 1
+    return buckets
+
+
+def upsert(resolution: str, buckets: Dict[datetime, dict]) -> int:
+    rows = [ObservationRollup(resolution=resolution, bucket_start=start, **stats) for start, stats in buckets.items()]
+    ObservationRollup.objects.bulk_create(
+        rows, **upsert_options(["resolution", "bucket_start"], STAT_FIELDS + ["updated_at"])
+    )
+    return len(rows)
+
+
+def rebuild_days(days: Iterable[datetime]) -> int:
+    """Recompute daily rows from the hourly rows of the given (UTC midnight) days."""
+    days = sorted(set(days))
+    if not days:
+        return 0
+    hourly = ObservationRollup.objects.filter(
+        resolution=ObservationRollup.HOUR,
+        bucket_start__gte=days[0],
+        bucket_start__lt=days[-1] + timedelta(days=1),
+    ).values("bucket_start", *STAT_FIELDS)
+    wanted = set(days)
+    daily: Dict[datetime, dict] = {}
+    for row in hourly:
+        day = floor_to(row.pop("bucket_start"), ObservationRollup.DAY)
+        if day in wanted:
+            _merge(daily.setdefault(day, _empty_stats()), row)
+    return upsert(ObservationRollup.DAY, daily)
+
+
+def rollup_window(start: datetime, end: datetime):
+    """
+    Roll up [start, end) (hour-aligned) from upstream. Returns
+    (hourly rows written, daily rows written, error).
+    """
+    data, error = api.fetch_metrics(start.isoformat(), end.isoformat())
+    if error:
+        return 0, 0, error
+    if not is_columnar(data):
+        return 0, 0, "upstream data is not columnar"
+    hours = {h: s for h, s in aggregate_hours(data).items() if start <= h < end}
+    written = upsert(ObservationRollup.HOUR, hours)
+    days = {floor_to(h, ObservationRollup.DAY) for h in hours}
+    return written, rebuild_days(days), None
+
+
+def rollup_series(resolution: str, start: datetime, end: datetime) -> dict:
+    """Columnar payload (means plus min/max/count) for the rollups overlapping [start, end)."""
+    rows: List[ObservationRollup] = list(
+        ObservationRollup.objects.filter(
+            resolution=resolution,
+            bucket_start__gte=floor_to(start, resolution),
+            bucket_start__lt=end,
+        ).order_by("bucket_start")
+    )
+    out = {"timestamps": [r.bucket_start.isoformat() for r in rows]}
+    for f in ROLLUP_FIELDS:
+        out[f] = [r.mean(f) for r in rows]
+        out[f"{f}_min"] = [getattr(r, f"{f}_min") for r in rows]
+        out[f"{f}_max"] = [getattr(r, f"{f}_max") for r in rows]
+    out["count"] = [r.count for r in rows]
+    return out
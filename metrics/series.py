@@ -0,0 +1,87 @@
+import math
+from datetime import datetime, timezone as dt_tz
+from typing import Iterable, List, Optional, Tuple
+
+# Columns the dashboard charts; upstream may send extra ones, which are carried along.
+SERIES_FIELDS = ("salinity", "ph", "pollutant_index")
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """
+    Parse an ISO-8601 string (or epoch seconds) into an aware datetime.
+    Naive values are read as UTC. Returns None if the value can't be parsed.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=dt_tz.utc)
+    try:
+        dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=dt_tz.utc)
+    return dt
+
+
+def is_columnar(data) -> bool:
+    """True if `data` looks like {"timestamps": [...], "<series>": [...], ...}."""
+    return isinstance(data, dict) and isinstance(data.get("timestamps"), list)
+
+
+def series_columns(data) -> list:
+    """Names of the list columns that line up with `timestamps` (timestamps first)."""
+    n = len(data["timestamps"])
+    return ["timestamps"] + [
+        k for k, v in data.items() if k != "timestamps" and isinstance(v, list) and len(v) == n
+    ]
+
+
+def empty_series(columns: Iterable[str] = ()) -> dict:
+    cols = list(columns) or ["timestamps", *SERIES_FIELDS]
+    return {c: [] for c in cols}
+
+
+def take(data: dict, indices: Iterable[int], columns=None) -> dict:
+    """Pick the given row indices from every column."""
+    columns = columns or series_columns(data)
+    idx = list(indices)
+    return {c: [data[c][i] for i in idx] for c in columns}
+
+
+def slice_series(data: dict, start: datetime, end: datetime) -> dict:
+    """Rows whose timestamp falls in [start, end). Unparseable timestamps are dropped."""
+    keep = []
+    for i, ts in enumerate(data["timestamps"]):
+        dt = parse_timestamp(ts)
+        if dt is not None and start <= dt < end:
+            keep.append(i)
+    return take(data, keep)
+
+
+def concat_series(parts: Iterable[dict]) -> dict:
+    """Concatenate columnar chunks (already in time order) into one payload."""
+    parts = [p for p in parts if p]
+    if not parts:
+        return empty_series()
+    columns = series_columns(parts[0])
+    out = {c: [] for c in columns}
+    for p in parts:
+        n = len(p.get("timestamps") or [])
+        for c in columns:
+            out[c].extend(p.get(c) or [None] * n)
+    return out
+
+
+def split_window(start: datetime, end: datetime, chunk_seconds: int) -> List[Tuple[datetime, datetime]]:
+    """
+    Cut [start, end) into consecutive chunks whose inner edges sit on multiples
+    of `chunk_seconds` (so they line up with the cache buckets).
+    """
+    edges = [start]
+    k = math.floor(start.timestamp() / chunk_seconds) + 1
+    while k * chunk_seconds < end.timestamp():
+        edges.append(datetime.fromtimestamp(k * chunk_seconds, tz=dt_tz.utc))
+        k += 1
+    edges.append(end)
+    return list(zip(edges, edges[1:]))
@@ -1,11 +1,33 @@
-from django.test import TestCase, Client
+from django.test import TestCase, SimpleTestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
 from unittest.mock import patch
+from datetime import datetime, timedelta, timezone as dt_tz
+
+from metrics.cache import ObservationCache, reset_observation_cache
+from metrics.series import parse_timestamp
+
+
+def fake_upstream(calls):
+    """Hourly points for whatever window is asked; records each (start, end) call."""
+    def fetch(start_iso, end_iso):
+        calls.append((start_iso, end_iso))
+        t, end = parse_timestamp(start_iso), parse_timestamp(end_iso)
+        data = {"timestamps": [], "salinity": [], "ph": [], "pollutant_index": []}
+        while t < end:
+            data["timestamps"].append(t.isoformat())
+            data["salinity"].append(35.0)
+            data["ph"].append(8.1)
+            data["pollutant_index"].append(0.2)
+            t += timedelta(hours=1)
+        return data, None
+    return fetch
+
 
 class MetricsTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user("u", "u@ex.com", "Pass123!")
+        reset_observation_cache()
 
     def test_dashboard_requires_login(self):
         c = Client()
@@ -18,3 +40,252 @@ class MetricsTests(TestCase):
         c.login(username="u", password="Pass123!")
         res = c.get(reverse("metrics_proxy")+"?start=2025-01-01T00:00:00&end=2025-01-02T00:00:00")
         self.assertEqual(res.status_code, 200)
+
+    def test_proxy_rejects_bad_window(self):
+        c = Client()
+        c.login(username="u", password="Pass123!")
+        res = c.get(reverse("metrics_proxy")+"?start=yesterday&end=2025-01-02T00:00:00")
+        self.assertEqual(res.status_code, 400)
+
+
+class ObservationCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = []
+        self.now = datetime(2025, 3, 1, tzinfo=dt_tz.utc)
+        self.cache = ObservationCache(bucket_seconds=3600, fetch=fake_upstream(self.calls), clock=lambda: self.now)
+
+    def test_overlapping_window_fetches_only_the_gap(self):
+        day = datetime(2025, 2, 1, tzinfo=dt_tz.utc)
+        first, _ = self.cache.get_range(day, day + timedelta(days=7))
+        self.assertEqual(len(first["timestamps"]), 7 * 24)
+
+        shifted = day + timedelta(days=1, minutes=30)
+        data, err = self.cache.get_range(shifted, shifted + timedelta(days=7))
+        self.assertIsNone(err)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(parse_timestamp(self.calls[1][0]), day + timedelta(days=7))
+        self.assertEqual(len(data["timestamps"]), 7 * 24)
+        self.assertEqual(parse_timestamp(data["timestamps"][0]), day + timedelta(days=1, hours=1))
+
+    def test_open_buckets_are_not_cached(self):
+        start = self.now - timedelta(hours=2)
+        self.cache.get_range(start, self.now + timedelta(hours=1))
+        self.cache.get_range(start, self.now + timedelta(hours=1))
+        self.assertEqual(self.calls[1][0], self.now.isoformat())
+
+    def test_evicts_least_recently_used_over_budget(self):
+        day = datetime(2025, 2, 1, tzinfo=dt_tz.utc)
+        self.cache.get_range(day, day + timedelta(hours=1))
+        one_bucket = self.cache.size_bytes
+        self.cache.max_bytes = one_bucket * 3
+        self.cache.get_range(day, day + timedelta(hours=6))
+        self.assertLessEqual(self.cache.size_bytes, self.cache.max_bytes)
+        self.assertGreater(self.cache.stats["evictions"], 0)
+
+
+class DownsampleTests(SimpleTestCase):
+    def setUp(self):
+        start = datetime(2025, 1, 1, tzinfo=dt_tz.utc)
+        self.data, _ = fake_upstream([])(start.isoformat(), (start + timedelta(days=30)).isoformat())
+        self.data["salinity"][100] = 99.0  # a spike that must survive
+
+    def test_lttb_keeps_shape_and_spike(self):
+        from metrics.downsample import downsample
+        out = downsample(self.data, 50, "lttb")
+        self.assertEqual(len(out["timestamps"]), 50)
+        self.assertEqual({len(v) for v in out.values()}, {50})
+        self.assertIn(99.0, out["salinity"])
+        self.assertEqual(out["timestamps"][0], self.data["timestamps"][0])
+        self.assertEqual(out["timestamps"][-1], self.data["timestamps"][-1])
+
+    def test_minmax_keeps_spike(self):
+        from metrics.downsample import downsample
+        out = downsample(self.data, 50, "minmax")
+        self.assertLess(len(out["timestamps"]), len(self.data["timestamps"]))
+        self.assertIn(99.0, out["salinity"])
+
+    def test_results_never_exceed_points(self):
+        from metrics.downsample import downsample
+        n = len(self.data["timestamps"])
+        for method in ("lttb", "minmax"):
+            for points in (2, 3, 5, 11, 50, 500):
+                out = downsample(self.data, points, method)
+                self.assertLessEqual(len(out["timestamps"]), points, (method, points))
+                self.assertEqual(out["timestamps"][0], self.data["timestamps"][0])
+                self.assertEqual(out["timestamps"][-1], self.data["timestamps"][n - 1])
+
+
+class AsyncProxyTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("u", "u@ex.com", "Pass123!")
+        reset_observation_cache()
+
+    def test_long_window_is_fetched_in_parallel_chunks(self):
+        import threading, time
+        calls, in_flight, peak = [], [0], [0]
+        lock = threading.Lock()
+        upstream = fake_upstream(calls)
+
+        def slow_fetch(start_iso, end_iso):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            return upstream(start_iso, end_iso)
+
+        c = Client()
+        c.login(username="u", password="Pass123!")
+        with patch("api_integration.utils.fetch_metrics", side_effect=slow_fetch), \
+                self.settings(METRICS_PROXY_CHUNK_SECONDS=86400, METRICS_PROXY_MAX_PARALLEL=4):
+            res = c.get(reverse("metrics_proxy") + "?start=2025-01-01T00:00:00&end=2025-01-05T00:00:00")
+        self.assertEqual(res.status_code, 200)
+        ts = res.json()["timestamps"]
+        self.assertEqual(len(ts), 4 * 24)
+        self.assertEqual(ts, sorted(ts, key=parse_timestamp))
+        self.assertEqual(len(calls), 4)
+        self.assertGreater(peak[0], 1)
+
+    def test_requires_login(self):
+        res = Client().get(reverse("metrics_proxy") + "?start=2025-01-01T00:00:00&end=2025-01-02T00:00:00")
+        self.assertEqual(res.status_code, 302)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_identical_windows_share_one_upstream_call(self):
+        import threading
+        calls = []
+        release = threading.Event()
+        upstream = fake_upstream(calls)
+
+        def blocking_fetch(start_iso, end_iso):
+            release.wait(2)
+            return upstream(start_iso, end_iso)
+
+        now = datetime(2025, 3, 1, tzinfo=dt_tz.utc)
+        cache = ObservationCache(fetch=blocking_fetch, clock=lambda: now)
+        start = datetime(2025, 2, 1, tzinfo=dt_tz.utc)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_range(start, start + timedelta(days=1))))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        import time
+        deadline = time.monotonic() + 2
+        while cache.flights.stats["coalesced"] < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.flights.stats, {"calls": 1, "coalesced": 4})
+        self.assertTrue(all(len(data["timestamps"]) == 24 for data, _ in results))
+
+
+class StreamingProxyTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("u", "u@ex.com", "Pass123!")
+        reset_observation_cache()
+        self.client.login(username="u", password="Pass123!")
+        self.url = reverse("metrics_proxy") + "?start=2025-01-01T00:00:00&end=2025-01-03T00:00:00"
+
+    def test_ndjson_emits_one_observation_per_line(self):
+        import json
+        with patch("api_integration.utils.fetch_metrics", side_effect=fake_upstream([])):
+            res = self.client.get(self.url + "&format=ndjson")
+            body = b"".join(res.streaming_content)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 48)
+        self.assertEqual(set(json.loads(lines[0])), {"timestamp", "salinity", "ph", "pollutant_index"})
+
+    def test_raw_pipes_upstream_bytes(self):
+        from unittest.mock import MagicMock
+        upstream = MagicMock(headers={"Content-Type": "application/json"})
+        upstream.iter_content.return_value = iter([b'{"timestamps":', b"[]}"])
+        with patch("api_integration.utils.open_metrics_stream", return_value=(upstream, None)):
+            res = self.client.get(self.url + "&format=raw")
+        self.assertEqual(b"".join(res.streaming_content), b'{"timestamps":[]}')
+        upstream.close.assert_called_once()
+
+
+class BinaryFormatTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("u", "u@ex.com", "Pass123!")
+        reset_observation_cache()
+        self.client.login(username="u", password="Pass123!")
+
+    def test_accept_header_selects_columnar_binary(self):
+        import math
+        from metrics.binary import CONTENT_TYPE, decode_series
+        url = reverse("metrics_proxy") + "?start=2025-01-01T00:00:00&end=2025-01-02T00:00:00"
+        with patch("api_integration.utils.fetch_metrics", side_effect=fake_upstream([])):
+            plain = self.client.get(url)
+            as_json = plain.json()
+            res = self.client.get(url, HTTP_ACCEPT=CONTENT_TYPE)
+            explicit = self.client.get(url + "&format=json")
+        self.assertEqual(res["Content-Type"], CONTENT_TYPE)
+        self.assertIn("Accept", plain["Vary"])
+        self.assertIn("Accept", res["Vary"])
+        self.assertNotIn("Accept", explicit.get("Vary", ""))
+        self.assertLess(len(res.content), len(str(as_json)))
+        data = decode_series(res.content)
+        self.assertEqual(len(data["timestamps"]), 24)
+        self.assertEqual(data["timestamps"][0], int(datetime(2025, 1, 1, tzinfo=dt_tz.utc).timestamp() * 1000))
+        self.assertTrue(math.isclose(data["ph"][0], 8.1, rel_tol=1e-6))
+
+    def test_non_columnar_data_falls_back_to_json_when_accepted(self):
+        from metrics.binary import CONTENT_TYPE
+        url = reverse("metrics_proxy") + "?start=2025-01-01T00:00:00&end=2025-01-02T00:00:00"
+        rows = [{"timestamp": "2025-01-01T00:00:00Z", "ph": 8.1}]
+        with patch("api_integration.utils.fetch_metrics", return_value=(rows, None)):
+            res = self.client.get(url, HTTP_ACCEPT=f"{CONTENT_TYPE}, application/json")
+            self.assertEqual((res.status_code, res["Content-Type"]), (200, "application/json"))
+            self.assertEqual(res.json(), rows)
+            reset_observation_cache()
+            self.assertEqual(self.client.get(url, HTTP_ACCEPT=CONTENT_TYPE).status_code, 502)
+            reset_observation_cache()
+            self.assertEqual(self.client.get(url + "&format=bin", HTTP_ACCEPT=f"{CONTENT_TYPE}, application/json").status_code, 502)
+
+    def test_missing_values_become_nan(self):
+        import math
+        from metrics.binary import decode_series, encode_series
+        blob = encode_series({"timestamps": ["2025-01-01T00:00:00Z"], "salinity": [None], "site": ["x"]})
+        data = decode_series(blob)
+        self.assertTrue(math.isnan(data["salinity"][0]))
+        self.assertNotIn("site", data)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("u", "u@ex.com", "Pass123!")
+        self.client.login(username="u", password="Pass123!")
+
+    def run_rollup(self, calls, **opts):
+        from django.core.management import call_command
+        from io import StringIO
+        with patch("api_integration.utils.fetch_metrics", side_effect=fake_upstream(calls)):
+            call_command("rollup_observations", stdout=StringIO(), **opts)
+
+    def test_incremental_rollup_and_aggregate_view(self):
+        from metrics.models import ObservationRollup
+        calls = []
+        self.run_rollup(calls, since="2025-01-01T00:00:00Z", until="2025-01-03T00:00:00Z")
+        self.assertEqual(ObservationRollup.objects.filter(resolution="hour").count(), 48)
+        self.assertEqual(ObservationRollup.objects.filter(resolution="day").count(), 2)
+
+        calls.clear()
+        self.run_rollup(calls, until="2025-01-03T06:00:00Z")
+        self.assertEqual(parse_timestamp(calls[0][0]), datetime(2025, 1, 3, tzinfo=dt_tz.utc))
+        day3 = ObservationRollup.objects.get(resolution="day", bucket_start=datetime(2025, 1, 3, tzinfo=dt_tz.utc))
+        self.assertEqual(day3.count, 6)
+
+        res = self.client.get(reverse("metrics_proxy") + "?start=2025-01-01T00:00:00&end=2025-01-04T00:00:00&resolution=day")
+        data = res.json()
+        self.assertEqual(data["count"], [24, 24, 6])
+        self.assertAlmostEqual(data["salinity"][0], 35.0)
+        self.assertEqual(data["ph_max"][0], 8.1)
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import dashboard, metrics_proxy
+from .views import dashboard, metrics_proxy, metrics_proxy_stats
 
 urlpatterns = [
     path("dashboard/", dashboard, name="metrics_dashboard"),
     path("proxy/", metrics_proxy, name="metrics_proxy"),
+    path("proxy/stats/", metrics_proxy_stats, name="metrics_proxy_stats"),
 ]
@@ -1,9 +1,27 @@
-from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.views import redirect_to_login
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.utils.cache import patch_vary_headers
 from django.utils import timezone
 from datetime import timedelta
-from api_integration.utils import fetch_metrics
+from api_integration import utils as api
+from bluewave_shop.streaming import stream
+from . import binary
+from .cache import get_observation_cache
+from .downsample import METHODS, downsample
+from .models import ObservationRollup
+from .rollups import rollup_series
+from .series import concat_series, is_columnar, parse_timestamp, series_columns, split_window
+
+MAX_POINTS = 10000
+FORMATS = ("json", "bin", "ndjson", "raw")
+STREAM_CHUNK_BYTES = 64 * 1024
 
 @login_required
 def dashboard(request):
@@ -12,13 +30,142 @@ def dashboard(request):
     start = end - timedelta(days=7)
     return render(request, "metrics/dashboard.html", {"start": start.isoformat(), "end": end.isoformat()})
 
-@login_required
-def metrics_proxy(request):
+
+async def _fetch_window(start_dt, end_dt):
+    """
+    Fetch [start, end) as chunks of METRICS_PROXY_CHUNK_SECONDS, at most
+    METRICS_PROXY_MAX_PARALLEL at a time, and merge them in order.
+    Each chunk goes through the bucket cache in a worker thread.
+    """
+    chunks = split_window(start_dt, end_dt, getattr(settings, "METRICS_PROXY_CHUNK_SECONDS", 86400))
+    limit = asyncio.Semaphore(getattr(settings, "METRICS_PROXY_MAX_PARALLEL", 4))
+    get_range = sync_to_async(get_observation_cache().get_range, thread_sensitive=False)
+
+    async def fetch(lo, hi):
+        async with limit:
+            return await get_range(lo, hi)
+
+    results = await asyncio.gather(*(fetch(lo, hi) for lo, hi in chunks))
+    for _, error in results:
+        if error:
+            return None, error
+    parts = [data for data, _ in results]
+    if len(parts) == 1:
+        return parts[0], None
+    if not all(is_columnar(p) for p in parts):
+        # Upstream answered in a shape we can't stitch; ask for the whole window once.
+        return await sync_to_async(api.fetch_metrics, thread_sensitive=False)(start_dt.isoformat(), end_dt.isoformat())
+    return concat_series(parts), None
+
+
+# ---------- streaming output ----------
+
+def _ndjson_lines(start_dt, end_dt):
+    """
+    One JSON object per observation. Chunks are fetched one after another, so
+    only a single chunk is held in memory however long the window is.
+    """
+    cache = get_observation_cache()
+    for lo, hi in split_window(start_dt, end_dt, getattr(settings, "METRICS_PROXY_CHUNK_SECONDS", 86400)):
+        data, error = cache.get_range(lo, hi)
+        if error:
+            yield json.dumps({"error": error}) + "\n"
+            return
+        if not is_columnar(data):
+            rows = data if isinstance(data, list) else [data]
+            for row in rows:
+                yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+            continue
+        columns = series_columns(data)
+        keys = ["timestamp"] + columns[1:]
+        for row in zip(*(data[c] for c in columns)):
+            yield json.dumps(dict(zip(keys, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def _passthrough(resp):
+    try:
+        yield from resp.iter_content(chunk_size=STREAM_CHUNK_BYTES)
+    finally:
+        resp.close()
+
+
+async def metrics_proxy(request):
+    # login_required can't wrap async views on Django 5.0, so check by hand
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
     start = request.GET.get("start")
     end = request.GET.get("end")
     if not (start and end):
         return JsonResponse({"error": "start and end required"}, status=400)
-    data, error = fetch_metrics(start, end)
+    start_dt, end_dt = parse_timestamp(start), parse_timestamp(end)
+    if not (start_dt and end_dt):
+        return JsonResponse({"error": "start and end must be ISO-8601 timestamps"}, status=400)
+    if end_dt <= start_dt:
+        return JsonResponse({"error": "end must be after start"}, status=400)
+    points = request.GET.get("points")
+    method = request.GET.get("method", "lttb")
+    resolution = request.GET.get("resolution", "raw")
+    fmt = request.GET.get("format")
+    negotiated = fmt is None
+    if negotiated:
+        fmt = "bin" if binary.CONTENT_TYPE in request.headers.get("Accept", "") else "json"
+    if points is not None:
+        try:
+            points = int(points)
+        except ValueError:
+            return JsonResponse({"error": "points must be an integer"}, status=400)
+        if not 2 <= points <= MAX_POINTS:
+            return JsonResponse({"error": f"points must be between 2 and {MAX_POINTS}"}, status=400)
+    if method not in METHODS:
+        return JsonResponse({"error": f"method must be one of: {', '.join(METHODS)}"}, status=400)
+    if fmt not in FORMATS:
+        return JsonResponse({"error": f"format must be one of: {', '.join(FORMATS)}"}, status=400)
+    if points and fmt not in ("json", "bin"):
+        return JsonResponse({"error": "points is only supported with format=json or format=bin"}, status=400)
+    if resolution not in ("raw", ObservationRollup.HOUR, ObservationRollup.DAY):
+        return JsonResponse({"error": "resolution must be one of: raw, hour, day"}, status=400)
+    if resolution != "raw" and fmt not in ("json", "bin"):
+        return JsonResponse({"error": "resolution is only supported with format=json or format=bin"}, status=400)
+
+    if fmt == "raw":
+        # Upstream bytes straight through: no parse, no cache, no re-serialisation.
+        resp, error = await sync_to_async(api.open_metrics_stream, thread_sensitive=False)(start, end)
+        if error:
+            return JsonResponse({"error": error}, status=502)
+        content_type = resp.headers.get("Content-Type", "application/json")
+        return stream(request, _passthrough(resp), content_type)
+    if fmt == "ndjson":
+        return stream(request, _ndjson_lines(start_dt, end_dt), "application/x-ndjson")
+
+    if resolution != "raw":
+        # Aggregate view straight from the local rollup tables; upstream isn't touched.
+        data, error = await sync_to_async(rollup_series)(resolution, start_dt, end_dt), None
+    else:
+        data, error = await _fetch_window(start_dt, end_dt)
     if error:
         return JsonResponse({"error": error}, status=502)
-    return JsonResponse(data, safe=False)
+    if points and is_columnar(data):
+        data = await sync_to_async(downsample, thread_sensitive=False)(data, points, method)
+    if fmt == "bin" and is_columnar(data):
+        response = HttpResponse(binary.encode_series(data), content_type=binary.CONTENT_TYPE)
+    elif fmt == "bin" and not (negotiated and request.accepts("application/json")):
+        response = JsonResponse({"error": "upstream data is not columnar; use format=json"}, status=502)
+    else:
+        # JSON asked for, or Accept also allowed it when binary can't be produced
+        response = JsonResponse(data, safe=False)
+    if negotiated:
+        # The body depends on Accept, so caches must key on it
+        patch_vary_headers(response, ["Accept"])
+    return response
+
+
+@user_passes_test(lambda u: u.is_staff)
+def metrics_proxy_stats(request):
+    """Staff-only counters for the proxy cache and upstream request coalescing."""
+    cache = get_observation_cache()
+    return JsonResponse({
+        "cache": {**cache.stats, "bytes": cache.size_bytes, "max_bytes": cache.max_bytes},
+        "upstream": cache.flights.stats,
+    })
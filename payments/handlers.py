@@ -0,0 +1,92 @@
+"""
+Stripe event handlers, applied by `manage.py process_stripe_events`.
+Each takes the event's `data.object` payload.
+"""
+from django.db import transaction
+from datetime import datetime, timezone as dt_tz
+
+from shop.fulfillment import fulfill_checkout_session
+from accounts.entitlements import invalidate_entitlements
+from accounts.models import UserProfile
+from reporting.aggregates import record_subscription_change
+from subscriptions.services import ACCESS_STATUSES
+from .models import SubscriptionEventCursor
+
+# Robust import
+try:
+    from subscriptions.models import Subscription as SubModel
+except Exception:
+    from subscriptions.models import UserSubscription as SubModel
+
+SUBSCRIPTION_EVENTS = ("customer.subscription.deleted", "customer.subscription.updated")
+
+
+def handle_checkout_completed(session):
+    # Same pipeline as checkout_success; a no-op if that already ran
+    fulfill_checkout_session(session)
+
+
+def handle_subscription_changed(s):
+    sub_id = s.get("id")
+    field_names = {f.name for f in SubModel._meta.get_fields()}
+    try:
+        sub = SubModel.objects.get(stripe_subscription_id=sub_id)
+    except SubModel.DoesNotExist:
+        return
+    transaction.on_commit(lambda: invalidate_entitlements(sub.user_id))
+
+    if "active" in field_names:
+        # Simple schema
+        was_active = sub.active
+        sub.active = (s.get("status") in ACCESS_STATUSES)
+        sub.save()
+        record_subscription_change(was_active, sub.active)
+        if not sub.active:
+            profile, _ = UserProfile.objects.get_or_create(user=sub.user)
+            profile.is_researcher = False
+            profile.save()
+    else:
+        # Robust schema
+        was_active = sub.status in ACCESS_STATUSES
+        sub.status = s.get("status") or "canceled"
+        cpe = s.get("current_period_end")
+        sub.current_period_end = datetime.fromtimestamp(cpe, tz=dt_tz.utc) if cpe else sub.current_period_end
+        sub.cancel_at_period_end = bool(s.get("cancel_at_period_end"))
+        sub.save()
+        record_subscription_change(was_active, sub.status in ACCESS_STATUSES, sub.price_id)
+
+        if sub.status not in ACCESS_STATUSES:
+            profile, _ = UserProfile.objects.get_or_create(user=sub.user)
+            profile.is_researcher = False
+            profile.save()
+
+
+def handle_event(event_type, obj):
+    if event_type == "checkout.session.completed":
+        handle_checkout_completed(obj)
+    elif event_type in SUBSCRIPTION_EVENTS:
+        handle_subscription_changed(obj)
+
+
+def apply_event(event) -> bool:
+    """
+    Apply a stored StripeEvent. Subscription events older than the last one
+    applied to the same subscription are dropped; returns False for those.
+    Call inside a transaction (the cursor row is locked).
+    """
+    if event.type not in SUBSCRIPTION_EVENTS or not (event.object_id and event.stripe_created):
+        handle_event(event.type, event.payload)
+        return True
+
+    cursor, created = SubscriptionEventCursor.objects.select_for_update().get_or_create(
+        stripe_subscription_id=event.object_id,
+        defaults={"last_event_id": event.event_id, "last_event_created": event.stripe_created},
+    )
+    if not created:
+        if event.stripe_created < cursor.last_event_created:
+            return False
+        cursor.last_event_id = event.event_id
+        cursor.last_event_created = event.stripe_created
+        cursor.save(update_fields=["last_event_id", "last_event_created", "updated_at"])
+    handle_event(event.type, event.payload)
+    return True
@@ -0,0 +1,98 @@
+import random
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from payments.handlers import SUBSCRIPTION_EVENTS, apply_event
+from payments.models import StripeEvent
+
+
+def group_key(event: StripeEvent):
+    # Subscription updates/deletions are state snapshots: only the newest one matters
+    family = "subscription" if event.type in SUBSCRIPTION_EVENTS else event.type
+    return family, event.object_id or event.event_id
+
+
+class Command(BaseCommand):
+    help = "Apply queued Stripe webhook events in batches, handling each related group once."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--max-attempts", type=int, default=5)
+        parser.add_argument("--backoff", type=float, default=30.0, help="Base retry delay in seconds (doubles per attempt).")
+        parser.add_argument("--lease", type=int, default=300, help="Seconds a claimed event is hidden from other workers.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when the queue is empty.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Poll interval with --loop.")
+
+    def handle(self, *args, **opts):
+        while True:
+            processed = self.drain(opts)
+            if not opts["loop"]:
+                break
+            if not processed:
+                time.sleep(opts["sleep"])
+
+    def drain(self, opts) -> int:
+        total = 0
+        while True:
+            batch = self.claim(opts["batch_size"], opts["lease"])
+            if not batch:
+                break
+            groups = OrderedDict()
+            for event in batch:
+                groups.setdefault(group_key(event), []).append(event)
+            for events in groups.values():
+                self.apply_group(events, opts)
+            total += len(batch)
+            self.stdout.write(f"Batch of {len(batch)} event(s) in {len(groups)} group(s).")
+        if total:
+            self.stdout.write(self.style.SUCCESS(f"Processed {total} event(s)."))
+        return total
+
+    def claim(self, batch_size: int, lease: int):
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                StripeEvent.objects.select_for_update(skip_locked=True)
+                .filter(status=StripeEvent.PENDING, next_attempt_at__lte=now)
+                .order_by("stripe_created", "id")[:batch_size]
+            )
+            if rows:
+                StripeEvent.objects.filter(pk__in=[r.pk for r in rows]).update(
+                    next_attempt_at=now + timedelta(seconds=lease)
+                )
+        return rows
+
+    def apply_group(self, events, opts):
+        """Run the newest event of the group; the rest are superseded (or duplicates)."""
+        events.sort(key=lambda e: (e.stripe_created or e.received_at, e.id))
+        latest, older = events[-1], events[:-1]
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                if apply_event(latest):
+                    status, note = StripeEvent.PROCESSED, ""
+                else:
+                    status, note = StripeEvent.SKIPPED, "stale: a newer event was already applied"
+                StripeEvent.objects.filter(pk=latest.pk).update(
+                    status=status, attempts=latest.attempts + 1, processed_at=now, last_error=note
+                )
+                if older:
+                    StripeEvent.objects.filter(pk__in=[e.pk for e in older]).update(
+                        status=StripeEvent.SKIPPED, processed_at=now, last_error=f"superseded by {latest.event_id}"
+                    )
+        except Exception as e:
+            # Leave the whole group queued; it is retried together after a backoff.
+            attempts = latest.attempts + 1
+            if attempts >= opts["max_attempts"]:
+                update = {"status": StripeEvent.FAILED, "processed_at": now}
+            else:
+                delay = opts["backoff"] * (2 ** (attempts - 1))
+                update = {"next_attempt_at": now + timedelta(seconds=random.uniform(delay / 2, delay))}
+            StripeEvent.objects.filter(pk__in=[ev.pk for ev in events]).update(
+                attempts=attempts, last_error=str(e), **update
+            )
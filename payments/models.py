@@ -0,0 +1,47 @@
+from django.db import models
+from django.utils import timezone
+
+
+class StripeEvent(models.Model):
+    """
+    Raw Stripe webhook event, stored by the webhook and applied later by
+    `manage.py process_stripe_events`.
+    """
+    PENDING = "pending"
+    PROCESSED = "processed"
+    SKIPPED = "skipped"  # superseded by a newer event for the same object
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (PROCESSED, "Processed"), (SKIPPED, "Skipped"), (FAILED, "Failed")]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=255, blank=True, default="")  # session / subscription id
+    payload = models.JSONField()
+    stripe_created = models.DateTimeField(null=True, blank=True)
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="stripeevent_status_due_idx")]
+
+    def __str__(self):
+        return f"{self.type} · {self.event_id} · {self.status}"
+
+
+class SubscriptionEventCursor(models.Model):
+    """
+    Newest Stripe event already applied to a subscription. Subscription events
+    created before it are stale and are dropped without touching the DB or Stripe.
+    """
+    stripe_subscription_id = models.CharField(max_length=120, unique=True)
+    last_event_id = models.CharField(max_length=255)
+    last_event_created = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stripe_subscription_id} @ {self.last_event_created:%Y-%m-%d %H:%M:%S}"
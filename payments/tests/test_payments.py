@@ -0,0 +1,73 @@
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from unittest.mock import patch
+from io import StringIO
+import json
+
+from payments.models import StripeEvent
+from shop.models import Order, Product
+from subscriptions.models import UserSubscription
+
+
+def stripe_event(event_id, event_type, obj, created=1735689600):
+    return {"id": event_id, "type": event_type, "created": created, "data": {"object": obj}}
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET="whsec_test", STRIPE_SECRET_KEY="")
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", "b@ex.com", "Pass123!")
+        self.product = Product.objects.create(name="P1", slug="p1", price_cents=1000)
+
+    def post_event(self, event):
+        with patch("stripe.Webhook.construct_event", return_value=event):
+            return Client().post(reverse("stripe_webhook"), data=json.dumps(event),
+                                 content_type="application/json", HTTP_STRIPE_SIGNATURE="sig")
+
+    def process(self):
+        call_command("process_stripe_events", stdout=StringIO())
+
+    def test_webhook_only_persists_the_event(self):
+        session = {"id": "cs_1", "payment_status": "paid",
+                   "metadata": {"product_slug": "p1", "user_id": str(self.user.id)}}
+        event = stripe_event("evt_1", "checkout.session.completed", session)
+        self.assertEqual(self.post_event(event).status_code, 200)
+        self.assertEqual(self.post_event(event).status_code, 200)  # Stripe retry
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        self.assertFalse(Order.objects.exists())
+
+        self.process()
+        order = Order.objects.get(stripe_session_id="cs_1")
+        self.assertTrue(order.paid)
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.PROCESSED)
+
+    def test_subscription_events_in_a_batch_apply_only_the_newest(self):
+        UserSubscription.objects.create(user=self.user, stripe_subscription_id="sub_1", status="active")
+        self.post_event(stripe_event("evt_a", "customer.subscription.updated",
+                                     {"id": "sub_1", "status": "past_due"}, created=100))
+        self.post_event(stripe_event("evt_b", "customer.subscription.updated",
+                                     {"id": "sub_1", "status": "active"}, created=200))
+        self.process()
+        self.assertEqual(UserSubscription.objects.get().status, "active")
+        self.assertEqual(StripeEvent.objects.get(event_id="evt_a").status, StripeEvent.SKIPPED)
+
+    def test_late_older_event_is_dropped(self):
+        UserSubscription.objects.create(user=self.user, stripe_subscription_id="sub_1", status="active")
+        self.post_event(stripe_event("evt_new", "customer.subscription.updated",
+                                     {"id": "sub_1", "status": "canceled"}, created=200))
+        self.process()
+        self.post_event(stripe_event("evt_old", "customer.subscription.updated",
+                                     {"id": "sub_1", "status": "active"}, created=100))
+        with patch("payments.handlers.handle_subscription_changed") as handler:
+            self.process()
+        handler.assert_not_called()
+        self.assertEqual(UserSubscription.objects.get().status, "canceled")
+        self.assertEqual(StripeEvent.objects.get(event_id="evt_old").status, StripeEvent.SKIPPED)
+
+    def test_duplicate_delivery_is_acknowledged_without_insert(self):
+        event = stripe_event("evt_dup", "customer.subscription.updated", {"id": "sub_9", "status": "active"})
+        self.post_event(event)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.post_event(event).status_code, 200)
@@ -0,0 +1,108 @@
+"""
+Incremental updates to the reporting tables.
+
+Writers call these inside the transaction that makes the change, so the
+aggregates commit or roll back together with it. Each call is a couple of
+single-row UPDATE ... SET n = n + k statements; nothing here reads the
+transactional tables (deletes get their amounts from reporting.rebuild).
+"""
+from collections import Counter
+from typing import Iterable, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import DailyProductSales, DailySales, DailySubscriptions
+
+
+def _bump(model, lookup: dict, **deltas):
+    """Add `deltas` to the row matching `lookup`, creating it if it doesn't exist yet."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    updates = {k: F(k) + v for k, v in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another writer created the row first
+        model.objects.filter(**lookup).update(**updates)
+
+
+def record_order(order, items: Iterable = ()):
+    """A new order (and its items). Revenue and units count only once it is paid."""
+    day = timezone.localdate(order.created_at)
+    items = list(items)
+    paid = bool(order.paid)
+    _bump(
+        DailySales, {"day": day},
+        orders=1,
+        paid_orders=int(paid),
+        revenue_cents=order.total_cents if paid else 0,
+        items_sold=sum(i.quantity for i in items) if paid else 0,
+    )
+    if not paid:
+        return
+    per_product = Counter()
+    revenue = Counter()
+    for item in items:
+        per_product[item.product_id] += item.quantity
+        revenue[item.product_id] += item.price_cents * item.quantity
+    for product_id, quantity in per_product.items():
+        _bump(DailyProductSales, {"day": day, "product_id": product_id},
+              quantity=quantity, revenue_cents=revenue[product_id])
+
+
+def _unbump(model, lookup: dict, **deltas):
+    """
+    Subtract `deltas` from the row matching `lookup`, never below zero, and
+    drop the row once every one of those counters is zero (as a rebuild would).
+    """
+    if not any(deltas.values()):
+        return
+    model.objects.filter(**lookup).update(**{k: Greatest(F(k) - v, 0) for k, v in deltas.items() if v})
+    model.objects.filter(**lookup, **{k: 0 for k in deltas}).delete()
+
+
+def record_orders_deleted(sales: Iterable[DailySales], products: Iterable[DailyProductSales]):
+    """Take back what deleted orders added: the rows from reporting.rebuild.order_contributions."""
+    for s in sales:
+        _unbump(DailySales, {"day": s.day}, orders=s.orders, paid_orders=s.paid_orders,
+                approved_orders=s.approved_orders, revenue_cents=s.revenue_cents, items_sold=s.items_sold)
+    for p in products:
+        _unbump(DailyProductSales, {"day": p.day, "product_id": p.product_id},
+                quantity=p.quantity, revenue_cents=p.revenue_cents)
+
+
+def record_approvals(count: int, when=None):
+    """`count` orders approved at `when` (default: now)."""
+    _bump(DailySales, {"day": timezone.localdate(when)}, approved_orders=count)
+
+
+def record_subscription_change(was_active: bool, is_active: bool,
+                               old_price: str = "", new_price: Optional[str] = None, when=None):
+    """One subscription's access changing (a price switch counts as ended + started)."""
+    new_price = old_price if new_price is None else new_price
+    changes = Counter()
+    if was_active and (not is_active or old_price != new_price):
+        changes[(old_price or "", "ended")] += 1
+    if is_active and (not was_active or old_price != new_price):
+        changes[(new_price or "", "started")] += 1
+    _apply_subscription_changes(changes, when)
+
+
+def record_subscriptions_ended(by_price: dict, when=None):
+    """Many subscriptions losing access at once: {price_id: count}."""
+    _apply_subscription_changes(Counter({(price or "", "ended"): n for price, n in by_price.items()}), when)
+
+
+def _apply_subscription_changes(changes: Counter, when=None):
+    day = timezone.localdate(when)
+    prices = {price for price, _ in changes}
+    for price in sorted(prices):
+        _bump(DailySubscriptions, {"day": day, "price_id": price},
+              started=changes[(price, "started")], ended=changes[(price, "ended")])
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import pre_delete
+
+class ReportingConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "reporting"
+
+    def ready(self):
+        from .signals import user_pre_delete
+        pre_delete.connect(user_pre_delete, sender=settings.AUTH_USER_MODEL, dispatch_uid="reporting_user_pre_delete")
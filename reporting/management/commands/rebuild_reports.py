@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from reporting.rebuild import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales and subscription reporting tables from scratch."
+
+    def handle(self, *args, **opts):
+        counts = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            "Rebuilt {sales} daily sales, {products} product sales and {subscriptions} subscription rows.".format(**counts)
+        ))
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class DailySales(models.Model):
+    """
+    Per-day order totals, bumped as orders are created and approved
+    (see reporting.aggregates) and rebuilt by `manage.py rebuild_reports`.
+    Days are local dates (TIME_ZONE); approvals count on the day they happen.
+    """
+    day = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    paid_orders = models.PositiveIntegerField(default=0)
+    approved_orders = models.PositiveIntegerField(default=0)
+    revenue_cents = models.BigIntegerField(default=0)  # paid orders only
+    items_sold = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.paid_orders} paid, £{self.revenue_cents / 100:.2f}"
+
+
+class DailyProductSales(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey("shop.Product", on_delete=models.CASCADE, related_name="+")
+    quantity = models.PositiveIntegerField(default=0)
+    revenue_cents = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["day", "product"], name="daily_product_sales_unique")]
+
+
+class DailySubscriptions(models.Model):
+    """
+    Subscriptions that gained (`started`) or lost (`ended`) access per day and
+    price. Active subscribers for a price = sum(started - ended) over its rows.
+    """
+    day = models.DateField()
+    price_id = models.CharField(max_length=120, blank=True, default="")
+    started = models.PositiveIntegerField(default=0)
+    ended = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["day", "price_id"], name="daily_subscriptions_unique")]
@@ -0,0 +1,85 @@
+"""
+Full rebuild of the reporting tables from Order / OrderItem / PurchaseApproval /
+UserSubscription, for backfills and to repair drift. One grouped query per
+table; the incremental path in reporting.aggregates keeps them current after.
+
+Subscription history isn't stored, so a rebuild dates `started` on each
+subscription's created_at and `ended` on the updated_at of those that no
+longer grant access. Per-price totals come out exact; daily detail is approximate.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+from shop.models import Order, OrderItem, PurchaseApproval
+from subscriptions.models import UserSubscription
+from subscriptions.services import ACCESS_STATUSES
+from .models import DailyProductSales, DailySales, DailySubscriptions
+
+NEVER_STARTED = ("incomplete", "incomplete_expired")
+
+
+def _scoped(queryset, orders, path):
+    return queryset if orders is None else queryset.filter(**{f"{path}__in": orders})
+
+
+def _daily_sales(orders=None):
+    days = defaultdict(lambda: DailySales(orders=0, paid_orders=0, approved_orders=0, revenue_cents=0, items_sold=0))
+    for row in (_scoped(Order.objects.all(), orders, "pk").annotate(d=TruncDate("created_at")).values("d").order_by()
+                .annotate(orders=Count("id"), paid_orders=Count("id", filter=Q(paid=True)),
+                          revenue=Sum("total_cents", filter=Q(paid=True)))):
+        s = days[row["d"]]
+        s.orders, s.paid_orders, s.revenue_cents = row["orders"], row["paid_orders"], row["revenue"] or 0
+    for row in (_scoped(OrderItem.objects.filter(order__paid=True), orders, "order")
+                .annotate(d=TruncDate("order__created_at")).values("d").order_by().annotate(items=Sum("quantity"))):
+        days[row["d"]].items_sold = row["items"] or 0
+    for row in (_scoped(PurchaseApproval.objects.filter(order__approved=True, approved_at__isnull=False), orders, "order")
+                .annotate(d=TruncDate("approved_at")).values("d").order_by().annotate(n=Count("id"))):
+        days[row["d"]].approved_orders = row["n"]
+    for day, s in days.items():
+        s.day = day
+    return list(days.values())
+
+
+def _daily_product_sales(orders=None):
+    return [
+        DailyProductSales(day=row["d"], product_id=row["product_id"], quantity=row["units"], revenue_cents=row["revenue"])
+        for row in (_scoped(OrderItem.objects.filter(order__paid=True), orders, "order")
+                    .annotate(d=TruncDate("order__created_at")).values("d", "product_id").order_by()
+                    .annotate(units=Sum("quantity"), revenue=Sum(F("price_cents") * F("quantity"))))
+    ]
+
+
+def order_contributions(orders):
+    """
+    The unsaved DailySales and DailyProductSales rows that `orders` (a queryset)
+    add to the reports. Read them before deleting the orders, then pass them to
+    reporting.aggregates.record_orders_deleted.
+    """
+    return _daily_sales(orders), _daily_product_sales(orders)
+
+
+def _daily_subscriptions():
+    rows = defaultdict(lambda: DailySubscriptions(started=0, ended=0))
+    started = UserSubscription.objects.exclude(status__in=NEVER_STARTED)
+    for row in (started.annotate(d=TruncDate("created_at")).values("d", "price_id").order_by()
+                .annotate(n=Count("id"))):
+        rows[(row["d"], row["price_id"])].started = row["n"]
+    for row in (started.exclude(status__in=ACCESS_STATUSES).annotate(d=TruncDate("updated_at"))
+                .values("d", "price_id").order_by().annotate(n=Count("id"))):
+        rows[(row["d"], row["price_id"])].ended = row["n"]
+    for (day, price), r in rows.items():
+        r.day, r.price_id = day, price
+    return list(rows.values())
+
+
+def rebuild_all(batch_size=1000) -> dict:
+    """Replace every reporting row. Returns the number of rows written per table."""
+    with transaction.atomic():
+        sales, products, subs = _daily_sales(), _daily_product_sales(), _daily_subscriptions()
+        for model, rows in ((DailySales, sales), (DailyProductSales, products), (DailySubscriptions, subs)):
+            model.objects.all().delete()
+            model.objects.bulk_create(rows, batch_size=batch_size)
+    return {"sales": len(sales), "products": len(products), "subscriptions": len(subs)}
@@ -0,0 +1,23 @@
+"""
+Keeps the reports in step when a user is deleted. Their orders and
+subscriptions go by cascade, which bypasses OrderAdmin and SubscriptionAdmin.
+"""
+from django.db.models import Count
+
+from shop.models import Order
+from subscriptions.models import UserSubscription
+from subscriptions.services import ACCESS_STATUSES
+from .aggregates import record_orders_deleted, record_subscriptions_ended
+from .rebuild import order_contributions
+
+
+def user_pre_delete(sender, instance, **kwargs):
+    orders = Order.objects.filter(user=instance)
+    if orders.exists():
+        record_orders_deleted(*order_contributions(orders))
+    ending = dict(
+        UserSubscription.objects.filter(user=instance, status__in=ACCESS_STATUSES)
+        .values_list("price_id").annotate(n=Count("id")).order_by()
+    )
+    if ending:
+        record_subscriptions_ended(ending)
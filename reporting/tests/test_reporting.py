@@ -0,0 +1,124 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from payments.handlers import handle_subscription_changed
+from reporting.models import DailyProductSales, DailySales, DailySubscriptions
+from shop.fulfillment import fulfill_checkout_session
+from shop.models import Order, Product, PurchaseApproval
+from subscriptions.models import UserSubscription
+from subscriptions.services import sweep
+
+
+def snapshot():
+    return (
+        sorted(DailySales.objects.values_list("day", "orders", "paid_orders", "approved_orders", "revenue_cents", "items_sold")),
+        sorted(DailyProductSales.objects.values_list("day", "product_id", "quantity", "revenue_cents")),
+        active_by_price(),
+    )
+
+
+def active_by_price():
+    totals = {}
+    for price, started, ended in DailySubscriptions.objects.values_list("price_id", "started", "ended"):
+        totals[price] = totals.get(price, 0) + started - ended
+    return {p: n for p, n in totals.items() if n}
+
+
+class ReportingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", "b@ex.com", "Pass123!")
+        self.staff = User.objects.create_user("staff", "s@ex.com", "Pass123!", is_staff=True)
+        self.skid = Product.objects.create(name="Skid", slug="skid", price_cents=150000)
+        self.data = Product.objects.create(name="Data", slug="data", price_cents=4900,
+                                           product_type=Product.SUBSCRIPTION, stripe_price_id="price_s")
+
+    def checkout(self, n, slug="skid", paid=True, sub_status="active"):
+        session = {"id": f"cs_{n}", "payment_status": "paid" if paid else "unpaid",
+                   "metadata": {"product_slug": slug, "user_id": str(self.user.id)}}
+        if slug == "data":
+            session["subscription"] = {"id": f"sub_{n}", "status": sub_status, "current_period_end": 4102444800,
+                                       "items": {"data": [{"price": {"id": "price_s"}}]}}
+        return fulfill_checkout_session(session)
+
+    def test_orders_and_approvals_are_counted_incrementally(self):
+        for n in range(3):
+            self.checkout(n)
+        self.checkout(3, paid=False)
+        PurchaseApproval.approve_orders(Order.objects.all(), self.staff)
+        today = DailySales.objects.get(day=timezone.localdate())
+        self.assertEqual((today.orders, today.paid_orders, today.approved_orders), (4, 3, 3))
+        self.assertEqual((today.revenue_cents, today.items_sold), (450000, 3))
+        self.assertEqual(DailyProductSales.objects.get(product=self.skid).quantity, 3)
+
+    def test_subscriber_counts_follow_status_changes(self):
+        self.checkout(1, slug="data")
+        self.checkout(2, slug="data")
+        self.assertEqual(active_by_price(), {"price_s": 2})
+        handle_subscription_changed({"id": "sub_1", "status": "canceled"})
+        handle_subscription_changed({"id": "sub_1", "status": "canceled"})  # replay: no double count
+        self.assertEqual(active_by_price(), {"price_s": 1})
+
+        UserSubscription.objects.filter(stripe_subscription_id="sub_2").update(
+            current_period_end=timezone.now() - timedelta(days=1))
+        sweep()
+        self.assertEqual(active_by_price(), {})
+
+    def test_rebuild_matches_incremental_totals(self):
+        for n in range(2):
+            self.checkout(n)
+        self.checkout(5, slug="data")
+        PurchaseApproval.approve_orders(Order.objects.filter(stripe_session_id="cs_0"), self.staff)
+        incremental = snapshot()
+        call_command("rebuild_reports", stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+    def test_admin_and_cascade_deletes_take_back_their_totals(self):
+        from django.contrib import admin
+        from django.test import RequestFactory
+        other = User.objects.create_user("other")
+        for n in range(3):
+            self.checkout(n)
+        self.checkout(9, slug="data")
+        PurchaseApproval.approve_orders(Order.objects.filter(stripe_session_id__in=["cs_0", "cs_1"]), self.staff)
+        self.user, kept = other, self.user
+        self.checkout(10)
+        self.user = kept
+
+        model_admin = admin.site._registry[Order]
+        request = RequestFactory().post("/")
+        model_admin.delete_model(request, Order.objects.get(stripe_session_id="cs_0"))
+        model_admin.delete_queryset(request, Order.objects.filter(stripe_session_id="cs_1"))
+        incremental = snapshot()
+        call_command("rebuild_reports", stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+        self.user.delete()  # cascades to the rest of their orders and their subscription
+        incremental = snapshot()
+        call_command("rebuild_reports", stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+        self.assertEqual(DailySales.objects.get().orders, 1)
+        self.assertEqual(active_by_price(), {})
+
+    def test_dashboard_reads_only_aggregates(self):
+        self.checkout(1)
+        self.checkout(2, slug="data")
+        self.client.login(username="staff", password="Pass123!")
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(reverse("sales_dashboard"))
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, "price_s")
+        tables = " ".join(q["sql"] for q in ctx.captured_queries)
+        for table in ("shop_order", "shop_orderitem", "subscriptions_usersubscription"):
+            self.assertNotIn(f'"{table}"', tables)
+
+    def test_dashboard_is_staff_only(self):
+        self.client.login(username="buyer", password="Pass123!")
+        self.assertEqual(self.client.get(reverse("sales_dashboard")).status_code, 302)
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.contrib.auth.decorators import user_passes_test
+from django.db.models import Sum
+from django.shortcuts import render
+from django.utils import timezone
+
+from .models import DailyProductSales, DailySales, DailySubscriptions
+
+RECENT_DAYS = 30
+
+
+@user_passes_test(lambda u: u.is_staff)
+def sales_dashboard(request):
+    """Staff reporting page. Reads only the daily aggregate tables, never orders or subscriptions."""
+    today = timezone.localdate()
+    month_start = today.replace(day=1)
+
+    month = DailySales.objects.filter(day__gte=month_start).aggregate(
+        revenue_cents=Sum("revenue_cents"), paid_orders=Sum("paid_orders"),
+        approved_orders=Sum("approved_orders"), items_sold=Sum("items_sold"),
+    )
+    recent = DailySales.objects.filter(day__gt=today - timedelta(days=RECENT_DAYS)).order_by("-day")
+    top_products = (
+        DailyProductSales.objects.filter(day__gte=month_start)
+        .values("product__name").annotate(quantity=Sum("quantity"), revenue_cents=Sum("revenue_cents"))
+        .order_by("-revenue_cents")[:10]
+    )
+    subscribers = (
+        DailySubscriptions.objects.values("price_id")
+        .annotate(active=Sum("started") - Sum("ended"))
+        .filter(active__gt=0).order_by("-active")
+    )
+    new_this_month = dict(
+        DailySubscriptions.objects.filter(day__gte=month_start).values_list("price_id")
+        .annotate(n=Sum("started")).order_by()
+    )
+    return render(request, "reporting/dashboard.html", {
+        "month_start": month_start,
+        "month": {k: v or 0 for k, v in month.items()},
+        "recent": recent,
+        "top_products": top_products,
+        "subscribers": [dict(s, new=new_this_month.get(s["price_id"], 0)) for s in subscribers],
+    })
@@ -1,9 +1,15 @@
 from django.contrib import admin
+from django.db import transaction
+
+from bluewave_shop.db import EstimatedCountPaginator
+from reporting.aggregates import record_orders_deleted
+from reporting.rebuild import order_contributions
 from .models import Product, Order, OrderItem, PurchaseApproval
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    raw_id_fields = ("product",)
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -13,6 +19,28 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "total_cents", "paid", "approved", "created_at")
+    list_filter = ("paid", "approved")
+    list_select_related = ("user",)
+    date_hierarchy = "created_at"
+    search_fields = ("=id", "=stripe_session_id", "user__username")
+    raw_id_fields = ("user",)
+    ordering = ("-created_at", "-id")
+    # Large table: estimate the unfiltered count and skip the extra total COUNT(*)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [OrderItemInline]
 
+    def _delete_with_reports(self, orders, delete):
+        # Read what the orders contributed to the daily reports, then take it back
+        with transaction.atomic():
+            contributions = order_contributions(orders)
+            delete()
+            record_orders_deleted(*contributions)
+
+    def delete_model(self, request, obj):
+        self._delete_with_reports(Order.objects.filter(pk=obj.pk), lambda: super(OrderAdmin, self).delete_model(request, obj))
+
+    def delete_queryset(self, request, queryset):
+        self._delete_with_reports(queryset, lambda: super(OrderAdmin, self).delete_queryset(request, queryset))
+
 admin.site.register(PurchaseApproval)
@@ -0,0 +1,98 @@
+"""
+Session-backed cart: {product id: quantity} under request.session["cart"].
+
+Nothing is written to the database until checkout; reading the cart's lines
+is one Product query. At checkout the lines, with the unit price charged, are
+carried to fulfilment in the Stripe session metadata as "id:qty:cents,...".
+"""
+from typing import Dict, List, Optional, Tuple
+
+from .models import Product
+
+SESSION_KEY = "cart"
+CHECKOUT_KEY = "cart_checkout"  # Stripe session id of the cart's pending checkout
+MAX_QUANTITY = 99
+METADATA_LIMIT = 500  # Stripe caps each metadata value at 500 characters
+TOO_LARGE = "The cart is too large to check out in one go; remove a product or check out in two orders."
+
+
+def _encode(triples) -> str:
+    return ",".join(f"{pk}:{qty}:{cents}" for pk, qty, cents in triples)
+
+
+def encode_lines(lines: List[Tuple[Product, int]]) -> str:
+    return _encode((p.pk, qty, p.price_cents) for p, qty in lines)
+
+
+def decode_lines(value: str) -> Dict[int, Tuple[int, Optional[int]]]:
+    """
+    {product id: (quantity, unit cents)} from encode_lines() output. The unit
+    price is None for the older "id:qty" form; malformed parts are skipped.
+    """
+    out = {}
+    for part in (value or "").split(","):
+        pk, _, rest = part.partition(":")
+        qty, _, cents = rest.partition(":")
+        if pk.isdigit() and qty.isdigit() and int(qty) > 0:
+            out[int(pk)] = (int(qty), int(cents) if cents.isdigit() else None)
+    return out
+
+
+class Cart:
+    def __init__(self, session):
+        self.session = session
+        self.quantities: Dict[int, int] = {int(k): v for k, v in session.get(SESSION_KEY, {}).items()}
+
+    def _save(self):
+        # JSON session keys are strings
+        self.session[SESSION_KEY] = {str(k): v for k, v in self.quantities.items()}
+
+    def set(self, product: Product, quantity: int):
+        quantity = max(0, min(int(quantity), MAX_QUANTITY))
+        if product.product_type == Product.SUBSCRIPTION:
+            quantity = min(quantity, 1)  # one seat per subscription
+        if quantity:
+            self._check_fits(product, quantity)
+            self.quantities[product.pk] = quantity
+        else:
+            self.quantities.pop(product.pk, None)
+        self._save()
+
+    def _check_fits(self, product: Product, quantity: int):
+        """ValueError unless the cart, with `product` at `quantity`, fits one checkout's metadata."""
+        quantities = {**self.quantities, product.pk: quantity}
+        prices = dict(Product.objects.filter(pk__in=quantities, active=True).values_list("pk", "price_cents"))
+        prices[product.pk] = product.price_cents
+        encoded = _encode((pk, qty, prices[pk]) for pk, qty in quantities.items() if pk in prices)
+        if len(encoded) > METADATA_LIMIT:
+            raise ValueError(TOO_LARGE)
+
+    def add(self, product: Product, quantity: int = 1):
+        self.set(product, self.quantities.get(product.pk, 0) + int(quantity))
+
+    def remove(self, product: Product):
+        self.set(product, 0)
+
+    def clear(self):
+        self.quantities = {}
+        self.session.pop(SESSION_KEY, None)
+        self.session.pop(CHECKOUT_KEY, None)
+
+    def checkout_started(self, stripe_session_id: str):
+        """Remember the pending checkout; the cart is kept until it succeeds."""
+        self.session[CHECKOUT_KEY] = stripe_session_id
+
+    def checkout_completed(self, stripe_session_id: str):
+        """Empty the cart if `stripe_session_id` is the checkout it started."""
+        if stripe_session_id and self.session.get(CHECKOUT_KEY) == stripe_session_id:
+            self.clear()
+
+    def lines(self) -> List[Tuple[Product, int]]:
+        """(product, quantity) for every active product in the cart, in the order added."""
+        if not self.quantities:
+            return []
+        products = Product.objects.filter(pk__in=self.quantities, active=True).in_bulk()
+        return [(products[pk], qty) for pk, qty in self.quantities.items() if pk in products]
+
+    def __len__(self):
+        return sum(self.quantities.values())
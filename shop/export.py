@@ -0,0 +1,101 @@
+"""
+CSV export of orders and their line items for accounting.
+
+Orders are read in keyset batches on (created_at, id), each with one prefetch
+for its items, so memory stays flat however many rows are exported and the
+header goes out before the first query. (QuerySet.iterator() would do for
+SQLite/PostgreSQL, but mysqlclient buffers the whole result set client-side.)
+"""
+import csv
+from datetime import datetime, time
+from typing import Iterator, Optional
+
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, OrderItem
+
+HEADER = [
+    "order_id", "created_at", "user_id", "username", "email", "stripe_session_id", "paid", "approved",
+    "order_total_cents", "item_id", "product_slug", "product_name", "quantity", "unit_price_cents", "line_total_cents",
+]
+
+
+def parse_bound(value: Optional[str]) -> Optional[datetime]:
+    """
+    A date (local midnight) or ISO datetime from a query/CLI argument.
+    Raises ValueError if it is neither.
+    """
+    if not value:
+        return None
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            raise ValueError(f"not a date or datetime: {value!r}")
+        dt = datetime.combine(d, time.min)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+class _Echo:
+    """File-like object whose write() just returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _text(value: str) -> str:
+    """A free-text cell, quoted with a leading ' so spreadsheets don't run it as a formula."""
+    return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+
+
+def _rows(order):
+    base = [
+        order.pk, order.created_at.isoformat(), order.user_id, _text(order.user.username), _text(order.user.email),
+        _text(order.stripe_session_id), int(order.paid), int(order.approved), order.total_cents,
+    ]
+    items = order.items.all()
+    if not items:
+        yield base + ["", "", "", "", "", ""]
+    for item in items:
+        yield base + [
+            item.pk, _text(item.product.slug), _text(item.product.name), item.quantity, item.price_cents,
+            item.price_cents * item.quantity,
+        ]
+
+
+def export_csv(start: Optional[datetime] = None, end: Optional[datetime] = None,
+               chunk_size: int = 2000) -> Iterator[str]:
+    """
+    CSV text for orders created in [start, end): the header, then one chunk of
+    lines per batch of `chunk_size` orders. Orders without items get one row.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADER)
+
+    orders = Order.objects.select_related("user").prefetch_related(
+        Prefetch("items", queryset=OrderItem.objects.select_related("product").order_by("pk"))
+    ).order_by("created_at", "pk")
+    if start:
+        orders = orders.filter(created_at__gte=start)
+    if end:
+        orders = orders.filter(created_at__lt=end)
+
+    last = None
+    while True:
+        page = orders
+        if last:
+            page = page.filter(Q(created_at__gt=last[0]) | Q(created_at=last[0], pk__gt=last[1]))
+        batch = list(page[:chunk_size])
+        if not batch:
+            return
+        yield "".join(writer.writerow(row) for order in batch for row in _rows(order))
+        if len(batch) < chunk_size:
+            return
+        last = (batch[-1].created_at, batch[-1].pk)
@@ -0,0 +1,174 @@
+"""
+Checkout fulfillment shared by `checkout_success` and the Stripe webhook worker.
+
+Everything for one checkout session (order, items, subscription row, researcher
+flag) is written in a single transaction, so an existing Order for the session
+means the purchase is already fully applied. Whichever path gets there second
+finds it with one query and stops, without calling Stripe.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from datetime import datetime, timezone as dt_tz
+import stripe
+
+from .cart import decode_lines
+from .models import Product, Order, OrderItem
+from accounts.entitlements import invalidate_entitlements
+from accounts.models import UserProfile
+from reporting.aggregates import record_order, record_subscription_change
+from subscriptions.services import ACCESS_STATUSES
+
+# Robust import for subscription model
+try:
+    from subscriptions.models import Subscription as SubModel
+except Exception:
+    from subscriptions.models import UserSubscription as SubModel
+
+User = get_user_model()
+
+
+def _as_dict(obj):
+    """Plain dict for a StripeObject (no longer a dict subclass); webhook payloads are already dicts."""
+    return obj.to_dict() if isinstance(obj, stripe.StripeObject) else obj
+
+
+def _resolve_user(session, user):
+    if user is not None:
+        return user
+    user_id = (session.get("metadata") or {}).get("user_id")
+    try:
+        return User.objects.get(id=int(user_id))
+    except Exception:
+        return None
+
+
+def _stripe_subscription(session, subscription):
+    """
+    The session's Stripe Subscription: the one passed in, the expanded object on
+    the session, or (only if neither is available) one retrieve call.
+    """
+    if subscription is not None:
+        return _as_dict(subscription)
+    sub = session.get("subscription")
+    if not sub or isinstance(sub, str):
+        if not (sub and settings.STRIPE_SECRET_KEY):
+            return None
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        try:
+            return _as_dict(stripe.Subscription.retrieve(sub, expand=["items.data.price"]))
+        except Exception:
+            return None
+    return sub
+
+
+def _subscription_id(session) -> str:
+    sub = session.get("subscription") or ""
+    return sub if isinstance(sub, str) else (sub.get("id") or "")
+
+
+def _purchased_lines(session):
+    """
+    (product, quantity, unit cents) bought in the session: the cart encoded in
+    metadata["cart"], or the single metadata["product_slug"] of a "Buy now".
+    Unit prices are the ones sent to Stripe at checkout, falling back to the
+    current catalog price for sessions created before they were recorded.
+    """
+    metadata = session.get("metadata") or {}
+    if metadata.get("cart"):
+        lines = decode_lines(metadata["cart"])
+        products = Product.objects.in_bulk(list(lines))
+        return [
+            (products[pk], qty, products[pk].price_cents if cents is None else cents)
+            for pk, (qty, cents) in lines.items() if pk in products
+        ]
+    product_slug = metadata.get("product_slug")
+    product = Product.objects.filter(slug=product_slug).first() if product_slug else None
+    if product is None:
+        return []
+    cents = str(metadata.get("unit_cents") or "")
+    return [(product, 1, int(cents) if cents.isdigit() else product.price_cents)]
+
+
+def _grants_access(sub, field_names) -> bool:
+    return bool(sub.active) if "active" in field_names else sub.status in ACCESS_STATUSES
+
+
+def _apply_subscription(user, sub_id, s):
+    field_names = {f.name for f in SubModel._meta.get_fields()}
+    sub, created = SubModel.objects.select_for_update().get_or_create(user=user, stripe_subscription_id=sub_id)
+    was_active = not created and _grants_access(sub, field_names)
+    old_price = getattr(sub, "price_id", "")
+    if "active" in field_names:
+        # Simple schema
+        sub.active = True
+    elif s:
+        sub.status = s.get("status") or "active"
+        cpe = s.get("current_period_end")
+        sub.current_period_end = datetime.fromtimestamp(cpe, tz=dt_tz.utc) if cpe else timezone.now()
+        sub.cancel_at_period_end = bool(s.get("cancel_at_period_end"))
+        if "price_id" in field_names:
+            price = ((s.get("items") or {}).get("data") or [{}])[0].get("price") or {}
+            sub.price_id = price.get("id") or ""
+        if "stripe_customer_id" in field_names:
+            customer = s.get("customer") or ""
+            sub.stripe_customer_id = customer if isinstance(customer, str) else customer.get("id", "")
+    else:
+        # minimal fallback
+        sub.status = "active"
+        sub.current_period_end = timezone.now() + timezone.timedelta(days=30)
+        sub.cancel_at_period_end = False
+    sub.save()
+    record_subscription_change(was_active, _grants_access(sub, field_names), old_price, getattr(sub, "price_id", ""))
+
+    # flip researcher flag for API gate
+    UserProfile.objects.update_or_create(user=user, defaults={"is_researcher": True})
+    transaction.on_commit(lambda: invalidate_entitlements(user.pk))
+
+
+def fulfill_checkout_session(session, *, user=None, subscription=None):
+    """
+    Apply a completed Stripe Checkout Session. Safe to call any number of times
+    from either entry point. Returns the Order, or None if the buyer is unknown.
+    """
+    session = _as_dict(session)
+    session_id = session["id"]
+    existing = Order.objects.filter(stripe_session_id=session_id).first()
+    if existing:
+        return existing
+
+    user = _resolve_user(session, user)
+    if user is None:
+        return None
+
+    lines = _purchased_lines(session)
+    is_subscription = any(p.product_type == Product.SUBSCRIPTION for p, _, _ in lines)
+
+    # Network calls happen before the transaction, never while holding locks
+    s = _stripe_subscription(session, subscription) if is_subscription else None
+
+    with transaction.atomic():
+        # Serialise concurrent fulfilments for this buyer, then re-check
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list("pk", flat=True))
+        order = Order.objects.filter(stripe_session_id=session_id).first()
+        if order:
+            return order
+
+        order = Order.objects.create(
+            user=user,
+            stripe_session_id=session_id,
+            paid=(session.get("payment_status") == "paid" or session.get("status") == "complete"),
+            # What Stripe charged (after discounts and tax) when the session says so
+            total_cents=(
+                session["amount_total"] if session.get("amount_total") is not None
+                else sum(cents * qty for _, qty, cents in lines)
+            ),
+        )
+        items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=p, quantity=qty, price_cents=cents) for p, qty, cents in lines
+        ])
+        record_order(order, items)
+        if is_subscription:
+            _apply_subscription(user, _subscription_id(session), s)
+    return order
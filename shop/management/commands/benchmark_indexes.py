@@ -0,0 +1,199 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from shop.models import Order, Product
+from subscriptions.models import UserSubscription
+from subscriptions.services import ACCESS_STATUSES
+
+BENCH_PREFIX = "bench_"
+SESSION_PREFIX = "cs_bench_"
+
+
+def _index_on(model, column):
+    """The single-column, non-unique index Django created for `column` (name varies by backend)."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    for name, info in constraints.items():
+        if info["index"] and not info["unique"] and info["columns"] == [column]:
+            return models.Index(fields=[column], name=name)
+    return None
+
+
+def _hot_path_indexes():
+    """(model, Index or UniqueConstraint) pairs added by the hot-path index migrations."""
+    pairs = [(Order, i) for i in Order._meta.indexes]
+    pairs += [(Order, c) for c in Order._meta.constraints]
+    pairs += [(Product, i) for i in Product._meta.indexes]
+    pairs += [(UserSubscription, i) for i in UserSubscription._meta.indexes]
+    session_idx = _index_on(Order, "stripe_session_id")
+    if session_idx:
+        pairs.append((Order, session_idx))
+    return pairs
+
+
+def _drop(pairs):
+    with connection.schema_editor() as editor:
+        for model, obj in pairs:
+            if isinstance(obj, models.Index):
+                editor.remove_index(model, obj)
+            else:
+                editor.remove_constraint(model, obj)
+
+
+def _restore(pairs):
+    with connection.schema_editor() as editor:
+        for model, obj in pairs:
+            if isinstance(obj, models.Index):
+                editor.add_index(model, obj)
+            else:
+                editor.add_constraint(model, obj)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic orders and time the hot lookup queries with and without the "
+        "hot-path indexes. Run it against a scratch database, not production: it "
+        "drops and re-creates real indexes, so it refuses to run unless DEBUG is on "
+        "or --yes-scratch is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=1_000_000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per query; the median is reported.")
+        parser.add_argument("--keep", action="store_true", help="Leave the seeded rows in place.")
+        parser.add_argument("--skip-seed", action="store_true", help="Reuse rows from an earlier --keep run.")
+        parser.add_argument("--yes-scratch", action="store_true",
+                            help="Confirm the default database is a scratch copy (required unless DEBUG is on).")
+
+    def handle(self, *args, **opts):
+        if not (opts["yes_scratch"] or settings.DEBUG):
+            raise CommandError(
+                f"Refusing to drop indexes on {connection.settings_dict['NAME']!s} with DEBUG off. "
+                "Point DATABASES at a scratch copy and pass --yes-scratch."
+            )
+        rng = random.Random(42)
+        if not opts["skip_seed"]:
+            self.seed(rng, opts["orders"], opts["users"], opts["batch_size"])
+        user_ids = list(get_user_model().objects.filter(username__startswith=BENCH_PREFIX).values_list("pk", flat=True))
+        order_count = Order.objects.filter(user__username__startswith=BENCH_PREFIX).count()
+        if not user_ids or not order_count:
+            self.stderr.write("Nothing to benchmark (no seeded rows).")
+            return
+        self.analyze()
+
+        queries = self.queries(rng, user_ids, order_count)
+        after = self.measure(queries, opts["repeat"])
+        pairs = _hot_path_indexes()
+        _drop(pairs)
+        try:
+            self.analyze()
+            before = self.measure(queries, opts["repeat"])
+        finally:
+            _restore(pairs)
+            self.analyze()
+
+        self.stdout.write(f"{connection.vendor}: {order_count:,} orders, {len(user_ids):,} users, median of {opts['repeat']}")
+        self.stdout.write(f"{'query':<22}{'no index (ms)':>16}{'indexed (ms)':>16}{'speedup':>10}")
+        for name in queries:
+            b, a = before[name] * 1000, after[name] * 1000
+            self.stdout.write(f"{name:<22}{b:>16.2f}{a:>16.2f}{b / max(a, 1e-6):>9.1f}x")
+
+        if not opts["keep"]:
+            self.cleanup()
+
+    # ---------- seeding ----------
+
+    def seed(self, rng, n_orders, n_users, batch_size):
+        User = get_user_model()
+        self.stdout.write(f"Seeding {n_users:,} users and {n_orders:,} orders…")
+        User.objects.bulk_create(
+            [User(username=f"{BENCH_PREFIX}{i}", email=f"{BENCH_PREFIX}{i}@example.com") for i in range(n_users)],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+        user_ids = list(User.objects.filter(username__startswith=BENCH_PREFIX).values_list("pk", flat=True))
+
+        now = timezone.now()
+        UserSubscription.objects.bulk_create([
+            UserSubscription(
+                user_id=pk, stripe_subscription_id=f"sub_{BENCH_PREFIX}{pk}",
+                status=rng.choice(("active", "canceled", "unpaid", "trialing")),
+                current_period_end=now + timedelta(days=rng.randint(-60, 30)),
+            )
+            for pk in user_ids
+        ], batch_size=batch_size, ignore_conflicts=True)
+
+        start = Order.objects.filter(user__username__startswith=BENCH_PREFIX).count()
+        for lo in range(start, n_orders, batch_size):
+            batch = []
+            for n in range(lo, min(lo + batch_size, n_orders)):
+                paid = rng.random() < 0.9
+                batch.append(Order(
+                    user_id=rng.choice(user_ids),
+                    # a slice of unpaid orders never got a session id
+                    stripe_session_id=f"{SESSION_PREFIX}{n}" if paid or n % 2 else "",
+                    total_cents=rng.randint(100, 2_000_000),
+                    paid=paid,
+                    approved=paid and rng.random() < 0.95,
+                ))
+            with transaction.atomic():
+                Order.objects.bulk_create(batch)
+            self.stdout.write(f"{min(lo + batch_size, n_orders):,} orders", ending="\r")
+        self.stdout.write("")
+
+    def cleanup(self):
+        User = get_user_model()
+        Order.objects.filter(user__username__startswith=BENCH_PREFIX).delete()
+        UserSubscription.objects.filter(user__username__startswith=BENCH_PREFIX).delete()
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    def analyze(self):
+        tables = [m._meta.db_table for m in (Order, Product, UserSubscription)]
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+            elif connection.vendor == "mysql":
+                cursor.execute("ANALYZE TABLE " + ", ".join(connection.ops.quote_name(t) for t in tables))
+
+    # ---------- timing ----------
+
+    def queries(self, rng, user_ids, order_count):
+        sessions = [f"{SESSION_PREFIX}{rng.randrange(order_count)}" for _ in range(20)]
+        users = [rng.choice(user_ids) for _ in range(20)]
+        now = timezone.now()
+        return {
+            "order_by_session": lambda: [Order.objects.filter(stripe_session_id=s).first() for s in sessions],
+            "pending_orders": lambda: list(
+                Order.objects.filter(paid=True, approved=False).order_by("created_at")[:50]
+            ),
+            "orders_for_user": lambda: [
+                list(Order.objects.filter(user_id=u).order_by("-created_at")[:50]) for u in users
+            ],
+            "active_subscription": lambda: [
+                UserSubscription.objects.filter(
+                    user_id=u, status__in=ACCESS_STATUSES, current_period_end__gt=now
+                ).exists() for u in users
+            ],
+            "active_products": lambda: list(Product.objects.filter(active=True)),
+        }
+
+    def measure(self, queries, repeat):
+        results = {}
+        for name, run in queries.items():
+            run()  # warm the page cache
+            timings = []
+            for _ in range(repeat):
+                t = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - t)
+            results[name] = statistics.median(timings)
+        return results
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.export import export_csv, parse_bound
+
+
+class Command(BaseCommand):
+    help = "Write orders and their line items as CSV (to a file or stdout), streaming in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="Include orders created at/after this date or ISO datetime.")
+        parser.add_argument("--end", help="Include orders created before this date or ISO datetime.")
+        parser.add_argument("--output", "-o", default="-", help="File path, or '-' for stdout (default).")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **opts):
+        try:
+            start, end = parse_bound(opts["start"]), parse_bound(opts["end"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = export_csv(start, end, chunk_size=opts["chunk_size"])
+        if opts["output"] == "-":
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        try:
+            with open(opts["output"], "w", newline="", encoding="utf-8") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stderr.write(self.style.SUCCESS(f"Wrote {opts['output']}"))
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from bluewave_shop.db import upsert_options
+from shop.models import Product
+
+PRODUCT_TYPES = {t for t, _ in Product.PRODUCT_TYPES}
+UPDATE_FIELDS = ["name", "description", "price_cents", "product_type", "active", "updated_at"]
+FALSEY = {"0", "false", "no", "n", "off", ""}
+SLUG_MAX = Product._meta.get_field("slug").max_length
+NAME_MAX = Product._meta.get_field("name").max_length
+PRICE_ID_MAX = Product._meta.get_field("stripe_price_id").max_length
+
+
+def _read_rows(handle, fmt):
+    """Yield (line number, dict) pairs without loading the whole feed."""
+    if fmt == "csv":
+        reader = csv.DictReader(handle)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for n, line in enumerate(handle, start=1):
+            line = line.strip()
+            if line:
+                try:
+                    yield n, json.loads(line)
+                except ValueError as e:
+                    yield n, e
+
+
+def _text(row, key) -> str:
+    """A text field of the row ("" when missing); JSON numbers, lists etc. are rejected."""
+    value = row.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be text, got {type(value).__name__}")
+    return value
+
+
+def _clean(row) -> Product:
+    """Validate one feed row into an unsaved Product; raises ValueError with the reason."""
+    if isinstance(row, Exception):
+        raise ValueError(f"invalid JSON ({row})")
+    if not isinstance(row, dict):
+        raise ValueError(f"expected an object, got {type(row).__name__}")
+    name = _text(row, "name").strip()
+    if not name:
+        raise ValueError("name is required")
+    # Truncating can leave a trailing separator, so strip it again
+    slug = slugify(_text(row, "slug") or name)[:SLUG_MAX].strip("-_")
+    if not slug:
+        raise ValueError("slug is empty")
+
+    if row.get("price_cents") not in (None, ""):
+        try:
+            price_cents = int(row["price_cents"])
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"bad price_cents {row['price_cents']!r}")
+    else:
+        try:
+            price_gbp = Decimal(str(row.get("price_gbp") or 0))
+        except InvalidOperation:
+            price_gbp = None
+        if price_gbp is None or not price_gbp.is_finite():
+            raise ValueError(f"bad price_gbp {row.get('price_gbp')!r}")
+        price_cents = int(price_gbp * 100)
+    if price_cents < 0:
+        raise ValueError("price must not be negative")
+
+    product_type = (_text(row, "product_type") or _text(row, "type") or Product.ONE_TIME).strip().upper()
+    if product_type not in PRODUCT_TYPES:
+        raise ValueError(f"unknown product_type {product_type!r}")
+
+    active = row.get("active", True)
+    if isinstance(active, str):
+        active = active.strip().lower() not in FALSEY
+
+    return Product(
+        name=name[:NAME_MAX],
+        slug=slug,
+        description=_text(row, "description"),
+        price_cents=price_cents,
+        product_type=product_type,
+        stripe_price_id=_text(row, "stripe_price_id").strip()[:PRICE_ID_MAX],
+        active=bool(active),
+    )
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV/JSONL product feed (file or '-' for stdin) and bulk-upsert it on slug."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Feed file, or '-' to read stdin.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults from the file extension (csv otherwise).")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--max-errors", type=int, default=100, help="Abort after this many invalid rows.")
+        parser.add_argument("--dry-run", action="store_true", help="Validate only.")
+
+    def handle(self, *args, **opts):
+        path = opts["path"]
+        fmt = opts["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        if path == "-":
+            handle = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+        else:
+            try:
+                handle = open(path, encoding="utf-8", newline="")
+            except OSError as e:
+                raise CommandError(str(e))
+
+        started = time.monotonic()
+        seen = written = errors = 0
+        with handle:
+            rows = _read_rows(handle, fmt)
+            while True:
+                chunk = list(islice(rows, opts["chunk_size"]))
+                if not chunk:
+                    break
+                products = {}
+                for line, row in chunk:
+                    seen += 1
+                    try:
+                        product = _clean(row)
+                    except ValueError as e:
+                        errors += 1
+                        self.stderr.write(f"line {line}: {e}")
+                        if errors >= opts["max_errors"]:
+                            raise CommandError(f"Too many invalid rows ({errors}); aborting.")
+                        continue
+                    products[product.slug] = product  # last row for a slug wins
+                if not opts["dry_run"]:
+                    written += self.upsert(list(products.values()))
+                self.stdout.write(f"{seen} rows read, {written} upserted, {errors} invalid", ending="\r")
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Validated' if opts['dry_run'] else 'Imported'} {seen} rows "
+            f"({written} upserted, {errors} invalid) in {elapsed:.1f}s — {seen / elapsed:,.0f} rows/s."
+        ))
+
+    def upsert(self, products) -> int:
+        """
+        Upsert one chunk. Rows whose existing product already has a Stripe price
+        keep it; everyone else takes stripe_price_id from the feed.
+        """
+        if not products:
+            return 0
+        with transaction.atomic():
+            # Row locks hold off a concurrent sync_stripe_catalog until the chunk is written
+            existing = (
+                Product.objects.select_for_update()
+                .filter(slug__in=[p.slug for p in products])
+                .values_list("slug", "stripe_price_id")
+            )
+            locked = {slug for slug, price_id in existing if price_id}
+            keep_price = [p for p in products if p.slug in locked]
+            take_price = [p for p in products if p.slug not in locked]
+            if keep_price:
+                Product.objects.bulk_create(keep_price, **upsert_options(["slug"], UPDATE_FIELDS))
+            if take_price:
+                Product.objects.bulk_create(take_price, **upsert_options(["slug"], UPDATE_FIELDS + ["stripe_price_id"]))
+        return len(products)
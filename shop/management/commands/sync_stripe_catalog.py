@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+import stripe
+
+from shop.models import Product
+
+
+def _product_slug(price) -> str:
+    """Slug a Stripe price maps to: price/product metadata `slug`, else lookup_key, else slugified product name."""
+    product = price.get("product") or {}
+    if isinstance(product, str):
+        product = {}
+    return (
+        (price.get("metadata") or {}).get("slug")
+        or (product.get("metadata") or {}).get("slug")
+        or price.get("lookup_key")
+        or slugify(product.get("name") or "")
+    )
+
+
+def _pick_price(prices, product_type):
+    """Prefer the Stripe product's default price, then one whose billing matches the product type."""
+    for p in prices:
+        default = (p.get("product") or {}).get("default_price")
+        default_id = default.get("id") if isinstance(default, dict) else default
+        if default_id == p["id"]:
+            return p
+    want_recurring = product_type == Product.SUBSCRIPTION
+    for p in prices:
+        if bool(p.get("recurring")) == want_recurring:
+            return p
+    return prices[0]
+
+
+class Command(BaseCommand):
+    help = "Sync Product.stripe_price_id (and optionally prices/new products) from the Stripe catalog in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Print the diff without writing.")
+        parser.add_argument("--update-prices", action="store_true", help="Also copy unit_amount into price_cents.")
+        parser.add_argument("--create", action="store_true", help="Create Products for unmatched Stripe products.")
+        parser.add_argument("--api-base", default=getattr(settings, "STRIPE_API_BASE", ""),
+                            help="Stripe API base URL, e.g. a local stripe-mock (http://localhost:12111).")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        if not settings.STRIPE_SECRET_KEY:
+            raise CommandError("STRIPE_SECRET_KEY is not set.")
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        if opts["api_base"]:
+            stripe.api_base = opts["api_base"]
+
+        # One paginated walk over active prices, with their products expanded inline
+        by_slug = {}
+        fetched = 0
+        for price in stripe.Price.list(active=True, limit=100, expand=["data.product"]).auto_paging_iter():
+            fetched += 1
+            price = price.to_dict()  # StripeObject is not a dict; to_dict() converts nested objects too
+            slug = _product_slug(price)
+            if slug:
+                by_slug.setdefault(slug, []).append(price)
+
+        products = {p.slug: p for p in Product.objects.filter(slug__in=list(by_slug))}
+        fields = ["stripe_price_id"] + (["price_cents"] if opts["update_prices"] else [])
+        to_update, to_create = [], []
+
+        for slug, prices in sorted(by_slug.items()):
+            product = products.get(slug)
+            if product is None:
+                if opts["create"]:
+                    price = _pick_price(prices, None)
+                    stripe_product = price.get("product") or {}
+                    to_create.append(Product(
+                        name=stripe_product.get("name") or slug,
+                        slug=slug,
+                        description=stripe_product.get("description") or "",
+                        price_cents=price.get("unit_amount") or 0,
+                        product_type=Product.SUBSCRIPTION if price.get("recurring") else Product.ONE_TIME,
+                        stripe_price_id=price["id"],
+                    ))
+                    self.stdout.write(f"+ {slug}: new product, stripe_price_id={price['id']}")
+                continue
+
+            price = _pick_price(prices, product.product_type)
+            changes = {"stripe_price_id": price["id"]}
+            if opts["update_prices"] and price.get("unit_amount") is not None:
+                changes["price_cents"] = price["unit_amount"]
+            diff = {f: (getattr(product, f), v) for f, v in changes.items() if getattr(product, f) != v}
+            if diff:
+                for f, (_, new) in diff.items():
+                    setattr(product, f, new)
+                to_update.append(product)
+                self.stdout.write(f"~ {slug}: " + ", ".join(f"{f} {old!r} -> {new!r}" for f, (old, new) in diff.items()))
+
+        if not opts["dry_run"]:
+            with transaction.atomic():
+                Product.objects.bulk_update(to_update, fields, batch_size=opts["batch_size"])
+                Product.objects.bulk_create(to_create, batch_size=opts["batch_size"])
+
+        verb = "Would update" if opts["dry_run"] else "Updated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{fetched} Stripe price(s) read. {verb} {len(to_update)}, "
+            f"{'would create' if opts['dry_run'] else 'created'} {len(to_create)}."
+        ))
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def dedupe_session_ids(apps, schema_editor):
+    """
+    Make non-empty stripe_session_id values unique before the constraint is
+    added. Earlier double fulfilments can leave several orders for one session.
+    The oldest order keeps the id; the others get "<id>#dup<pk>", so nothing is
+    deleted and they can still be reviewed.
+    """
+    Order = apps.get_model("shop", "Order")
+    dupes = (
+        Order.objects.exclude(stripe_session_id="").values("stripe_session_id")
+        .annotate(n=models.Count("id")).filter(n__gt=1).values_list("stripe_session_id", flat=True)
+    )
+    for session_id in list(dupes):
+        for order in Order.objects.filter(stripe_session_id=session_id).order_by("pk")[1:]:
+            order.stripe_session_id = f"{session_id}#dup{order.pk}"
+            order.save(update_fields=["stripe_session_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='stripe_session_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['paid', 'approved', 'created_at'], name='order_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('approved', False), ('paid', True)), fields=['created_at'], name='order_pending_partial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['active'], name='product_active_idx'),
+        ),
+        migrations.RunPython(dedupe_session_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('stripe_session_id', ''), _negated=True), fields=('stripe_session_id',), name='order_unique_stripe_session'),
+        ),
+    ]
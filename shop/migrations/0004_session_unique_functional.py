@@ -0,0 +1,30 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:42
+
+from importlib import import_module
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+# MySQL skipped the partial constraint from 0002, so duplicates may exist there
+dedupe_session_ids = import_module("shop.migrations.0002_hot_path_indexes").dedupe_session_ids
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_date_hierarchy_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_session_ids, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='order',
+            name='order_unique_stripe_session',
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.NullIf('stripe_session_id', models.Value('')), name='order_unique_stripe_session'),
+        ),
+    ]
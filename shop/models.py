@@ -1,5 +1,6 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import NullIf
 from django.utils import timezone
 
 class Product(models.Model):
@@ -16,17 +17,46 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["active"], name="product_active_idx")]
+
     def __str__(self):
         return self.name
 
 class Order(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    stripe_session_id = models.CharField(max_length=200, blank=True, default="")
+    stripe_session_id = models.CharField(max_length=200, blank=True, default="", db_index=True)
     total_cents = models.PositiveIntegerField(default=0)
     paid = models.BooleanField(default=False)
     approved = models.BooleanField(default=False)  # admin marks true upon fulfillment
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # pending_orders: paid=True, approved=False, oldest first. MySQL uses the composite
+            # index; SQLite compares booleans as bare columns ("paid AND NOT approved"), which
+            # only the partial index matches (MySQL skips partial indexes, check models.W037).
+            models.Index(fields=["paid", "approved", "created_at"], name="order_pending_idx"),
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(paid=True, approved=False),
+                name="order_pending_partial_idx",
+            ),
+            # orders_view: a user's orders, newest first
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+            # admin date_hierarchy and date-range reports
+            models.Index(fields=["created_at"], name="order_created_idx"),
+        ]
+        constraints = [
+            # One order per Checkout Session. Unique on NULLIF(id, '') so empty ids (NULL in the
+            # index) may repeat: a functional index that MySQL 8.0.13+ enforces, unlike a partial one.
+            # MariaDB has neither (check models.W043); there only fulfilment's per-user lock holds.
+            models.UniqueConstraint(
+                NullIf("stripe_session_id", models.Value("")),
+                name="order_unique_stripe_session",
+            ),
+        ]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
@@ -39,8 +69,37 @@ class PurchaseApproval(models.Model):
     approved_at = models.DateTimeField(null=True, blank=True)
 
     def approve(self, user):
+        from reporting.aggregates import record_approvals
+        newly_approved = not self.order.approved
         self.approved_by = user
         self.approved_at = timezone.now()
         self.order.approved = True
-        self.order.save()
-        self.save()
+        with transaction.atomic():
+            self.order.save()
+            self.save()
+            if newly_approved:
+                record_approvals(1, self.approved_at)
+
+    @classmethod
+    def approve_orders(cls, orders, user, batch_size=500) -> int:
+        """
+        Approve every paid, unapproved order in `orders` (a queryset) in one
+        transaction, a few statements per batch. Returns how many were approved.
+        """
+        from reporting.aggregates import record_approvals
+        now = timezone.now()
+        approved = 0
+        with transaction.atomic():
+            ids = list(
+                orders.filter(paid=True, approved=False).select_for_update().order_by().values_list("pk", flat=True)
+            )
+            for lo in range(0, len(ids), batch_size):
+                batch = ids[lo:lo + batch_size]
+                existing = set(cls.objects.filter(order_id__in=batch).values_list("order_id", flat=True))
+                cls.objects.filter(order_id__in=existing).update(approved_by=user, approved_at=now)
+                cls.objects.bulk_create(
+                    [cls(order_id=pk, approved_by=user, approved_at=now) for pk in batch if pk not in existing]
+                )
+                approved += Order.objects.filter(pk__in=batch).update(approved=True)
+            record_approvals(approved, now)
+        return approved
@@ -0,0 +1,94 @@
+"""
+Keyset (cursor) pagination on (created_at, id).
+
+Each page is one indexed range scan of `size + 1` rows, whatever page you're
+on, and rows inserted while someone is paging don't shift what they see.
+Cursors are opaque, URL-safe tokens for the first/last row of a page.
+"""
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from django.db.models import Q
+
+
+def encode_cursor(obj) -> str:
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """(created_at, id) from a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        ts, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+@dataclass
+class KeysetPage:
+    object_list: List
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _beyond(created_at, pk, descending):
+    """Rows strictly after (created_at, pk) in the given direction."""
+    if descending:
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+
+
+def keyset_page(queryset, *, after: Optional[str] = None, before: Optional[str] = None,
+                size: int = 25, descending: bool = False) -> KeysetPage:
+    """
+    One page of `queryset` ordered by (created_at, id), newest first when
+    `descending`. Pass the `after` cursor for the next page or `before` for the
+    previous one; a malformed cursor, or a `before` with nothing earlier, gives
+    the first page.
+    """
+    order = ["-created_at", "-pk"] if descending else ["created_at", "pk"]
+    reverse = ["created_at", "pk"] if descending else ["-created_at", "-pk"]
+
+    key = decode_cursor(before) if before else None
+    if key:
+        # Walk backwards from the cursor, then flip back into display order
+        rows = list(queryset.filter(_beyond(*key, not descending)).order_by(*reverse)[: size + 1])
+        if rows:
+            more = len(rows) > size
+            rows = rows[:size][::-1]
+            return KeysetPage(
+                rows,
+                next_cursor=encode_cursor(rows[-1]),
+                prev_cursor=encode_cursor(rows[0]) if more else None,
+            )
+        after = None  # nothing before the cursor (rows were deleted, or a stale link): show the first page
+
+    key = decode_cursor(after) if after else None
+    if key:
+        queryset = queryset.filter(_beyond(*key, descending))
+    rows = list(queryset.order_by(*order)[: size + 1])
+    more = len(rows) > size
+    rows = rows[:size]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if rows and more else None,
+        prev_cursor=encode_cursor(rows[0]) if rows and key else None,
+    )
@@ -1,6 +1,8 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
+from unittest.mock import patch
+import stripe
 from shop.models import Product
 
 class ShopTests(TestCase):
@@ -17,3 +19,518 @@ class ShopTests(TestCase):
         c = Client()
         res = c.get(reverse("create_checkout_session", args=["p1"]))
         self.assertEqual(res.status_code, 302)
+
+
+class FulfillmentTests(TestCase):
+    def setUp(self):
+        from shop.models import Product
+        self.user = User.objects.create_user("buyer", "b@ex.com", "Pass123!")
+        self.sub_product = Product.objects.create(
+            name="Data", slug="data", price_cents=4900, product_type=Product.SUBSCRIPTION, stripe_price_id="price_s"
+        )
+        self.session = {
+            "id": "cs_42", "payment_status": "paid",
+            "metadata": {"product_slug": "data", "user_id": str(self.user.id)},
+            # expanded by checkout_success, so no extra Subscription.retrieve is needed
+            "subscription": {"id": "sub_42", "status": "active", "current_period_end": 4102444800,
+                             "customer": "cus_1", "items": {"data": [{"price": {"id": "price_s"}}]}},
+        }
+
+    def test_success_page_and_webhook_share_one_fulfilment(self):
+        from django.test import override_settings
+        from shop.models import Order
+        from subscriptions.models import UserSubscription
+        from accounts.models import UserProfile
+        from payments.handlers import handle_checkout_completed
+
+        c = Client()
+        c.login(username="buyer", password="Pass123!")
+        with override_settings(STRIPE_SECRET_KEY="sk_test"), \
+                patch("stripe.checkout.Session.retrieve",
+                      return_value=stripe.checkout.Session.construct_from(self.session, "sk_test")), \
+                patch("stripe.Subscription.retrieve") as sub_retrieve:
+            c.get(reverse("checkout_success") + "?session_id=cs_42")
+            webhook_session = dict(self.session, subscription="sub_42")
+            with self.assertNumQueries(1):
+                handle_checkout_completed(webhook_session)
+        sub_retrieve.assert_not_called()
+
+        order = Order.objects.get(stripe_session_id="cs_42")
+        self.assertEqual(order.items.count(), 1)
+        sub = UserSubscription.objects.get(stripe_subscription_id="sub_42")
+        self.assertEqual((sub.status, sub.price_id, sub.stripe_customer_id), ("active", "price_s", "cus_1"))
+        self.assertTrue(UserProfile.objects.get(user=self.user).is_researcher)
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test")
+    def test_retrieved_subscription_object_is_read(self):
+        from shop.fulfillment import fulfill_checkout_session
+        from subscriptions.models import UserSubscription
+        retrieved = stripe.Subscription.construct_from(self.session["subscription"], "sk_test")
+        with patch("stripe.Subscription.retrieve", return_value=retrieved):
+            fulfill_checkout_session(dict(self.session, subscription="sub_42"))
+        sub = UserSubscription.objects.get(stripe_subscription_id="sub_42")
+        self.assertEqual((sub.price_id, sub.stripe_customer_id), ("price_s", "cus_1"))
+
+
+class StripeCatalogSyncTests(TestCase):
+    def setUp(self):
+        from shop.models import Product
+        self.unit = Product.objects.create(name="Unit", slug="unit", price_cents=100)
+        self.data = Product.objects.create(name="Data", slug="data", product_type=Product.SUBSCRIPTION)
+        prices = [
+            {"id": "price_unit", "unit_amount": 349900, "recurring": None, "metadata": {},
+             "product": {"name": "Unit", "metadata": {"slug": "unit"}}},
+            {"id": "price_data_once", "unit_amount": 100, "recurring": None, "metadata": {},
+             "product": {"name": "Data", "metadata": {}}},
+            {"id": "price_data", "unit_amount": 4900, "recurring": {"interval": "month"}, "metadata": {},
+             "product": {"name": "Data", "metadata": {}}},
+            {"id": "price_new", "unit_amount": 500, "recurring": None, "metadata": {},
+             "product": {"name": "Brand New Filter", "metadata": {}}},
+        ]
+        prices = [stripe.Price.construct_from(p, "sk_test") for p in prices]
+        listing = patch("stripe.Price.list")
+        self.list = listing.start()
+        self.list.return_value.auto_paging_iter.return_value = iter(prices)
+        self.addCleanup(listing.stop)
+
+    def run_sync(self, *args):
+        from django.core.management import call_command
+        from django.test import override_settings
+        from io import StringIO
+        out = StringIO()
+        with override_settings(STRIPE_SECRET_KEY="sk_test"):
+            call_command("sync_stripe_catalog", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_writes_nothing(self):
+        out = self.run_sync("--dry-run")
+        self.assertIn("~ unit: stripe_price_id '' -> 'price_unit'", out)
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.stripe_price_id, "")
+
+    def test_sync_matches_and_bulk_applies(self):
+        from shop.models import Product
+        with self.assertNumQueries(5):  # select, savepoint, one UPDATE, one INSERT, release
+            self.run_sync("--update-prices", "--create")
+        self.unit.refresh_from_db()
+        self.data.refresh_from_db()
+        self.assertEqual((self.unit.stripe_price_id, self.unit.price_cents), ("price_unit", 349900))
+        self.assertEqual(self.data.stripe_price_id, "price_data")  # recurring price for a subscription
+        self.assertEqual(Product.objects.get(slug="brand-new-filter").stripe_price_id, "price_new")
+
+
+class ProductImportTests(TestCase):
+    def test_csv_import_upserts_and_keeps_existing_stripe_price(self):
+        import tempfile, os
+        from io import StringIO
+        from django.core.management import call_command
+        from shop.models import Product
+        Product.objects.create(name="Old Buoy", slug="buoy", price_cents=1, stripe_price_id="price_live")
+        feed = (
+            "name,slug,price_gbp,product_type,stripe_price_id\n"
+            "Solar Buoy,buoy,3499.00,ONE_TIME,price_feed\n"
+            "Softener,,749.00,ONE_TIME,price_soft\n"
+            ",nameless,1.00,ONE_TIME,\n"
+            "Data Plan,data-plan,49,SUBSCRIPTION,\n"
+        )
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(feed)
+        self.addCleanup(os.unlink, f.name)
+
+        err = StringIO()
+        call_command("import_products", f.name, "--chunk-size", "2", stdout=StringIO(), stderr=err)
+
+        buoy = Product.objects.get(slug="buoy")
+        self.assertEqual((buoy.name, buoy.price_cents, buoy.stripe_price_id), ("Solar Buoy", 349900, "price_live"))
+        self.assertEqual(Product.objects.get(slug="softener").stripe_price_id, "price_soft")
+        self.assertEqual(Product.objects.get(slug="data-plan").product_type, Product.SUBSCRIPTION)
+        self.assertFalse(Product.objects.filter(slug="nameless").exists())
+        self.assertIn("line 4: name is required", err.getvalue())
+
+    def test_bad_jsonl_rows_are_reported_not_raised(self):
+        import tempfile, os
+        from io import StringIO
+        from django.core.management import call_command
+        from shop.models import Product
+        long_name = "Very Long Product Name " * 5
+        feed = "\n".join([
+            '["not", "an", "object"]',
+            '{"name": 42}',
+            '{"name": "Nan", "price_gbp": "NaN"}',
+            '{"name": "Inf", "price_cents": 1e999}',
+            '{"name": "%s", "price_gbp": "1.50"}' % long_name,
+        ])
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write(feed)
+        self.addCleanup(os.unlink, f.name)
+
+        err = StringIO()
+        call_command("import_products", f.name, stdout=StringIO(), stderr=err)
+
+        self.assertEqual(err.getvalue().count("line "), 4, err.getvalue())
+        self.assertIn("line 1: expected an object", err.getvalue())
+        self.assertIn("line 2: name must be text", err.getvalue())
+        self.assertIn("line 3: bad price_gbp", err.getvalue())
+        self.assertIn("line 4: bad price_cents", err.getvalue())
+        product = Product.objects.get()
+        self.assertLessEqual(len(product.slug), 50)
+        self.assertFalse(product.slug.endswith("-"))
+
+
+    def test_price_lock_is_read_inside_the_write_transaction(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from shop.management.commands.import_products import Command
+        Product.objects.create(name="Buoy", slug="buoy", price_cents=1, stripe_price_id="price_live")
+        with CaptureQueriesContext(connection) as ctx:
+            Command().upsert([Product(name="Buoy", slug="buoy", price_cents=2, stripe_price_id="price_feed")])
+        sql = [q["sql"] for q in ctx.captured_queries]
+        opened = next(i for i, q in enumerate(sql) if q.startswith("SAVEPOINT"))
+        read = next(i for i, q in enumerate(sql) if q.startswith("SELECT") and '"stripe_price_id"' in q)
+        self.assertLess(opened, read)
+        self.assertEqual(Product.objects.get(slug="buoy").stripe_price_id, "price_live")
+
+class HotPathIndexTests(TestCase):
+    def test_session_id_unique_unless_empty(self):
+        from django.db import IntegrityError, transaction
+        from shop.models import Order
+        user = User.objects.create_user("idx", "idx@example.com", "x")
+        Order.objects.create(user=user, stripe_session_id="")
+        Order.objects.create(user=user, stripe_session_id="")
+        Order.objects.create(user=user, stripe_session_id="cs_1")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Order.objects.create(user=user, stripe_session_id="cs_1")
+
+
+class SessionDedupeMigrationTests(TransactionTestCase):
+    # Drops the constraint, which SQLite can't do inside TestCase's transaction
+    def test_duplicates_are_renamed_oldest_kept(self):
+        from importlib import import_module
+        from django.apps import apps
+        from django.db import connection
+        from shop.models import Order
+        user = User.objects.create_user("dupe")
+        constraint = Order._meta.constraints[0]
+        # Simulate a database that got duplicates before the constraint existed
+        with connection.schema_editor() as editor:
+            editor.remove_constraint(Order, constraint)
+        try:
+            orders = [Order.objects.create(user=user, stripe_session_id=sid) for sid in ("cs_a", "cs_a", "cs_a", "cs_b", "", "")]
+            import_module("shop.migrations.0002_hot_path_indexes").dedupe_session_ids(apps, None)
+            ids = dict(Order.objects.values_list("pk", "stripe_session_id"))
+        finally:
+            Order.objects.all().delete()
+            with connection.schema_editor() as editor:
+                editor.add_constraint(Order, constraint)
+        self.assertEqual(
+            [ids[o.pk] for o in orders],
+            ["cs_a", f"cs_a#dup{orders[1].pk}", f"cs_a#dup{orders[2].pk}", "cs_b", "", ""],
+        )
+
+
+class BenchmarkIndexesCommandTests(TransactionTestCase):
+    # Drops and re-creates indexes, which SQLite can't do inside TestCase's transaction
+    def test_benchmark_command_restores_indexes(self):
+        from io import StringIO
+        from django.core.management import CommandError, call_command
+        from django.db import connection
+        from shop.models import Order
+        before = set(connection.introspection.get_constraints(connection.cursor(), Order._meta.db_table))
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "--yes-scratch"):
+            call_command("benchmark_indexes", orders=300, users=10, repeat=1, stdout=out)
+        call_command("benchmark_indexes", orders=300, users=10, repeat=1, yes_scratch=True, stdout=out)
+        self.assertIn("pending_orders", out.getvalue())
+        self.assertEqual(set(connection.introspection.get_constraints(connection.cursor(), Order._meta.db_table)), before)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderPaginationTests(TestCase):
+    def setUp(self):
+        from shop.models import Order
+        self.user = User.objects.create_user("pager", "p@example.com", "Pass123!")
+        # 7 orders, several sharing a timestamp so the id tie-break matters
+        self.orders = [Order.objects.create(user=self.user, stripe_session_id=f"cs_{i}", paid=True) for i in range(7)]
+        Order.objects.filter(pk__in=[o.pk for o in self.orders[:4]]).update(created_at=self.orders[0].created_at)
+        self.client.login(username="pager", password="Pass123!")
+
+    def walk(self, url, **params):
+        res = self.client.get(url, params)
+        page = res.context["page"]
+        return [o.pk for o in page], page
+
+    @override_settings(ORDERS_PAGE_SIZE=3)
+    def test_orders_pages_forward_and_back(self):
+        from shop.models import Order
+        expected = list(Order.objects.filter(user=self.user).order_by("-created_at", "-pk").values_list("pk", flat=True))
+        url = reverse("orders")
+        first, page = self.walk(url)
+        self.assertEqual(first, expected[:3])
+        self.assertFalse(page.has_previous)
+        second, page = self.walk(url, after=page.next_cursor)
+        self.assertEqual(second, expected[3:6])
+        third, page = self.walk(url, after=page.next_cursor)
+        self.assertEqual(third, expected[6:])
+        self.assertFalse(page.has_next)
+        back, page = self.walk(url, before=page.prev_cursor)
+        self.assertEqual(back, second)
+        back, page = self.walk(url, before=page.prev_cursor)
+        self.assertEqual(back, first)
+        self.assertFalse(page.has_previous)
+
+    @override_settings(ORDERS_PAGE_SIZE=3)
+    def test_pending_queue_is_oldest_first(self):
+        from shop.models import Order
+        self.user.is_staff = True
+        self.user.save()
+        expected = list(Order.objects.order_by("created_at", "pk").values_list("pk", flat=True))
+        seen, cursor = [], None
+        while True:
+            ids, page = self.walk(reverse("pending_orders"), **({"after": cursor} if cursor else {}))
+            seen += ids
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursor_gives_first_page(self):
+        ids, _ = self.walk(reverse("orders"), after="not-a-cursor")
+        self.assertEqual(len(ids), 7)
+
+    @override_settings(ORDERS_PAGE_SIZE=3)
+    def test_before_with_nothing_earlier_gives_first_page(self):
+        from shop.models import Order
+        first, page = self.walk(reverse("orders"))
+        _, second = self.walk(reverse("orders"), after=page.next_cursor)
+        Order.objects.filter(pk__in=first).delete()  # everything newer than page 2 is gone
+        ids, page = self.walk(reverse("orders"), before=second.prev_cursor)
+        self.assertEqual(len(ids), 3)
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+
+
+class BulkApproveTests(TestCase):
+    def setUp(self):
+        from shop.models import Order, PurchaseApproval
+        self.staff = User.objects.create_user("boss", "b@example.com", "Pass123!", is_staff=True)
+        buyer = User.objects.create_user("buyer", "buyer@example.com", "Pass123!")
+        self.orders = [Order.objects.create(user=buyer, stripe_session_id=f"cs_{i}", paid=True) for i in range(6)]
+        self.unpaid = Order.objects.create(user=buyer, stripe_session_id="cs_unpaid", paid=False)
+        PurchaseApproval.objects.create(order=self.orders[0])  # left over from an earlier visit
+        self.client.login(username="boss", password="Pass123!")
+
+    def test_approve_selected(self):
+        from shop.models import Order, PurchaseApproval
+        ids = [self.orders[0].pk, self.orders[1].pk, self.unpaid.pk]
+        res = self.client.post(reverse("bulk_approve_orders"), {"order_ids": ids})
+        self.assertRedirects(res, reverse("pending_orders"), fetch_redirect_response=False)
+        self.assertEqual(set(Order.objects.filter(approved=True).values_list("pk", flat=True)), set(ids[:2]))
+        self.assertEqual(PurchaseApproval.objects.filter(approved_by=self.staff, approved_at__isnull=False).count(), 2)
+
+    def test_approve_all_uses_constant_queries(self):
+        from shop.models import Order, PurchaseApproval
+        with self.assertNumQueries(11):  # includes creating today's reporting row
+            approved = PurchaseApproval.approve_orders(Order.objects.all(), self.staff)
+        self.assertEqual(approved, 6)
+        self.assertFalse(Order.objects.filter(paid=True, approved=False).exists())
+        self.assertFalse(Order.objects.get(pk=self.unpaid.pk).approved)
+        self.assertEqual(PurchaseApproval.objects.count(), 6)
+
+    def test_approve_all_endpoint(self):
+        from shop.models import Order
+        self.client.post(reverse("bulk_approve_orders"), {"all": "1"})
+        self.assertEqual(Order.objects.filter(approved=True).count(), 6)
+
+    def test_staff_and_post_only(self):
+        self.assertEqual(self.client.get(reverse("bulk_approve_orders")).status_code, 405)
+        self.client.logout()
+        self.client.post(reverse("bulk_approve_orders"), {"all": "1"})
+        from shop.models import Order
+        self.assertFalse(Order.objects.filter(approved=True).exists())
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        from shop.models import Order, OrderItem, Product
+        self.staff = User.objects.create_user("acct", "a@example.com", "Pass123!", is_staff=True)
+        buyer = User.objects.create_user("buyer", "buyer@example.com", "Pass123!")
+        skid = Product.objects.create(name="Skid, large", slug="skid", price_cents=1500)
+        for i in range(5):
+            order = Order.objects.create(user=buyer, stripe_session_id=f"cs_{i}", paid=True, total_cents=3000)
+            if i != 2:
+                OrderItem.objects.create(order=order, product=skid, quantity=2, price_cents=1500)
+        self.client.login(username="acct", password="Pass123!")
+
+    def rows(self, content):
+        import csv
+        return list(csv.DictReader(content.splitlines()))
+
+    def test_export_streams_orders_with_items(self):
+        res = self.client.get(reverse("export_orders_csv"))
+        self.assertTrue(res.streaming)
+        self.assertIn("attachment;", res["Content-Disposition"])
+        rows = self.rows(b"".join(res.streaming_content).decode())
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["product_name"], "Skid, large")
+        self.assertEqual(rows[0]["line_total_cents"], "3000")
+        self.assertEqual(rows[2]["item_id"], "")
+
+    def test_formula_like_text_is_quoted(self):
+        from shop.models import Product
+        Product.objects.filter(slug="skid").update(name='=HYPERLINK("http://evil","x")')
+        User.objects.filter(username="buyer").update(username="@buyer", email="-1+1@example.com")
+        row = self.rows(b"".join(self.client.get(reverse("export_orders_csv")).streaming_content).decode())[0]
+        self.assertEqual(row["product_name"], """'=HYPERLINK("http://evil","x")""")
+        self.assertEqual((row["username"], row["email"]), ("'@buyer", "'-1+1@example.com"))
+        self.assertEqual(row["order_total_cents"], "3000")  # numbers are left alone
+
+    def test_batches_keep_order_and_query_count_flat(self):
+        from shop.export import export_csv
+        with self.assertNumQueries(3 * 2):  # 5 orders in batches of 2: 3 batches x (orders + items)
+            text = "".join(export_csv(chunk_size=2))
+        ids = [r["order_id"] for r in self.rows(text)]
+        self.assertEqual(ids, sorted(ids, key=int))
+        self.assertEqual(len(ids), 5)
+
+    def test_date_range_and_bad_input(self):
+        from django.utils import timezone
+        from shop.models import Order
+        Order.objects.filter(stripe_session_id="cs_0").update(created_at=timezone.now() - timezone.timedelta(days=10))
+        since = (timezone.localdate() - timezone.timedelta(days=1)).isoformat()
+        res = self.client.get(reverse("export_orders_csv"), {"start": since})
+        self.assertEqual(len(self.rows(b"".join(res.streaming_content).decode())), 4)
+        self.assertEqual(self.client.get(reverse("export_orders_csv"), {"start": "yesterday"}).status_code, 400)
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("export_orders_csv")).status_code, 302)
+
+    def test_command_writes_file(self):
+        import os, tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        path = os.path.join(tempfile.mkdtemp(), "orders.csv")
+        call_command("export_orders", output=path, chunk_size=2, stderr=StringIO())
+        with open(path, newline="") as fh:
+            self.assertEqual(len(self.rows(fh.read())), 5)
+
+    async def test_export_under_asgi(self):
+        from django.test import AsyncClient
+        client = AsyncClient()
+        await client.aforce_login(await User.objects.aget(username="acct"))
+        res = await client.get(reverse("export_orders_csv"))
+        self.assertTrue(res.is_async)
+        body = b"".join([chunk async for chunk in res.streaming_content]).decode()
+        self.assertEqual(len(self.rows(body)), 5)
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cart", "cart@ex.com", "Pass123!")
+        self.widget = Product.objects.create(name="Widget", slug="widget", price_cents=500, stripe_price_id="price_w")
+        self.gadget = Product.objects.create(name="Gadget", slug="gadget", price_cents=1200, stripe_price_id="price_g")
+        self.plan = Product.objects.create(
+            name="Plan", slug="plan", price_cents=4900, product_type=Product.SUBSCRIPTION, stripe_price_id="price_p"
+        )
+
+    def add(self, slug, quantity=1):
+        return self.client.post(reverse("cart_add", args=[slug]), {"quantity": quantity})
+
+    def test_add_update_remove(self):
+        self.add("widget", 2)
+        self.add("widget")
+        self.add("plan", 3)  # subscriptions are one seat
+        self.add("gadget")
+        self.client.post(reverse("cart_update", args=["gadget"]), {"quantity": 0})
+        res = self.client.get(reverse("cart_detail"))
+        self.assertEqual([(p.slug, q) for p, q in res.context["lines"]], [("widget", 3), ("plan", 1)])
+        self.assertEqual(res.context["total_cents"], 3 * 500 + 4900)
+        self.assertEqual(self.add("widget", "lots").status_code, 400)
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test")
+    def test_checkout_creates_one_session_for_all_lines(self):
+        self.client.force_login(self.user)
+        self.add("widget", 2)
+        self.add("gadget")
+        with patch("stripe.checkout.Session.create") as create:
+            create.return_value.id = "cs_cart_1"
+            create.return_value.url = "https://checkout.stripe.test/cs"
+            res = self.client.post(reverse("cart_checkout"))
+        self.assertRedirects(res, "https://checkout.stripe.test/cs", fetch_redirect_response=False)
+        kwargs = create.call_args.kwargs
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(kwargs["mode"], "payment")
+        self.assertEqual(kwargs["line_items"], [{"price": "price_w", "quantity": 2}, {"price": "price_g", "quantity": 1}])
+        self.assertEqual(kwargs["metadata"]["cart"], f"{self.widget.pk}:2:500,{self.gadget.pk}:1:1200")
+
+        self.add("plan")
+        with patch("stripe.checkout.Session.create") as create:
+            create.return_value.id = "cs_cart_2"
+            create.return_value.url = "https://checkout.stripe.test/cs2"
+            self.client.post(reverse("cart_checkout"))
+        self.assertEqual(create.call_args.kwargs["mode"], "subscription")
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test")
+    def test_cart_is_limited_by_the_encoded_metadata_length(self):
+        from shop.cart import METADATA_LIMIT
+        self.client.force_login(self.user)
+        for i in range(30):  # "100000:1:1234567" is 16 characters, so 29 lines fit and the 30th does not
+            Product.objects.create(pk=100000 + i, name=f"Big {i}", slug=f"big-{i}", price_cents=1234567, stripe_price_id=f"price_{i}")
+            self.add(f"big-{i}")
+        res = self.client.get(reverse("cart_detail"))
+        self.assertEqual(len(res.context["lines"]), 29)
+        self.assertIn("too large", " ".join(str(m) for m in res.context["messages"]))
+
+        Product.objects.update(price_cents=12345678)  # repriced after they were added
+        with patch("stripe.checkout.Session.create") as create:
+            res = self.client.post(reverse("cart_checkout"))
+        self.assertRedirects(res, reverse("cart_detail"), fetch_redirect_response=False)
+        create.assert_not_called()
+        Product.objects.update(price_cents=1234567)
+        with patch("stripe.checkout.Session.create") as create:
+            create.return_value.id, create.return_value.url = "cs_big", "https://checkout.stripe.test/"
+            self.client.post(reverse("cart_checkout"))
+        self.assertLessEqual(len(create.call_args.kwargs["metadata"]["cart"]), METADATA_LIMIT)
+
+    @override_settings(STRIPE_SECRET_KEY="")
+    def test_cart_survives_cancel_and_empties_on_success(self):
+        self.client.force_login(self.user)
+        self.add("widget", 2)
+        session = self.client.session
+        session["cart_checkout"] = "cs_pending"
+        session.save()
+
+        self.client.get(reverse("checkout_cancel"))
+        self.assertEqual(len(self.client.get(reverse("cart_detail")).context["lines"]), 1)
+        self.client.get(reverse("checkout_success") + "?session_id=cs_other")  # a "Buy now" checkout
+        self.assertEqual(len(self.client.get(reverse("cart_detail")).context["lines"]), 1)
+        self.client.get(reverse("checkout_success") + "?session_id=cs_pending")
+        self.assertEqual(self.client.get(reverse("cart_detail")).context["lines"], [])
+
+    def test_fulfilment_writes_all_items_in_one_insert(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from shop.fulfillment import fulfill_checkout_session
+        from shop.models import OrderItem
+        session = {
+            "id": "cs_cart", "payment_status": "paid",
+            "metadata": {"cart": f"{self.widget.pk}:2:500,{self.gadget.pk}:3:1200", "user_id": str(self.user.id)},
+        }
+        Product.objects.update(price_cents=1)  # repriced between checkout and the webhook
+        with CaptureQueriesContext(connection) as ctx:
+            order = fulfill_checkout_session(session, user=self.user)
+        inserts = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(f'INSERT INTO "{OrderItem._meta.db_table}"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(order.total_cents, 2 * 500 + 3 * 1200)
+        self.assertEqual(
+            sorted(order.items.values_list("product__slug", "quantity", "price_cents")),
+            [("gadget", 3, 1200), ("widget", 2, 500)],
+        )
+
+    def test_fulfilment_total_is_what_stripe_charged(self):
+        from shop.fulfillment import fulfill_checkout_session
+        session = {
+            "id": "cs_discounted", "payment_status": "paid", "amount_total": 900,
+            "metadata": {"cart": f"{self.widget.pk}:2:500", "user_id": str(self.user.id)},
+        }
+        self.assertEqual(fulfill_checkout_session(session, user=self.user).total_cents, 900)
@@ -1,9 +1,16 @@
 from django.urls import path
-from .views import product_list, product_detail, create_checkout_session, checkout_success, checkout_cancel, orders_view
+from .views import (
+    product_list, product_detail, create_checkout_session, checkout_success, checkout_cancel, orders_view,
+    cart_detail, cart_add, cart_update, cart_checkout,
+)
 
 urlpatterns = [
     path("", product_list, name="product_list"),
     path("orders/", orders_view, name="orders"),
+    path("cart/", cart_detail, name="cart_detail"),
+    path("cart/checkout/", cart_checkout, name="cart_checkout"),
+    path("cart/<slug:slug>/add/", cart_add, name="cart_add"),
+    path("cart/<slug:slug>/update/", cart_update, name="cart_update"),
     path("<slug:slug>/checkout/", create_checkout_session, name="create_checkout_session"),
     path("success/", checkout_success, name="checkout_success"),
     path("cancel/", checkout_cancel, name="checkout_cancel"),
@@ -1,23 +1,25 @@
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.views.decorators.http import require_POST
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.utils import timezone
+import logging
 import stripe
 
+from bluewave_shop.streaming import stream
+from .cart import METADATA_LIMIT, TOO_LARGE, Cart, encode_lines
+from .export import export_csv, parse_bound
+from .fulfillment import fulfill_checkout_session
 from .models import Product, Order, OrderItem, PurchaseApproval
-from accounts.models import UserProfile
-
-# Robust import for subscription model
-try:
-    from subscriptions.models import Subscription as SubModel
-except Exception:
-    from subscriptions.models import UserSubscription as SubModel
+from .pagination import keyset_page
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 def product_list(request):
@@ -50,7 +52,7 @@ def create_checkout_session(request, slug):
             line_items=[{"price": price_id, "quantity": 1}],
             success_url=success_url,
             cancel_url=cancel_url,
-            metadata={"product_slug": product.slug, "user_id": str(request.user.id)},
+            metadata={"product_slug": product.slug, "unit_cents": str(product.price_cents), "user_id": str(request.user.id)},
         )
         return redirect(session.url, permanent=False)
     except Exception as e:
@@ -58,78 +60,97 @@ def create_checkout_session(request, slug):
         return redirect("product_detail", slug=slug)
 
 
+def cart_detail(request):
+    lines = Cart(request.session).lines()
+    total_cents = sum(p.price_cents * qty for p, qty in lines)
+    return render(request, "shop/cart.html", {"lines": lines, "total_cents": total_cents})
+
+
+@require_POST
+def cart_add(request, slug):
+    product = get_object_or_404(Product, slug=slug, active=True)
+    quantity = request.POST.get("quantity") or "1"
+    if not quantity.isdigit():
+        return HttpResponseBadRequest("Invalid quantity")
+    try:
+        Cart(request.session).add(product, int(quantity))
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect("product_detail", slug=slug)
+    messages.success(request, f"Added {product.name} to your cart.")
+    return redirect("cart_detail")
+
+
+@require_POST
+def cart_update(request, slug):
+    product = get_object_or_404(Product, slug=slug)
+    quantity = request.POST.get("quantity") or "0"
+    if not quantity.isdigit():
+        return HttpResponseBadRequest("Invalid quantity")
+    try:
+        Cart(request.session).set(product, int(quantity))
+    except ValueError as e:
+        messages.error(request, str(e))
+    return redirect("cart_detail")
+
+
+@require_POST
+@login_required
+def cart_checkout(request):
+    """One Checkout Session for the whole cart; the webhook or success page creates the order."""
+    cart = Cart(request.session)
+    lines = cart.lines()
+    if not lines:
+        messages.info(request, "Your cart is empty.")
+        return redirect("cart_detail")
+    missing = [p.name for p, _ in lines if not p.stripe_price_id]
+    if not settings.STRIPE_SECRET_KEY or missing:
+        messages.error(request, "Stripe not configured. Ask an admin to set Stripe keys and price IDs.")
+        return redirect("cart_detail")
+
+    # Prices may have changed since the lines were added
+    encoded = encode_lines(lines)
+    if len(encoded) > METADATA_LIMIT:
+        messages.error(request, TOO_LARGE)
+        return redirect("cart_detail")
+
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    success_url = request.build_absolute_uri(reverse("checkout_success")) + "?session_id={CHECKOUT_SESSION_ID}"
+    cancel_url = request.build_absolute_uri(reverse("checkout_cancel"))
+
+    # Subscription mode takes one-time prices alongside recurring ones; payment mode does not
+    has_subscription = any(p.product_type == Product.SUBSCRIPTION for p, _ in lines)
+    try:
+        session = stripe.checkout.Session.create(
+            mode="subscription" if has_subscription else "payment",
+            customer_email=request.user.email,
+            line_items=[{"price": p.stripe_price_id, "quantity": qty} for p, qty in lines],
+            success_url=success_url,
+            cancel_url=cancel_url,
+            metadata={"cart": encoded, "user_id": str(request.user.id)},
+        )
+    except Exception as e:
+        messages.error(request, f"Stripe error: {e}")
+        return redirect("cart_detail")
+    # Kept until checkout_success, so cancelling on Stripe returns to a full cart
+    cart.checkout_started(session.id)
+    return redirect(session.url, permanent=False)
+
+
 @login_required
 def checkout_success(request):
     session_id = request.GET.get("session_id")
+    Cart(request.session).checkout_completed(session_id)
     if session_id and settings.STRIPE_SECRET_KEY:
         try:
             stripe.api_key = settings.STRIPE_SECRET_KEY
-            sess = stripe.checkout.Session.retrieve(session_id, expand=["subscription", "line_items"])
-            meta = sess.get("metadata") or {}
-            product_slug = meta.get("product_slug")
-
-            product = None
-            if product_slug:
-                try:
-                    product = Product.objects.get(slug=product_slug, active=True)
-                except Product.DoesNotExist:
-                    product = None
-
-            # Idempotent Order
-            order, created = Order.objects.get_or_create(
-                stripe_session_id=session_id,
-                defaults={
-                    "user": request.user,
-                    "paid": (sess.get("payment_status") == "paid" or sess.get("status") == "complete"),
-                    "total_cents": (product.price_cents if product else 0),
-                },
-            )
-            if created and product:
-                OrderItem.objects.create(order=order, product=product, quantity=1, price_cents=product.price_cents)
-
-            # If subscription item, update subscription table
-            if product and product.product_type == Product.SUBSCRIPTION:
-                sub_id = sess.get("subscription") or ""
-                field_names = {f.name for f in SubModel._meta.get_fields()}
-
-                if "active" in field_names:
-                    sub, _ = SubModel.objects.get_or_create(user=request.user, stripe_subscription_id=sub_id or "")
-                    sub.active = True
-                    sub.save()
-                else:
-                    # robust: fetch Subscription for status/period
-                    s = None
-                    if sub_id:
-                        try:
-                            s = stripe.Subscription.retrieve(sub_id, expand=["items.data.price"])
-                        except Exception:
-                            s = None
-
-                    sub, _ = SubModel.objects.get_or_create(user=request.user, stripe_subscription_id=sub_id or "")
-                    if s:
-                        sub.status = s.get("status") or "active"
-                        cpe = s.get("current_period_end")
-                        sub.current_period_end = timezone.datetime.fromtimestamp(cpe, tz=timezone.utc) if cpe else timezone.now()
-                        sub.cancel_at_period_end = bool(s.get("cancel_at_period_end"))
-                        if "price_id" in field_names:
-                            price = (s.get("items", {}).get("data") or [{}])[0].get("price") or {}
-                            sub.price_id = price.get("id") or ""
-                        if "stripe_customer_id" in field_names:
-                            sub.stripe_customer_id = s.get("customer") or ""
-                    else:
-                        sub.status = "active"
-                        sub.current_period_end = timezone.now() + timezone.timedelta(days=30)
-                        sub.cancel_at_period_end = False
-                    sub.save()
-
-                # flip researcher flag
-                profile, _ = UserProfile.objects.get_or_create(user=request.user)
-                profile.is_researcher = True
-                profile.save()
-
+            # Already applied (e.g. by the webhook worker): nothing to fetch or write
+            if not Order.objects.filter(stripe_session_id=session_id).exists():
+                sess = stripe.checkout.Session.retrieve(session_id, expand=["subscription.items.data.price", "line_items"])
+                fulfill_checkout_session(sess, user=request.user)
         except Exception:
-            # swallow to avoid breaking the UX
-            pass
+            # Don't break the success page; the webhook worker fulfils the session anyway
+            logger.exception("Fulfilment from the success page failed for %s", session_id)
 
     messages.success(request, "Payment completed! You'll receive confirmation shortly.")
     return render(request, "shop/checkout_success.html")
@@ -141,10 +162,24 @@ def checkout_cancel(request):
     return render(request, "shop/checkout_cancel.html")
 
 
+def _order_page(request, queryset, *, descending):
+    """One keyset page of orders, with their items (and products) fetched for that page only."""
+    queryset = queryset.prefetch_related(
+        Prefetch("items", queryset=OrderItem.objects.select_related("product"))
+    )
+    return keyset_page(
+        queryset,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+        size=getattr(settings, "ORDERS_PAGE_SIZE", 25),
+        descending=descending,
+    )
+
+
 @login_required
 def orders_view(request):
-    orders = Order.objects.filter(user=request.user).order_by("-created_at")
-    return render(request, "shop/orders.html", {"orders": orders})
+    page = _order_page(request, Order.objects.filter(user=request.user), descending=True)
+    return render(request, "shop/orders.html", {"orders": page, "page": page})
 
 
 def is_staff(user):
@@ -153,8 +188,9 @@ def is_staff(user):
 
 @user_passes_test(is_staff)
 def pending_orders(request):
-    pending = Order.objects.filter(paid=True, approved=False).order_by("created_at")
-    return render(request, "admin_panel/pending_orders.html", {"orders": pending})
+    pending = Order.objects.filter(paid=True, approved=False).select_related("user")
+    page = _order_page(request, pending, descending=False)
+    return render(request, "admin_panel/pending_orders.html", {"orders": page, "page": page})
 
 
 @user_passes_test(is_staff)
@@ -163,4 +199,34 @@ def approve_order(request, order_id):
     approval, _ = PurchaseApproval.objects.get_or_create(order=order)
     approval.approve(request.user)
     messages.success(request, f"Order #{order.id} approved.")
-    return redirect("pending_orders")
\ No newline at end of file
+    return redirect("pending_orders")
+
+
+@require_POST
+@user_passes_test(is_staff)
+def bulk_approve_orders(request):
+    """Approve the ticked orders, or with `all` every order in the pending queue."""
+    orders = Order.objects.all()
+    if not request.POST.get("all"):
+        ids = [i for i in request.POST.getlist("order_ids") if i.isdigit()]
+        if not ids:
+            messages.info(request, "No orders selected.")
+            return redirect("pending_orders")
+        orders = orders.filter(pk__in=ids)
+    count = PurchaseApproval.approve_orders(orders, request.user)
+    messages.success(request, f"{count} order{'s' if count != 1 else ''} approved.")
+    return redirect("pending_orders")
+
+@user_passes_test(is_staff)
+def export_orders_csv(request):
+    """Orders + line items as CSV, streamed. Optional ?start=&end= (dates or ISO datetimes, end exclusive)."""
+    try:
+        start, end = parse_bound(request.GET.get("start")), parse_bound(request.GET.get("end"))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    filename = "orders-{}-{}.csv".format(
+        start.date().isoformat() if start else "all", end.date().isoformat() if end else timezone.localdate().isoformat()
+    )
+    # DB-backed iterator: keep every step on one thread/connection under ASGI
+    return stream(request, export_csv(start, end), "text/csv", thread_sensitive=True,
+                  headers={"Content-Disposition": f'attachment; filename="{filename}"'})
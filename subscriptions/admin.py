@@ -1,8 +1,12 @@
 # subscriptions/admin.py
 from django.contrib import admin
 from django.apps import apps
-from django.utils import timezone
-from accounts.models import UserProfile
+from django.db import transaction
+from django.db.models import Count
+from accounts.entitlements import invalidate_entitlements
+from bluewave_shop.db import EstimatedCountPaginator
+from reporting.aggregates import record_subscriptions_ended
+from subscriptions.services import ACCESS_STATUSES, reconcile_researcher_flags
 
 
 def get_sub_model():
@@ -20,16 +24,6 @@ FIELD_NAMES = {f.name for f in SubModel._meta.get_fields()}
 SIMPLE_SCHEMA = "active" in FIELD_NAMES  # simple == boolean 'active'; robust == 'status', 'current_period_end', ...
 
 
-def user_still_active(user) -> bool:
-    """Check if the user still has an active subscription (supports simple & robust schemas)."""
-    qs = SubModel.objects.filter(user=user)
-    if SIMPLE_SCHEMA:
-        return qs.filter(active=True).exists()
-    # robust schema
-    now = timezone.now()
-    return qs.filter(status__in=("active", "trialing"), current_period_end__gt=now).exists()
-
-
 # ----- Admin configuration that adapts to available fields -----
 _list_display = ["id", "user", "stripe_subscription_id"]
 _list_filter = []
@@ -60,21 +54,36 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_filter = _list_filter
     search_fields = _search_fields
     ordering = ("-id",)
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+    if "current_period_end" in FIELD_NAMES:
+        date_hierarchy = "current_period_end"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def _revoke_lapsed(self, user_ids):
+        # Clear researcher flags only where no other active subscription remains
+        reconcile_researcher_flags(user_ids)
+        transaction.on_commit(lambda: invalidate_entitlements(*user_ids))
+
+    def _ending_by_price(self, queryset):
+        if SIMPLE_SCHEMA:
+            return {"": queryset.filter(active=True).count()}
+        return dict(queryset.filter(status__in=ACCESS_STATUSES).values_list("price_id").annotate(n=Count("id")).order_by())
 
     def delete_queryset(self, request, queryset):
-        affected_users = {obj.user for obj in queryset}
-        super().delete_queryset(request, queryset)
-        # After deletion, clear researcher flag only if no other active subs remain
-        for u in affected_users:
-            if not user_still_active(u):
-                profile, _ = UserProfile.objects.get_or_create(user=u)
-                profile.is_researcher = False
-                profile.save()
+        with transaction.atomic():
+            user_ids = set(queryset.values_list("user_id", flat=True))
+            ending = self._ending_by_price(queryset)
+            super().delete_queryset(request, queryset)
+            record_subscriptions_ended(ending)
+            self._revoke_lapsed(user_ids)
 
     def delete_model(self, request, obj):
-        u = obj.user
-        super().delete_model(request, obj)
-        if not user_still_active(u):
-            profile, _ = UserProfile.objects.get_or_create(user=u)
-            profile.is_researcher = False
-            profile.save()
+        with transaction.atomic():
+            user_id = obj.user_id
+            active = obj.active if SIMPLE_SCHEMA else obj.status in ACCESS_STATUSES
+            ending = {getattr(obj, "price_id", ""): 1} if active else {}
+            super().delete_model(request, obj)
+            record_subscriptions_ended(ending)
+            self._revoke_lapsed({user_id})
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from subscriptions.services import sweep
+
+
+class Command(BaseCommand):
+    help = "Expire subscriptions past current_period_end and reconcile UserProfile.is_researcher (run periodically)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="Reconcile every user's flag, not just those whose subscriptions expired.")
+
+    def handle(self, *args, **opts):
+        result = sweep(full=opts["full"])
+        self.stdout.write(self.style.SUCCESS(
+            "Expired {canceled} canceled + {unpaid} unpaid subscription(s); "
+            "researcher flag granted {granted}, revoked {revoked}.".format(**result)
+        ))
@@ -29,13 +29,22 @@ class UserSubscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # active_subscriptions()/entitlements: user + status + period end
+            models.Index(fields=["user", "status", "current_period_end"], name="usersub_user_status_end_idx"),
+            # admin date_hierarchy and the expiry sweeper's period-end range scan
+            models.Index(fields=["current_period_end"], name="usersub_period_end_idx"),
+        ]
+
     @property
     def is_active_now(self) -> bool:
         """
-        Active if status is active/trialing (optionally allow past_due as grace)
-        AND we're still inside the current billing period.
+        Active if status is in subscriptions.services.ACCESS_STATUSES (past_due
+        is a grace period) AND we're still inside the current billing period.
         """
-        if self.status in ("active", "trialing", "past_due"):
+        from .services import ACCESS_STATUSES  # services imports this module
+        if self.status in ACCESS_STATUSES:
             return bool(self.current_period_end and self.current_period_end > timezone.now())
         return False
 
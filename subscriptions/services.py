@@ -0,0 +1,86 @@
+"""
+Set-based subscription maintenance: expiring lapsed rows and keeping
+UserProfile.is_researcher in line with live subscriptions.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+from accounts.entitlements import invalidate_entitlements
+from accounts.models import UserProfile
+from reporting.aggregates import record_subscriptions_ended
+from .models import UserSubscription
+
+# Statuses that grant access while inside the billing period. past_due is Stripe's
+# payment-retry window: access continues as a grace period until the period ends,
+# when the sweeper moves the subscription on (or a webhook does so sooner).
+ACCESS_STATUSES = ("active", "trialing", "past_due")
+# Statuses the sweeper moves on once the period has ended
+LIVE_STATUSES = ACCESS_STATUSES
+
+
+def active_subscriptions(now=None):
+    now = now or timezone.now()
+    return UserSubscription.objects.filter(status__in=ACCESS_STATUSES, current_period_end__gt=now)
+
+
+def expire_lapsed(now=None):
+    """
+    Move every live subscription whose period has ended to a terminal status:
+    'canceled' if it was set to cancel at period end, otherwise 'unpaid'.
+    Returns (canceled, unpaid, affected user ids).
+    """
+    now = now or timezone.now()
+    lapsed = UserSubscription.objects.filter(status__in=LIVE_STATUSES, current_period_end__lte=now)
+    user_ids = set(lapsed.values_list("user_id", flat=True))
+    ending = dict(
+        lapsed.filter(status__in=ACCESS_STATUSES).values_list("price_id").annotate(n=Count("id")).order_by()
+    )
+    canceled = lapsed.filter(cancel_at_period_end=True).update(status="canceled", updated_at=now)
+    unpaid = lapsed.filter(cancel_at_period_end=False).update(status="unpaid", updated_at=now)
+    record_subscriptions_ended(ending, now)
+    return canceled, unpaid, user_ids
+
+
+def reconcile_researcher_flags(user_ids=None, now=None):
+    """
+    Make UserProfile.is_researcher match "has an active subscription" with a
+    few UPDATE/INSERT statements. Limited to `user_ids` when given.
+    Returns (granted, revoked).
+    """
+    now = now or timezone.now()
+    has_active = Exists(active_subscriptions(now).filter(user_id=OuterRef("user_id")))
+    profiles = UserProfile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=list(user_ids))
+
+    revoked = profiles.filter(is_researcher=True).exclude(has_active).update(is_researcher=False)
+    granted = profiles.filter(is_researcher=False).filter(has_active).update(is_researcher=True)
+
+    # Subscribers who never got a profile row
+    User = get_user_model()
+    missing = User.objects.filter(Exists(active_subscriptions(now).filter(user_id=OuterRef("pk")))).exclude(
+        Exists(UserProfile.objects.filter(user_id=OuterRef("pk")))
+    )
+    if user_ids is not None:
+        missing = missing.filter(pk__in=list(user_ids))
+    new_profiles = [UserProfile(user_id=pk, is_researcher=True) for pk in missing.values_list("pk", flat=True)]
+    UserProfile.objects.bulk_create(new_profiles, ignore_conflicts=True)
+    return granted + len(new_profiles), revoked
+
+
+def sweep(now=None, full=False):
+    """
+    Expire lapsed subscriptions and reconcile the affected users' flags in one
+    transaction. With `full`, every profile is reconciled instead.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        canceled, unpaid, user_ids = expire_lapsed(now)
+        if full or user_ids:
+            granted, revoked = reconcile_researcher_flags(None if full else user_ids, now=now)
+        else:
+            granted = revoked = 0
+        transaction.on_commit(lambda: invalidate_entitlements(*user_ids))
+    return {"canceled": canceled, "unpaid": unpaid, "granted": granted, "revoked": revoked}
@@ -0,0 +1,103 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+
+from accounts.models import UserProfile
+from subscriptions.models import UserSubscription
+
+
+class ExpirySweeperTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.lapsed = User.objects.create_user("lapsed", "l@ex.com", "Pass123!")
+        self.leaving = User.objects.create_user("leaving", "c@ex.com", "Pass123!")
+        self.live = User.objects.create_user("live", "v@ex.com", "Pass123!")
+        UserSubscription.objects.create(user=self.lapsed, stripe_subscription_id="sub_l", status="active",
+                                        current_period_end=now - timedelta(days=1))
+        UserSubscription.objects.create(user=self.leaving, stripe_subscription_id="sub_c", status="active",
+                                        current_period_end=now - timedelta(days=1), cancel_at_period_end=True)
+        UserSubscription.objects.create(user=self.live, stripe_subscription_id="sub_v", status="active",
+                                        current_period_end=now + timedelta(days=10))
+        for u in (self.lapsed, self.leaving):
+            UserProfile.objects.create(user=u, is_researcher=True)
+
+    def test_sweep_is_set_based_and_reconciles_flags(self):
+        with self.assertNumQueries(14):  # independent of how many rows are affected
+            call_command("expire_subscriptions", "--full", stdout=StringIO())
+
+        statuses = dict(UserSubscription.objects.values_list("stripe_subscription_id", "status"))
+        self.assertEqual(statuses, {"sub_l": "unpaid", "sub_c": "canceled", "sub_v": "active"})
+        flags = dict(UserProfile.objects.values_list("user__username", "is_researcher"))
+        self.assertEqual(flags, {"lapsed": False, "leaving": False, "live": True})
+
+    def test_sweep_only_reconciles_affected_users(self):
+        stranger = User.objects.create_user("stranger")
+        UserProfile.objects.create(user=stranger, is_researcher=True)  # drifted, but not touched by this run
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("expire_subscriptions", stdout=StringIO())
+
+        flags = dict(UserProfile.objects.values_list("user__username", "is_researcher"))
+        self.assertEqual(flags, {"lapsed": False, "leaving": False, "stranger": True})
+        profile_updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "accounts_userprofile"')]
+        self.assertTrue(profile_updates)
+        self.assertTrue(all(" IN (" in sql for sql in profile_updates))
+
+        UserSubscription.objects.all().delete()
+        with self.assertNumQueries(6):  # nothing lapsed: no reconcile at all
+            call_command("expire_subscriptions", stdout=StringIO())
+
+
+class SubscriptionAdminDeleteTests(TestCase):
+    def make_users(self, n, prefix):
+        now = timezone.now()
+        users = []
+        for i in range(n):
+            u = User.objects.create_user(f"{prefix}{i}")
+            UserSubscription.objects.create(user=u, stripe_subscription_id=f"sub_{prefix}{i}", status="active",
+                                            current_period_end=now + timedelta(days=5))
+            UserProfile.objects.create(user=u, is_researcher=True)
+            users.append(u)
+        return users
+
+    def delete_all(self, users):
+        from django.contrib import admin
+        from django.test import RequestFactory
+        from subscriptions.admin import SubModel
+        model_admin = admin.site._registry[SubModel]
+        request = RequestFactory().post("/")
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+            model_admin.delete_queryset(request, SubModel.objects.filter(user__in=users))
+        return len(ctx.captured_queries)
+
+    def test_delete_queryset_is_set_based(self):
+        from reporting.models import DailySubscriptions
+        DailySubscriptions.objects.create(day=timezone.localdate(), price_id="")  # same reporting path both times
+        few = self.delete_all(self.make_users(2, "few"))
+        many = self.delete_all(self.make_users(12, "many"))
+        self.assertEqual(few, many)
+        self.assertFalse(UserProfile.objects.filter(is_researcher=True).exists())
+
+    def test_other_live_subscription_keeps_access(self):
+        (user,) = self.make_users(1, "keep")
+        UserSubscription.objects.create(user=user, stripe_subscription_id="sub_second", status="active",
+                                        current_period_end=timezone.now() + timedelta(days=5))
+        from django.contrib import admin
+        from django.test import RequestFactory
+        from subscriptions.admin import SubModel
+        admin.site._registry[SubModel].delete_model(RequestFactory().post("/"), SubModel.objects.get(stripe_subscription_id="sub_keep0"))
+        self.assertTrue(UserProfile.objects.get(user=user).is_researcher)
+
+    def test_delete_rolls_back_when_reporting_fails(self):
+        from unittest.mock import patch
+        users = self.make_users(2, "fail")
+        with patch("subscriptions.admin.record_subscriptions_ended", side_effect=RuntimeError), \
+                patch("subscriptions.admin.invalidate_entitlements") as invalidate:
+            with self.assertRaises(RuntimeError):
+                self.delete_all(users)
+        self.assertEqual(UserSubscription.objects.filter(user__in=users).count(), 2)
+        invalidate.assert_not_called()